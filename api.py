@@ -1,15 +1,38 @@
 import os
 import json
-from fastapi import FastAPI, HTTPException, Body, Depends, Request
+from fastapi import FastAPI, HTTPException, Body, Depends, Request, UploadFile, File
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 import uvicorn
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
-from gemini_helper import initialize_gemini, generate_response
-from file_processor import process_file  # Sửa thành tên hàm đúng
+from gemini_helper import (
+    initialize_gemini, generate_response_async, stream_response, GeminiError,
+    get_scoring_model, PRIORITY_BACKGROUND,
+    get_cache_stats, get_coalescing_stats, get_rate_limit_stats, get_resilience_stats,
+    get_structured_output_stats,
+)
+from file_processor import extract_document, get_extraction_cache_stats
+from file_ingest import NamedUpload, FileLimitError
+from extractors import ExtractionRouter
+from ocr_engine import get_ocr_stats
+from document_store import DocumentStore
+from similarity_index import SimilarityIndex, DEFAULT_INDEX_DIR
 from prompts import get_interview_context_prompt, SYSTEM_PROMPT
+from token_budget import TokenBudget, PromptTooLargeError, get_budget_stats
+from job_queue import JobQueue, FINISHED_STATES, JOB_SUCCEEDED, registered_kinds
+from skills_gap_analyzer import (
+    build_requirements_messages, build_resume_evaluation_messages, evaluation_result,
+    rank_evaluations, build_skill_profile, is_current_skill_profile, build_gap_advice_messages,
+)
+from skills_gap_scoring import score_skills_gap
+from structured_output import ResumeEvaluation
 
 # Khởi tạo Gemini API
 gemini_model = initialize_gemini()
@@ -22,29 +45,81 @@ class DocumentRequest(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[Dict[str, str]]
     language: str = "vi"  # vi, en
+    document_id: Optional[str] = None  # tài liệu đã tải lên qua /api/documents làm ngữ cảnh
     
 class AnalysisRequest(BaseModel):
-    content: str
+    content: Optional[str] = None
+    document_id: Optional[str] = None  # dùng thay cho content
     analysis_type: str  # resume_improvements, job_keywords, skills_gap, custom
     language: str = "vi"  # vi, en
     custom_prompt: Optional[str] = None
     
 class InterviewSimulationRequest(BaseModel):
     resume: Optional[str] = None
+    resume_document_id: Optional[str] = None
     job_role: Optional[str] = None
     interview_type: str  # technical, behavioral, hr, case
     language: str = "vi"  # vi, en
     
+class ResumeItem(BaseModel):
+    id: Optional[str] = None
+    content: Optional[str] = None
+    document_id: Optional[str] = None
+
+class BatchSkillsGapRequest(BaseModel):
+    job_description: Optional[str] = None
+    job_description_document_id: Optional[str] = None
+    resumes: List[ResumeItem]
+    language: str = "vi"  # vi, en
+    max_concurrency: int = 4
+    
+class SimilarityRequest(BaseModel):
+    query: Optional[str] = None
+    query_document_id: Optional[str] = None  # dùng thay cho query
+    document_type: Optional[str] = "resume"  # loại tài liệu được xếp hạng: resume, job_description, other; None cho tất cả
+    method: str = "bm25"  # bm25, tfidf
+    top_k: int = 10
+    
+class JobRequest(BaseModel):
+    kind: str  # progress_report, career_path, competitor_comparison, skills_gap_batch
+    params: Dict[str, Any] = {}
+    priority: int = 0
+    
 class APIResponse(BaseModel):
     success: bool
     data: Optional[Any] = None
     error: Optional[str] = None
 
+# Tài liệu đã tải lên (nén trong SQLite), tra cứu theo document_id (digest nội dung)
+document_store = DocumentStore()
+
+# Chỉ mục TF-IDF/BM25 của các tài liệu đã tải lên, để xếp hạng CV và mô tả công việc không cần gọi model
+similarity_index = SimilarityIndex(DEFAULT_INDEX_DIR)
+
+# Thread pool trích xuất tài liệu, tách khỏi event loop
+document_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DOCUMENT_WORKERS", "4")), thread_name_prefix="document"
+)
+
+# Extractor nặng CPU (DOCX, Excel lớn) được chuyển sang process pool theo gợi ý chi phí
+document_router = ExtractionRouter()
+
+# Hàng đợi job chạy nền, worker được khởi động cùng API
+job_queue = JobQueue()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    yield
+    job_queue.stop()
+    document_router.shutdown()
+
 # Khởi tạo FastAPI
 app = FastAPI(
     title="Trợ Lý Phỏng Vấn API",
     description="API cho ứng dụng trợ lý phỏng vấn xin việc",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Thêm CORS middleware để cho phép tích hợp với các ứng dụng web khác
@@ -56,69 +131,261 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(GeminiError)
+async def gemini_error_handler(request: Request, exc: GeminiError):
+    # Trả về mã HTTP phù hợp với loại lỗi Gemini (429, 503, 504...)
+    headers = {}
+    if exc.retry_after:
+        headers["Retry-After"] = str(int(exc.retry_after) + 1)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=APIResponse(success=False, error=str(exc)).model_dump(),
+        headers=headers
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Chào mừng đến với API Trợ Lý Phỏng Vấn Xin Việc"}
 
+def resolve_content(content, document_id, field_name="content"):
+    """Lấy nội dung gửi trực tiếp hoặc từ tài liệu đã tải lên; báo 404 nếu document_id không tồn tại"""
+    if document_id:
+        text = document_store.text(document_id)
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Không tìm thấy tài liệu {document_id}, vui lòng tải lên lại")
+        return text
+    return content
+
+def resolve_skill_profile(text, document_id):
+    """Dùng hồ sơ kỹ năng đã tính sẵn khi tải lên, chỉ tính lại với nội dung gửi trực tiếp"""
+    if document_id:
+        document = document_store.get(document_id, include_text=False)
+        if document and is_current_skill_profile(document["skill_profile"]):
+            return document["skill_profile"]
+        if document:
+            # Hồ sơ được tính bằng từ điển kỹ năng cũ: tính lại và lưu đè
+            skill_profile = build_skill_profile(text)
+            document_store.set_skill_profile(document_id, skill_profile)
+            return skill_profile
+    return build_skill_profile(text)
+
+def ingest_document(upload, document_type="other"):
+    """Trích xuất tài liệu, tính hồ sơ kỹ năng một lần, lưu vào kho tài liệu và chỉ mục tương đồng (chạy trong thread pool)"""
+    document = extract_document(upload, raise_errors=True, runner=document_router)
+    stored = document_store.get(document.digest, include_text=False)
+    if stored and is_current_skill_profile(stored["skill_profile"]):
+        skill_profile = stored["skill_profile"]
+    else:
+        skill_profile = build_skill_profile(document.text)
+    document_store.put(document.digest, document.text, name=upload.name,
+                       metadata=document.metadata, skill_profile=skill_profile)
+    similarity_index.add(document.digest, document.text, kind=document_type)
+    # Tài liệu đã có trong chỉ mục giữ loại đã lưu (chỉ mục chỉ ghi nối thêm)
+    return document, skill_profile, similarity_index.kind_of(document.digest)
+
+def rank_documents(query, **kwargs):
+    """Xếp hạng trên chỉ mục tương đồng và thêm tên tài liệu từ kho (chạy trong thread pool)"""
+    ranking = similarity_index.rank(query, **kwargs)
+    for entry in ranking:
+        document = document_store.get(entry["id"], include_text=False)
+        entry["name"] = document["name"] if document else None
+    return ranking
+
+def build_chat_messages(request: ChatRequest):
+    """Thêm system prompt và hướng dẫn ngôn ngữ vào lịch sử chat"""
+    # Thêm hướng dẫn ngôn ngữ
+    messages_copy = [dict(message) for message in request.messages]
+    language_instruction = "Trả lời bằng tiếng Việt." if request.language == "vi" else "Answer in English."
+    
+    # Kiểm tra và thêm system prompt nếu cần
+    if len(messages_copy) > 0 and messages_copy[0].get("role") == "system":
+        messages_copy[0]["content"] += f"\n\n{language_instruction}"
+    else:
+        # Thêm system prompt mới, kèm nội dung tài liệu nếu có
+        document_text = resolve_content(None, request.document_id)
+        system_prompt = get_interview_context_prompt(document_text) if document_text else SYSTEM_PROMPT
+        messages_copy.insert(0, {"role": "system", "content": f"{system_prompt}\n\n{language_instruction}"})
+    
+    return messages_copy
+
+def fit_chat_messages(request: ChatRequest):
+    """Đưa lịch sử chat vào ngân sách token; system prompt (chứa tài liệu) quá dài thì trả về 413"""
+    try:
+        return TokenBudget().fit(build_chat_messages(request))
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def build_analysis_messages(request: AnalysisRequest):
+    """Tạo messages cho phân tích tài liệu, trả về None nếu loại phân tích không hợp lệ"""
+    request.content = resolve_content(request.content, request.document_id)
+    if not request.content:
+        return None
+    
+    # Xác định prompt dựa trên loại phân tích
+    analysis_prompt = ""
+    language_prompt = "bằng tiếng Việt" if request.language == "vi" else "in English"
+    
+    if request.analysis_type == "resume_improvements":
+        analysis_prompt = f"Phân tích CV sau đây và đưa ra các gợi ý cụ thể để cải thiện {language_prompt}: {request.content}"
+        
+    elif request.analysis_type == "job_keywords":
+        analysis_prompt = f"Trích xuất các từ khóa và kỹ năng quan trọng từ mô tả công việc sau, phân loại theo mức độ quan trọng {language_prompt}: {request.content}"
+        
+    elif request.analysis_type == "skills_gap":
+        analysis_prompt = f"Phân tích khoảng cách kỹ năng giữa sơ yếu lý lịch và yêu cầu công việc sau {language_prompt}. Đưa ra đề xuất cụ thể về cách thu hẹp khoảng cách này: {request.content}"
+        
+    elif request.analysis_type == "custom" and request.custom_prompt:
+        analysis_prompt = f"{request.custom_prompt} {language_prompt}: {request.content}"
+        
+    else:
+        return None
+    
+    # Thêm hướng dẫn ngôn ngữ
+    language_instruction = "Trả lời bằng tiếng Việt." if request.language == "vi" else "Answer in English."
+    
+    # Tạo messages cho API Gemini
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{language_instruction}"},
+        {"role": "user", "content": analysis_prompt}
+    ]
+
+def sse_events(first_chunk, chunks):
+    """Đóng gói các đoạn văn bản thành sự kiện Server-Sent Events"""
+    try:
+        if first_chunk is not None:
+            yield f"data: {json.dumps({'text': first_chunk}, ensure_ascii=False)}\n\n"
+        for chunk in chunks:
+            yield f"data: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except GeminiError as e:
+        error = {"error": str(e), "status_code": e.status_code}
+        yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+async def sse_response(messages):
+    chunks = stream_response(gemini_model, messages, raise_errors=True)
+    # Lấy đoạn đầu tiên trước khi gửi header để lỗi kết nối trả về đúng mã HTTP
+    first_chunk = await run_in_threadpool(next, chunks, None)
+    
+    # Generator đồng bộ được Starlette chạy trong threadpool nên không chặn event loop
+    return StreamingResponse(
+        sse_events(first_chunk, chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/metrics", response_model=APIResponse)
+def metrics():
+    # Số liệu vận hành của lớp gọi Gemini (cache, ...); hàm đồng bộ vì kho tài liệu và hàng đợi job đọc SQLite
+    return APIResponse(success=True, data={
+        "cache": get_cache_stats(),
+        "coalescing": get_coalescing_stats(),
+        "rate_limit": get_rate_limit_stats(),
+        "resilience": get_resilience_stats(),
+        "structured_output": get_structured_output_stats(),
+        "token_budget": get_budget_stats(),
+        "extraction_cache": get_extraction_cache_stats(),
+        "extraction_routing": document_router.stats(),
+        "ocr": get_ocr_stats(),
+        "documents": document_store.stats(),
+        "similarity_index": similarity_index.stats(),
+        "jobs": job_queue.stats()
+    })
+
+@app.post("/api/documents", response_model=APIResponse)
+async def upload_document(file: UploadFile = File(...), include_text: bool = True, document_type: str = "other"):
+    """
+    Tải lên tài liệu (multipart) và trích xuất nội dung
+    
+    Phần thân request được ghi ra file tạm khi lớn, việc trích xuất chạy trong thread pool
+    riêng. document_id trả về dùng được cho các endpoint phân tích thay cho nội dung;
+    document_type (resume, job_description, other) dùng để lọc khi xếp hạng tương đồng.
+    """
+    upload = NamedUpload(file.file, file.filename, file.content_type, file.size)
+    try:
+        loop = asyncio.get_running_loop()
+        document, skill_profile, indexed_type = await loop.run_in_executor(
+            document_executor, partial(ingest_document, upload, document_type))
+    except FileLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        await file.close()
+    
+    warnings = list(document.warnings)
+    if indexed_type != document_type:
+        warnings.append(f"The document was already indexed as {indexed_type!r}; document_type {document_type!r} was ignored.")
+    data = {"document_id": document.digest, "name": file.filename, "metadata": document.metadata,
+            "skill_profile": skill_profile, "document_type": indexed_type, "cached": document.cached,
+            "warnings": warnings}
+    if include_text:
+        data["text"] = document.text
+    return APIResponse(success=True, data=data)
+
+@app.get("/api/documents/{document_id}", response_model=APIResponse)
+def get_document(document_id: str, include_text: bool = True):
+    """
+    Lấy thông tin và nội dung của tài liệu đã tải lên (hàm đồng bộ: FastAPI chạy nó trong threadpool)
+    """
+    document = document_store.get(document_id, include_text=include_text)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy tài liệu {document_id}, vui lòng tải lên lại")
+    
+    data = {"document_id": document_id, "name": document["name"], "metadata": document["metadata"],
+            "skill_profile": document["skill_profile"]}
+    if include_text:
+        data["text"] = document["text"]
+    return APIResponse(success=True, data=data)
+
 @app.post("/api/chat", response_model=APIResponse)
 async def chat(request: ChatRequest):
     try:
-        # Thêm hướng dẫn ngôn ngữ
-        messages_copy = request.messages.copy()
-        language_instruction = "Trả lời bằng tiếng Việt." if request.language == "vi" else "Answer in English."
-        
-        # Kiểm tra và thêm system prompt nếu cần
-        if len(messages_copy) > 0 and messages_copy[0].get("role") == "system":
-            messages_copy[0]["content"] += f"\n\n{language_instruction}"
-        else:
-            # Thêm system prompt mới
-            messages_copy.insert(0, {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{language_instruction}"})
+        # Đọc tài liệu từ SQLite và đếm token ngoài event loop
+        budget_result = await run_in_threadpool(fit_chat_messages, request)
         
         # Gọi API Gemini để lấy phản hồi
-        response = generate_response(gemini_model, messages_copy)
+        response = await generate_response_async(gemini_model, budget_result.messages, use_cache=False, raise_errors=True)
         
-        return APIResponse(success=True, data={"response": response})
+        return APIResponse(success=True, data={
+            "response": response,
+            "prompt_tokens": budget_result.tokens_after,
+            "tokens_saved": budget_result.tokens_saved
+        })
+    except (GeminiError, HTTPException):
+        raise
     except Exception as e:
         return APIResponse(success=False, error=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    budget_result = await run_in_threadpool(fit_chat_messages, request)
+    return await sse_response(budget_result.messages)
+
 @app.post("/api/analyze-document", response_model=APIResponse)
 async def analyze_document(request: AnalysisRequest):
     try:
-        # Xác định prompt dựa trên loại phân tích
-        analysis_prompt = ""
-        language_prompt = "bằng tiếng Việt" if request.language == "vi" else "in English"
-        
-        if request.analysis_type == "resume_improvements":
-            analysis_prompt = f"Phân tích CV sau đây và đưa ra các gợi ý cụ thể để cải thiện {language_prompt}: {request.content}"
-            
-        elif request.analysis_type == "job_keywords":
-            analysis_prompt = f"Trích xuất các từ khóa và kỹ năng quan trọng từ mô tả công việc sau, phân loại theo mức độ quan trọng {language_prompt}: {request.content}"
-            
-        elif request.analysis_type == "skills_gap":
-            analysis_prompt = f"Phân tích khoảng cách kỹ năng giữa sơ yếu lý lịch và yêu cầu công việc sau {language_prompt}. Đưa ra đề xuất cụ thể về cách thu hẹp khoảng cách này: {request.content}"
-            
-        elif request.analysis_type == "custom" and request.custom_prompt:
-            analysis_prompt = f"{request.custom_prompt} {language_prompt}: {request.content}"
-            
-        else:
+        messages = await run_in_threadpool(build_analysis_messages, request)
+        if messages is None:
             return APIResponse(success=False, error="Loại phân tích không hợp lệ hoặc thiếu thông tin")
         
-        # Thêm hướng dẫn ngôn ngữ
-        language_instruction = "Trả lời bằng tiếng Việt." if request.language == "vi" else "Answer in English."
-        
-        # Tạo messages cho API Gemini
-        messages = [
-            {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{language_instruction}"},
-            {"role": "user", "content": analysis_prompt}
-        ]
-        
         # Gọi API Gemini để lấy phân tích
-        response = generate_response(gemini_model, messages)
+        response = await generate_response_async(gemini_model, messages, raise_errors=True)
         
         return APIResponse(success=True, data={"analysis": response})
+    except (GeminiError, HTTPException):
+        raise
     except Exception as e:
         return APIResponse(success=False, error=str(e))
 
+@app.post("/api/analyze-document/stream")
+async def analyze_document_stream(request: AnalysisRequest):
+    messages = await run_in_threadpool(build_analysis_messages, request)
+    if messages is None:
+        raise HTTPException(status_code=400, detail="Loại phân tích không hợp lệ hoặc thiếu thông tin")
+    return await sse_response(messages)
+
 @app.post("/api/interview-simulation", response_model=APIResponse)
 async def interview_simulation(request: InterviewSimulationRequest):
     try:
@@ -147,8 +414,12 @@ Mỗi lần chỉ đặt một câu hỏi và chờ câu trả lời từ ngư
         if request.job_role:
             job_context = f"Vai trò công việc: {request.job_role}\n"
             
-        if request.resume:
-            job_context += f"Thông tin sơ yếu lý lịch: {request.resume}\n"
+        resume = await run_in_threadpool(resolve_content, request.resume, request.resume_document_id)
+        if resume:
+            job_context += f"Thông tin sơ yếu lý lịch: {resume}\n"
+            skills = (await run_in_threadpool(resolve_skill_profile, resume, request.resume_document_id))["skills"]
+            if skills:
+                job_context += f"Kỹ năng chính của ứng viên: {', '.join(skills)}\n"
         
         # Tạo prompt đầu tiên để bắt đầu cuộc phỏng vấn
         user_prompt = f"Bắt đầu phỏng vấn {interview_type}" + (f" cho vị trí {request.job_role}" if request.job_role else "")
@@ -160,9 +431,11 @@ Mỗi lần chỉ đặt một câu hỏi và chờ câu trả lời từ ngư
         ]
         
         # Gọi API Gemini để bắt đầu phỏng vấn
-        response = generate_response(gemini_model, messages)
+        response = await generate_response_async(gemini_model, messages, use_cache=False, raise_errors=True)
         
         return APIResponse(success=True, data={"interview_start": response})
+    except (GeminiError, HTTPException):
+        raise
     except Exception as e:
         return APIResponse(success=False, error=str(e))
 
@@ -170,49 +443,190 @@ Mỗi lần chỉ đặt một câu hỏi và chờ câu trả lời từ ngư
 async def skills_gap_analysis(request: Request):
     try:
         body = await request.json()
-        resume = body.get("resume", "")
-        job_description = body.get("job_description", "")
+        resume = await run_in_threadpool(resolve_content, body.get("resume", ""), body.get("resume_document_id"))
+        job_description = await run_in_threadpool(
+            resolve_content, body.get("job_description", ""), body.get("job_description_document_id")
+        )
         language = body.get("language", "vi")
         
         if not resume or not job_description:
             return APIResponse(success=False, error="Cần cung cấp cả sơ yếu lý lịch và mô tả công việc")
         
-        # Xác định ngôn ngữ
-        language_prompt = "bằng tiếng Việt" if language == "vi" else "in English"
-        language_instruction = "Trả lời bằng tiếng Việt." if language == "vi" else "Answer in English."
+        # Chấm điểm cục bộ (không gọi model); CV đã tải lên dùng lại hồ sơ kỹ năng tính sẵn
+        resume_skills = (await run_in_threadpool(resolve_skill_profile, resume, body.get("resume_document_id")))["skills"]
+        score = await run_in_threadpool(score_skills_gap, resume, job_description, resume_skills=resume_skills)
         
-        # Tạo prompt phân tích khoảng cách kỹ năng thông minh
-        analysis_prompt = f"""
-Tiến hành phân tích khoảng cách kỹ năng chi tiết {language_prompt} theo các bước sau:
-
-1. Trích xuất các kỹ năng và yêu cầu chính từ mô tả công việc sau:
-{job_description}
+        # Model chỉ viết nhận xét và đề xuất trên khoảng cách đã tính
+        response = await generate_response_async(
+            gemini_model, build_gap_advice_messages(score, language), raise_errors=True
+        )
+        
+        return APIResponse(success=True, data={"analysis": response, "scores": score.to_dict()})
+    except (GeminiError, HTTPException):
+        raise
+    except Exception as e:
+        return APIResponse(success=False, error=str(e))
 
-2. Xác định các kỹ năng và kinh nghiệm từ sơ yếu lý lịch sau:
-{resume}
+# Giới hạn cho một lô sàng lọc CV
+MAX_BATCH_RESUMES = 500
+MAX_BATCH_CONCURRENCY = 16
 
-3. Phân tích:
-   - Kỹ năng trùng khớp mạnh mẽ (đánh giá phần trăm)
-   - Kỹ năng trùng khớp một phần (đánh giá phần trăm)
-   - Kỹ năng thiếu hoàn toàn (đánh giá phần trăm)
-   - Điểm mạnh bổ sung từ sơ yếu lý lịch nhưng không được đề cập trong mô tả công việc
+async def evaluate_resume(index, item, requirements, language, model, semaphore):
+    """Đánh giá một CV; lỗi được trả về trong kết quả thay vì làm hỏng cả lô"""
+    resume_id = item.id or str(index)
+    async with semaphore:
+        try:
+            content = await run_in_threadpool(resolve_content, item.content, item.document_id)
+            if not content:
+                raise HTTPException(status_code=400, detail="CV không có nội dung")
+            messages = build_resume_evaluation_messages(requirements, content, language)
+            evaluation = await generate_response_async(
+                model, messages, priority=PRIORITY_BACKGROUND, raise_errors=True,
+                response_schema=ResumeEvaluation,
+            )
+            return {"type": "result", "index": index, "id": resume_id, "success": True,
+                    **evaluation_result(evaluation, language)}
+        except GeminiError as e:
+            return {"type": "result", "index": index, "id": resume_id, "success": False,
+                    "error": str(e), "status_code": e.status_code}
+        except HTTPException as e:
+            return {"type": "result", "index": index, "id": resume_id, "success": False,
+                    "error": e.detail, "status_code": e.status_code}
+        except Exception as e:
+            return {"type": "result", "index": index, "id": resume_id, "success": False,
+                    "error": str(e), "status_code": 500}
 
-4. Đánh giá tổng thể về sự phù hợp (thang điểm 1-10 với lý do cụ thể)
-5. Đề xuất ngắn gọn 3-5 hành động cụ thể để thu hẹp khoảng cách
-"""
+@app.post("/api/skills-gap-analysis/batch")
+async def skills_gap_analysis_batch(request: BatchSkillsGapRequest):
+    """
+    Sàng lọc nhiều CV với một mô tả công việc, trả kết quả dạng NDJSON ngay khi từng CV hoàn thành
+    """
+    request.job_description = await run_in_threadpool(
+        resolve_content, request.job_description, request.job_description_document_id
+    )
+    if not request.job_description or not request.resumes:
+        raise HTTPException(status_code=400, detail="Cần cung cấp mô tả công việc và ít nhất một CV")
+    if len(request.resumes) > MAX_BATCH_RESUMES:
+        raise HTTPException(status_code=400, detail=f"Tối đa {MAX_BATCH_RESUMES} CV cho mỗi lô")
+    
+    model = get_scoring_model() or gemini_model
+    
+    # Trích xuất yêu cầu công việc một lần cho cả lô thay vì gửi lại toàn bộ JD với mỗi CV
+    requirements = await generate_response_async(
+        model, build_requirements_messages(request.job_description, request.language), raise_errors=True
+    )
+    
+    concurrency = max(1, min(request.max_concurrency, MAX_BATCH_CONCURRENCY))
+    
+    async def events():
+        yield json.dumps({"type": "requirements", "requirements": requirements}, ensure_ascii=False) + "\n"
         
-        # Tạo messages cho API Gemini
-        messages = [
-            {"role": "system", "content": f"{SYSTEM_PROMPT}\n\nHãy làm một chuyên gia phân tích kỹ năng.\n\n{language_instruction}"},
-            {"role": "user", "content": analysis_prompt}
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [
+            asyncio.create_task(evaluate_resume(index, item, requirements, request.language, model, semaphore))
+            for index, item in enumerate(request.resumes)
         ]
+        results = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                results.append(result)
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # Client ngắt kết nối: hủy các CV chưa đánh giá
+            for task in tasks:
+                task.cancel()
         
-        # Gọi API Gemini để lấy phân tích
-        response = generate_response(gemini_model, messages)
-        
-        return APIResponse(success=True, data={"analysis": response})
-    except Exception as e:
-        return APIResponse(success=False, error=str(e))
+        yield json.dumps(rank_evaluations(results), ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/similarity/rank", response_model=APIResponse)
+async def rank_similar_documents(request: SimilarityRequest):
+    """
+    Xếp hạng các tài liệu đã tải lên theo độ tương đồng với một văn bản (ví dụ các CV với một JD)
+    
+    Tính trên chỉ mục TF-IDF/BM25 bằng một phép nhân ma trận, không gọi model.
+    """
+    query = await run_in_threadpool(resolve_content, request.query, request.query_document_id)
+    if not query:
+        raise HTTPException(status_code=400, detail="Cần cung cấp query hoặc query_document_id")
+    
+    try:
+        loop = asyncio.get_running_loop()
+        ranking = await loop.run_in_executor(document_executor, partial(
+            rank_documents, query, method=request.method, kind=request.document_type,
+            top_k=max(1, min(request.top_k, 100)), exclude=request.query_document_id,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return APIResponse(success=True, data={"method": request.method, "ranking": ranking})
+
+@app.post("/api/jobs")
+def submit_job(request: JobRequest):
+    """
+    Đưa một tác vụ dài vào hàng đợi chạy nền, trả về job_id ngay lập tức
+
+    Các endpoint job là hàm đồng bộ vì đọc/ghi SQLite: FastAPI chạy chúng trong threadpool
+    """
+    try:
+        job_id = job_queue.submit(request.kind, request.params, request.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{str(e)}. Các loại job hỗ trợ: {', '.join(registered_kinds())}")
+    return APIResponse(success=True, data={"job_id": job_id})
+
+@app.get("/api/jobs")
+def list_jobs(limit: int = 50, status: Optional[str] = None):
+    """
+    Liệt kê các job gần đây
+    """
+    return APIResponse(success=True, data=job_queue.list(min(limit, 500), status))
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Trạng thái, tiến độ và kết quả (nếu là JSON) của một job
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    
+    if job["status"] == JOB_SUCCEEDED:
+        if job["content_type"] == "application/json":
+            job["result"], _ = job_queue.result(job_id)
+        else:
+            job["result_url"] = f"/api/jobs/{job_id}/result"
+    return APIResponse(success=True, data=job)
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """
+    Tải kết quả của job đã hoàn thành (ví dụ file PDF)
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job chưa hoàn thành (trạng thái: {job['status']})")
+    
+    result, content_type = job_queue.result(job_id)
+    if content_type == "application/json":
+        return JSONResponse(content=result)
+    return Response(content=result, media_type=content_type)
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    Hủy job: job đang chờ bị hủy ngay, job đang chạy dừng ở mốc tiến độ tiếp theo
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    if job["status"] in FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Job đã kết thúc (trạng thái: {job['status']})")
+    
+    job_queue.cancel(job_id)
+    return APIResponse(success=True, data=job_queue.get(job_id))
 
 # Hàm để chạy API độc lập
 def run_api():
@@ -1,11 +1,11 @@
 import streamlit as st
 import os
-import time
 import json
 import re
-from file_processor import process_file
-from gemini_helper import initialize_gemini, generate_response
+from file_processor import extract_document
+from gemini_helper import initialize_gemini, generate_response, stream_response, GeminiError
 from prompts import SYSTEM_PROMPT, get_interview_context_prompt
+from token_budget import TokenBudget, PromptTooLargeError
 from keywords_and_courses import display_keywords_suggestions, display_courses_recommendations
 from market_analysis import display_market_analysis
 
@@ -161,10 +161,20 @@ if "language" not in st.session_state:
 
 if "file_content" not in st.session_state:
     st.session_state.file_content = None
+if "file_digest" not in st.session_state:
+    st.session_state.file_digest = None
 
-if "gemini_model" not in st.session_state:
+@st.cache_resource(show_spinner=False)
+def get_shared_gemini_model():
+    # Dùng chung một model đã cấu hình cho mọi phiên thay vì khởi tạo lại mỗi phiên
+    return initialize_gemini()
+
+if st.session_state.get("gemini_model") is None:
     # Initialize Gemini API without providing key (will use config.py)
-    st.session_state.gemini_model = initialize_gemini()
+    st.session_state.gemini_model = get_shared_gemini_model()
+    if st.session_state.gemini_model is None:
+        # Không giữ kết quả lỗi trong cache để lần chạy sau thử lại khi đã có API key
+        get_shared_gemini_model.clear()
 
 # Lưu trữ lịch sử tiến triển người dùng
 if "interview_history" not in st.session_state:
@@ -539,9 +549,12 @@ with st.sidebar:
     if uploaded_file and st.button(f"📄 {get_text('process_document')}",
                                    use_container_width=True):
         with st.spinner("Processing your document..."):
-            file_content = process_file(uploaded_file)
+            document = extract_document(uploaded_file)
+            file_content = document.text if document else None
             if file_content:
                 st.session_state.file_content = file_content
+                # Digest nội dung là khóa ổn định cho các cache phía sau
+                st.session_state.file_digest = document.digest
                 st.success(get_text("doc_loaded"))
 
                 # Add file content to chat context
@@ -567,6 +580,7 @@ with st.sidebar:
                  type="secondary"):
         st.session_state.messages = []
         st.session_state.file_content = None
+        st.session_state.file_digest = None
         st.success("Chat history cleared!")
 
     st.markdown("---")
@@ -1075,43 +1089,52 @@ with tab1:
             message_placeholder = st.empty()
             full_response = ""
 
-            with st.spinner("Thinking..."):
-                # Add language instruction based on selected language
-                messages_copy = st.session_state.messages.copy()
-                language_instruction = "Trả lời bằng tiếng Việt." if st.session_state.language == "vi" else "Answer in English."
+            # Add language instruction based on selected language
+            messages_copy = [dict(message) for message in st.session_state.messages]
+            language_instruction = "Trả lời bằng tiếng Việt." if st.session_state.language == "vi" else "Answer in English."
 
-                # Check if first message is system message and update it
-                if messages_copy[0]["role"] == "system":
-                    messages_copy[0][
-                        "content"] += f"\n\n{language_instruction}"
-                else:
-                    # Insert system message with language instruction at the beginning
-                    messages_copy.insert(
-                        0, {
-                            "role": "system",
-                            "content":
-                            f"{SYSTEM_PROMPT}\n\n{language_instruction}"
-                        })
-
-                assistant_response = generate_response(
-                    st.session_state.gemini_model, messages_copy)
-
-                # Áp dụng định dạng tốt hơn cho phản hồi
-                content_with_formatting = assistant_response
-                
-                # Simulate typing
-                for chunk in content_with_formatting.split():
-                    full_response += chunk + " "
-                    time.sleep(0.01)  # Giảm thời gian delay từ 0.02 xuống 0.01
+            # Check if first message is system message and update it
+            if messages_copy[0]["role"] == "system":
+                messages_copy[0][
+                    "content"] += f"\n\n{language_instruction}"
+            else:
+                # Insert system message with language instruction at the beginning
+                messages_copy.insert(
+                    0, {
+                        "role": "system",
+                        "content":
+                        f"{SYSTEM_PROMPT}\n\n{language_instruction}"
+                    })
+
+            # Hiển thị từng đoạn ngay khi mô hình sinh ra
+            message_placeholder.markdown("▌")
+            try:
+                # Giữ nguyên system prompt và các lượt gần đây, tóm tắt các lượt cũ để prompt không phình theo hội thoại
+                budget_result = TokenBudget().fit(messages_copy)
+                for chunk in stream_response(st.session_state.gemini_model,
+                                             budget_result.messages,
+                                             raise_errors=True):
+                    full_response += chunk
                     message_placeholder.markdown(full_response + "▌")
-
-                message_placeholder.markdown(content_with_formatting)
-
-            # Add assistant response to history
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": assistant_response  # Lưu nội dung gốc không có định dạng HTML
-            })
+            except (GeminiError, PromptTooLargeError) as e:
+                # Không lưu thông báo lỗi vào lịch sử chat; bỏ câu hỏi để người dùng gửi lại
+                message_placeholder.empty()
+                st.error(f"Error generating response: {str(e)}")
+                st.session_state.messages.pop()
+                full_response = None
+
+            if full_response is not None:
+                assistant_response = full_response
+                message_placeholder.markdown(assistant_response)
+
+                # Add assistant response to history
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": assistant_response  # Lưu nội dung gốc không có định dạng HTML
+                })
+
+                if budget_result.tokens_saved:
+                    st.caption(f"~{budget_result.tokens_saved} tokens saved by trimming older context")
 
 with tab2:
     st.markdown(f"""
@@ -1548,18 +1571,11 @@ with tab3:
     with subtabs[4]:
         # Sử dụng phản hồi từ phỏng vấn mô phỏng nếu có
         weaknesses = ""
-        if "interview_feedback" in st.session_state:
-            feedback = st.session_state.interview_feedback
+        if "interview_assessment" in st.session_state:
             language = st.session_state.language
             
-            # Trích xuất phần điểm yếu từ phản hồi phỏng vấn
-            if language == "vi":
-                weaknesses_section = re.search(r"(?:Điểm yếu|Khu vực cần cải thiện|Lĩnh vực cần cải thiện|Cần cải thiện):(.*?)(?:\n\n|$)", feedback, re.DOTALL)
-            else:
-                weaknesses_section = re.search(r"(?:Weaknesses|Areas for improvement|Needs improvement):(.*?)(?:\n\n|$)", feedback, re.DOTALL)
-            
-            if weaknesses_section:
-                weaknesses = weaknesses_section.group(1).strip()
+            # Điểm yếu lấy trực tiếp từ đánh giá có cấu trúc của buổi phỏng vấn
+            weaknesses = "\n".join(f"- {item}" for item in st.session_state.interview_assessment.weaknesses)
             
             # Hiển thị thông báo về việc sử dụng dữ liệu phỏng vấn
             if weaknesses:
@@ -0,0 +1 @@
+# Các script benchmark hiệu năng, chạy trực tiếp bằng python benchmarks/<tên_file>.py
@@ -0,0 +1,67 @@
+"""
+Benchmark thông lượng của /api/chat khi nhiều client gọi đồng thời
+
+So sánh lời gọi đồng bộ generate_response (chặn event loop) với
+generate_response_async (offload sang thread pool) trên một mô hình giả lập.
+
+Chạy: python benchmarks/bench_async_concurrency.py [--latency 0.2] [--requests 64]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+from gemini_helper import generate_response, configure_rate_limiter
+from benchmarks.fake_model import FakeModel
+
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+
+
+async def blocking_chat(request):
+    """Phiên bản cũ của handler: gọi trực tiếp hàm đồng bộ trong event loop"""
+    messages = [{"role": "system", "content": api.SYSTEM_PROMPT}] + request.messages
+    response = generate_response(api.gemini_model, messages)
+    return api.APIResponse(success=True, data={"response": response})
+
+
+async def run_clients(handler, total_requests, concurrency):
+    """Chạy total_requests lời gọi với tối đa `concurrency` client cùng lúc"""
+    semaphore = asyncio.Semaphore(concurrency)
+    request = api.ChatRequest(messages=[{"role": "user", "content": "Xin chào"}], language="vi")
+
+    async def client():
+        async with semaphore:
+            await handler(request)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(total_requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="Độ trễ giả lập mỗi lời gọi (giây)")
+    parser.add_argument("--requests", type=int, default=64, help="Tổng số request mỗi lần đo")
+    args = parser.parse_args()
+
+    api.gemini_model = FakeModel(latency=args.latency)
+    # Đo riêng khả năng song song, không để hạn mức phía client giới hạn thông lượng
+    configure_rate_limiter(None)
+
+    print(f"Fake model latency: {args.latency:.3f}s, requests per run: {args.requests}")
+    print(f"{'clients':>8} | {'blocking req/s':>15} | {'async req/s':>12} | {'speedup':>8}")
+    print("-" * 54)
+    for concurrency in CONCURRENCY_LEVELS:
+        blocking_time = asyncio.run(run_clients(blocking_chat, args.requests, concurrency))
+        async_time = asyncio.run(run_clients(api.chat, args.requests, concurrency))
+        blocking_rps = args.requests / blocking_time
+        async_rps = args.requests / async_time
+        print(f"{concurrency:>8} | {blocking_rps:>15.1f} | {async_rps:>12.1f} | {async_rps / blocking_rps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark trích xuất văn bản DOCX
+
+So sánh cách cũ (python-docx, chỉ duyệt doc.paragraphs, nối chuỗi text += ...),
+cách làm thường gặp với python-docx để lấy cả bảng (duyệt body, đọc row.cells)
+và extract_docx_text (một lần duyệt XML theo thứ tự tài liệu, gồm cả bảng,
+header/footer) trên các tài liệu tổng hợp có nhiều bảng kỹ năng tạo bằng python-docx.
+Cột "table text" cho biết nội dung của bảng có xuất hiện trong kết quả hay không.
+
+Chạy: python benchmarks/bench_docx_extraction.py [--tables 10 100 500] [--rows 20] [--repeat 3]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from docx_extractor import extract_docx_text
+
+
+def synthetic_docx(tables, rows, columns=4):
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Nguyen Van A - nguyenvana@example.com - +84 900 000 000"
+    for index in range(tables):
+        document.add_heading(f"Project {index + 1}", level=2)
+        document.add_paragraph("Built and operated data pipelines and APIs for a large user base.")
+        table = document.add_table(rows=rows, cols=columns)
+        for row_index, row in enumerate(table.rows):
+            for column_index, cell in enumerate(row.cells):
+                cell.text = f"Skill {index}-{row_index}-{column_index}" if row_index else f"Header {column_index}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_docx(data):
+    """Phiên bản cũ của process_docx"""
+    doc = docx.Document(io.BytesIO(data))
+    text = ""
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            text += paragraph.text + "\n"
+    return text
+
+
+def python_docx_full(data):
+    """Đoạn văn và bảng theo thứ tự tài liệu bằng API của python-docx"""
+    doc = docx.Document(io.BytesIO(data))
+    lines = [paragraph.text for paragraph in doc.sections[0].header.paragraphs]
+    for child in doc.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            lines.append(Paragraph(child, doc).text)
+        elif child.tag.endswith("}tbl"):
+            for row in Table(child, doc).rows:
+                lines.append(" | ".join(cell.text for cell in row.cells))
+    return "\n".join(line for line in lines if line.strip()) + "\n"
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 100, 500], help="Số bảng trong tài liệu")
+    parser.add_argument("--rows", type=int, default=20, help="Số dòng của mỗi bảng")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo, lấy kết quả tốt nhất")
+    args = parser.parse_args()
+
+    print(f"{'tables':>6} | {'size KB':>7} | {'legacy ms':>9} | {'full ms':>9} | {'engine ms':>9} | "
+          f"{'vs full':>7} | {'legacy chars':>12} | {'engine chars':>12} | table text")
+    print("-" * 108)
+    for tables in args.tables:
+        data = synthetic_docx(tables, args.rows)
+        legacy_time, legacy_text = best_of(lambda: legacy_docx(data), args.repeat)
+        full_time, _ = best_of(lambda: python_docx_full(data), args.repeat)
+        engine_time, result = best_of(lambda: extract_docx_text(io.BytesIO(data), max_chars=0), args.repeat)
+        probe = f"Skill {tables - 1}-1-0"
+        coverage = f"{'yes' if probe in legacy_text else 'no'} -> {'yes' if probe in result.text else 'no'}"
+        print(f"{tables:>6} | {len(data) / 1024:>7.0f} | {legacy_time * 1000:>9.1f} | {full_time * 1000:>9.1f} | "
+              f"{engine_time * 1000:>9.1f} | {full_time / engine_time:>6.2f}x | {len(legacy_text):>12} | "
+              f"{len(result.text):>12} | {coverage}")
+
+
+if __name__ == "__main__":
+    main()
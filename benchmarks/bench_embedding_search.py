@@ -0,0 +1,82 @@
+"""
+Benchmark tìm kiếm trong chỉ mục embedding
+
+So sánh cách tìm từng truy vấn bằng Python (cosine với từng dòng, sắp xếp toàn
+bộ) với EmbeddingIndex.search (một phép nhân ma trận float32 cho cả lô truy
+vấn, argpartition lấy top-k). Đo thêm thời gian tính embedding lần đầu và khi
+đã có trong cache theo nội dung.
+
+Chạy: python benchmarks/bench_embedding_search.py [--rows 1000 10000] [--queries 500] [--k 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_index import EmbeddingIndex, HashedNgramEmbedder, embed_texts
+
+_WORDS = ("python django react typescript kubernetes docker aws sql postgresql redis kafka spark excel figma seo "
+          "scrum leadership communication backend frontend mobile android ios data analysis machine learning "
+          "marketing sales finance accounting budget design testing security cloud devops api microservices").split()
+
+
+def synthetic_phrases(count, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 6))) + f" {position}"
+            for position in range(count)]
+
+
+def naive_search(query_vectors, vectors, k):
+    """Cosine với từng dòng bằng Python rồi sắp xếp toàn bộ"""
+    rows = [list(map(float, vector)) for vector in vectors]
+    results = []
+    for query in query_vectors:
+        query = list(map(float, query))
+        scores = [sum(a * b for a, b in zip(query, row)) for row in rows]
+        results.append(sorted(range(len(rows)), key=lambda column: -scores[column])[:k])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Số dòng của chỉ mục")
+    parser.add_argument("--queries", type=int, default=500, help="Số truy vấn")
+    parser.add_argument("--k", type=int, default=5, help="Số kết quả mỗi truy vấn")
+    parser.add_argument("--naive-queries", type=int, default=20, help="Số truy vấn đo với cách từng dòng")
+    args = parser.parse_args()
+
+    embedder = HashedNgramEmbedder()
+    print(f"{'rows':>6} | {'embed ms':>9} | {'cached ms':>9} | {'naive ms/q':>10} | {'batch ms/q':>10} | {'speedup':>8}")
+    print("-" * 68)
+    for count in args.rows:
+        texts = synthetic_phrases(count, seed=1)
+        queries = synthetic_phrases(args.queries, seed=2)
+
+        start = time.perf_counter()
+        index = EmbeddingIndex(embedder)
+        index.add(texts)
+        embed_time = time.perf_counter() - start
+        start = time.perf_counter()
+        embed_texts(texts, embedder)
+        cached_time = time.perf_counter() - start
+
+        # Cách từng dòng chậm nên chỉ đo trên một phần truy vấn, quy ra thời gian mỗi truy vấn
+        naive_queries = embed_texts(queries[:args.naive_queries], embedder)
+        start = time.perf_counter()
+        naive_search(naive_queries, index._matrix[:len(index)], args.k)
+        naive_per_query = (time.perf_counter() - start) / len(naive_queries)
+
+        index.search(queries, k=args.k)
+        start = time.perf_counter()
+        index.search(queries, k=args.k)
+        batch_per_query = (time.perf_counter() - start) / len(queries)
+
+        print(f"{count:>6} | {embed_time * 1000:>9.1f} | {cached_time * 1000:>9.1f} | {naive_per_query * 1000:>10.2f} | "
+              f"{batch_per_query * 1000:>10.3f} | {naive_per_query / batch_per_query:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark bộ nhớ đỉnh khi xử lý file tải lên
+
+So sánh các hàm xử lý cũ (getvalue() rồi bọc trong io.BytesIO mới, pandas đọc
+toàn bộ bảng tính) với lớp ingestion hiện tại (dùng trực tiếp stream của file
+tải lên, đọc xlsx theo dòng ở chế độ read-only) cho từng loại file.
+Bộ nhớ đỉnh đo bằng tracemalloc, không tính dữ liệu file đã có sẵn trong RAM.
+
+Chạy: python benchmarks/bench_file_ingestion.py [--scale 1.0]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import PyPDF2
+import pandas as pd
+from PIL import Image
+from openpyxl import Workbook
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import file_processor
+
+
+class FakeUpload(io.BytesIO):
+    """Giả lập UploadedFile của Streamlit (BytesIO dùng chung bytes đã nhận)"""
+
+    def __init__(self, data, name, mime_type):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+
+
+def make_txt(scale):
+    line = "Senior backend engineer with Python, Go, PostgreSQL, Kafka and Kubernetes experience. Kỹ năng lãnh đạo.\n"
+    return (line * int(80_000 * scale)).encode("utf-8")
+
+
+def make_pdf(scale):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(int(30 * scale)):
+        y = 800
+        for line in range(45):
+            pdf.drawString(40, y, f"Page {page + 1} line {line + 1}: Python, SQL, Docker, Kubernetes, AWS, mentoring")
+            y -= 17
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def make_docx(scale):
+    document = docx.Document()
+    for index in range(int(3000 * scale)):
+        document.add_paragraph(f"Paragraph {index}: designed and operated distributed services for a large user base.")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_xlsx(scale):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Candidates")
+    sheet.append(["id", "name", "role", "years", "skill_1", "skill_2", "skill_3", "score"])
+    for index in range(int(20_000 * scale)):
+        sheet.append([index, f"Candidate {index}", "Engineer", index % 15, "Python", "SQL", "Docker", index % 10])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def make_png(scale):
+    size = int(2000 * scale ** 0.5)
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (120, 80, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Các hàm xử lý trước khi có lớp ingestion
+def legacy_txt(file):
+    return file.getvalue().decode("utf-8")
+
+
+def legacy_pdf(file):
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.getvalue()))
+    text = ""
+    for page in pdf_reader.pages:
+        page_text = page.extract_text()
+        if page_text:
+            text += page_text + "\n"
+    return text
+
+
+def legacy_docx(file):
+    doc = docx.Document(io.BytesIO(file.getvalue()))
+    text = ""
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            text += paragraph.text + "\n"
+    return text
+
+
+def legacy_xlsx(file):
+    df = pd.read_excel(io.BytesIO(file.getvalue()))
+    return "Excel File Content:\n" + df.to_string(index=False, max_rows=100, max_cols=20)
+
+
+def legacy_png(file):
+    image = Image.open(io.BytesIO(file.getvalue()))
+    return f"Image file uploaded. Format: {file.type}, Size: {image.size[0]}x{image.size[1]}, Mode: {image.mode}.\n"
+
+
+CASES = [
+    ("txt", "text/plain", make_txt, legacy_txt),
+    ("pdf", "application/pdf", make_pdf, legacy_pdf),
+    ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", make_docx, legacy_docx),
+    ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", make_xlsx, legacy_xlsx),
+    ("png", "image/png", make_png, legacy_png),
+]
+
+
+def measure(fn, upload):
+    upload.seek(0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(upload)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=float, default=1.0, help="Hệ số kích thước của các file tổng hợp")
+    args = parser.parse_args()
+
+    print(f"{'type':>5} | {'file MB':>7} | {'legacy peak MB':>14} | {'ingest peak MB':>14} | {'legacy s':>8} | {'ingest s':>8}")
+    print("-" * 72)
+    for extension, mime_type, make, legacy in CASES:
+        data = make(args.scale)
+        upload = FakeUpload(data, f"sample.{extension}", mime_type)
+        legacy_peak, legacy_time = measure(legacy, upload)
+        ingest_peak, ingest_time = measure(file_processor.process_file, upload)
+        print(f"{extension:>5} | {len(data) / 2**20:>7.2f} | {legacy_peak / 2**20:>14.2f} | {ingest_peak / 2**20:>14.2f} | "
+              f"{legacy_time:>8.2f} | {ingest_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark kích thước prompt mỗi lượt của mô phỏng phỏng vấn
+
+So sánh cách cũ (gửi toàn bộ transcript kèm CV mỗi lượt) với bộ nhớ tóm tắt
+InterviewMemory (tóm tắt + câu hỏi hiện tại) trên một buổi phỏng vấn giả lập.
+Độ trễ ước tính = độ trễ cố định + thời gian xử lý prompt theo số token.
+
+Chạy: python benchmarks/bench_interview_prompt_size.py [--questions 10]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interview_simulator import create_interview_system_prompt
+from interview_memory import InterviewMemory
+from token_budget import count_messages_tokens
+
+# Mô hình độ trễ đơn giản: 300ms cố định + 0.05ms cho mỗi token đầu vào
+BASE_LATENCY_MS = 300
+PER_TOKEN_LATENCY_MS = 0.05
+
+
+def synthetic_resume(words=1500):
+    skills = "Python Django PostgreSQL Docker Kubernetes AWS React TypeScript Redis Kafka".split()
+    sentences = []
+    for index in range(words // 15):
+        skill = skills[index % len(skills)]
+        sentences.append(f"Developed and maintained {skill} services for project {index} serving thousands of daily users.")
+    return " ".join(sentences)
+
+
+def interviewer_message(number, total, feedback_words=120):
+    feedback = ""
+    if number > 1:
+        feedback = "Nhận xét: " + " ".join(["câu trả lời khá tốt và có ví dụ cụ thể"] * (feedback_words // 9)) + " Điểm: 7/10.\n\n"
+    if number > total:
+        return feedback + "Đánh giá tổng thể: 7/10."
+    return feedback + f"Câu hỏi {number}: Hãy mô tả một dự án mà bạn đã sử dụng Kubernetes để triển khai dịch vụ và những khó khăn gặp phải?"
+
+
+def candidate_answer(number, words=150):
+    return " ".join([f"Trong dự án {number} tôi đã thiết kế hệ thống triển khai tự động"] * (words // 11))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=10, help="Số câu hỏi của buổi phỏng vấn")
+    args = parser.parse_args()
+
+    total = args.questions
+    resume = synthetic_resume()
+    full_system = create_interview_system_prompt("technical", "Backend Engineer", resume, total, "vi")
+    base_prompt = create_interview_system_prompt("technical", "Backend Engineer", None, total, "vi")
+
+    transcript = [
+        {"role": "system", "content": full_system},
+        {"role": "user", "content": f"Tôi muốn bắt đầu buổi phỏng vấn technical với {total} câu hỏi"},
+    ]
+    first_message = interviewer_message(1, total)
+    transcript.append({"role": "assistant", "content": first_message})
+
+    memory = InterviewMemory.create(base_prompt, resume, total, "vi")
+    memory.observe_interviewer(first_message)
+
+    print(f"Interview with {total} questions, resume of ~{len(resume.split())} words")
+    print(f"{'turn':>4} | {'full tokens':>11} | {'memory tokens':>13} | {'full ms':>8} | {'memory ms':>9} | {'saved':>6}")
+    print("-" * 66)
+
+    total_full = total_memory = 0
+    for turn in range(1, total + 1):
+        answer = candidate_answer(turn)
+
+        transcript.append({"role": "user", "content": answer})
+        full_tokens = count_messages_tokens(transcript)
+        memory_tokens = count_messages_tokens(memory.build_messages(answer))
+
+        reply = interviewer_message(turn + 1, total)
+        transcript.append({"role": "assistant", "content": reply})
+        memory.observe_answer(answer)
+        memory.observe_interviewer(reply)
+
+        total_full += full_tokens
+        total_memory += memory_tokens
+        full_ms = BASE_LATENCY_MS + full_tokens * PER_TOKEN_LATENCY_MS
+        memory_ms = BASE_LATENCY_MS + memory_tokens * PER_TOKEN_LATENCY_MS
+        saved = 1 - memory_tokens / full_tokens
+        print(f"{turn:>4} | {full_tokens:>11} | {memory_tokens:>13} | {full_ms:>8.0f} | {memory_ms:>9.0f} | {saved:>5.0%}")
+
+    print("-" * 66)
+    print(f"Total prompt tokens: full={total_full}, memory={total_memory} ({1 - total_memory / total_full:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark xếp hạng tương đồng CV - mô tả công việc
+
+So sánh cách tính từng cặp bằng Python (cosine TF-IDF trên dict, một vòng lặp
+cho mỗi cặp JD x CV) với SimilarityIndex (ma trận thưa, mọi cặp trong một
+phép nhân ma trận) trên một tập CV và JD tổng hợp. Cột "build" là thời gian
+tách từ và ghi chỉ mục, không tính vào speedup. Đo thêm thời gian tải lại
+chỉ mục đã lưu (memory-mapped) và thêm một tài liệu vào chỉ mục đã lưu.
+
+Chạy: python benchmarks/bench_similarity_index.py [--resumes 1000 5000] [--jobs 50]
+"""
+import os
+import sys
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity_index import SimilarityIndex, tokenize
+
+_WORDS = ("python django react typescript kubernetes docker aws sql postgresql redis kafka spark excel figma seo "
+          "scrum leadership communication backend frontend mobile android ios data analysis machine learning "
+          "marketing sales finance accounting budget design testing security cloud devops api microservices").split()
+
+
+def synthetic_documents(count, words, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) if rng.random() < 0.3 else f"w{rng.randrange(5000)}" for _ in range(words))
+            for _ in range(count)]
+
+
+def naive_pairwise(vectors, job_count):
+    """Cosine TF-IDF cho từng cặp bằng dict Python (vectors: tần suất term đã tách sẵn, JD trước)"""
+    frequency = {}
+    for vector in vectors:
+        for term in vector:
+            frequency[term] = frequency.get(term, 0) + 1
+    idf = {term: math.log((1 + len(vectors)) / (1 + count)) + 1 for term, count in frequency.items()}
+    weighted = []
+    for vector in vectors:
+        weights = {term: (1 + math.log(count)) * idf[term] for term, count in vector.items()}
+        norm = math.sqrt(sum(value * value for value in weights.values())) or 1
+        weighted.append({term: value / norm for term, value in weights.items()})
+    job_vectors, resume_vectors = weighted[:job_count], weighted[job_count:]
+    return [[sum(value * resume.get(term, 0) for term, value in job.items()) for resume in resume_vectors]
+            for job in job_vectors]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resumes", type=int, nargs="+", default=[1000, 5000], help="Số CV")
+    parser.add_argument("--jobs", type=int, default=50, help="Số mô tả công việc")
+    parser.add_argument("--words", type=int, default=300, help="Số từ mỗi tài liệu")
+    args = parser.parse_args()
+
+    print(f"{'resumes':>7} | {'pairs':>8} | {'naive s':>8} | {'build s':>8} | {'matrix s':>8} | "
+          f"{'speedup':>8} | {'reload ms':>9} | {'append ms':>9}")
+    print("-" * 90)
+    for count in args.resumes:
+        jobs = synthetic_documents(args.jobs, args.words, seed=1)
+        resumes = synthetic_documents(count, args.words, seed=2)
+        directory = tempfile.mkdtemp(prefix="similarity_")
+        try:
+            # Cả hai cách đều được đo không kể thời gian tách từ
+            vectors = [tokenize(text) for text in jobs + resumes]
+            start = time.perf_counter()
+            naive_pairwise(vectors, len(jobs))
+            naive_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = SimilarityIndex(directory)
+            index.add_many([(f"j{position}", text, "job_description") for position, text in enumerate(jobs)] +
+                           [(f"r{position}", text, "resume") for position, text in enumerate(resumes)])
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index.pairwise("job_description", "resume", method="tfidf")
+            matrix_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            reloaded = SimilarityIndex(directory)
+            reload_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            reloaded.add("extra", resumes[0] + " extra", "resume")
+            append_time = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        print(f"{count:>7} | {count * args.jobs:>8} | {naive_time:>8.2f} | {build_time:>8.2f} | {matrix_time:>8.3f} | "
+              f"{naive_time / matrix_time:>7.0f}x | {reload_time * 1000:>9.1f} | {append_time * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark trích xuất kỹ năng
+
+So sánh extract_skills cũ (một regex lớn với tiền tố [\\w\\+\\#\\.\\-\\s]* và
+re.IGNORECASE, biên dịch lại ở mỗi lần gọi) với SkillMatcher (automaton
+Aho-Corasick dựng một lần từ data/skills_taxonomy.json) trên các CV tổng hợp
+nhiều kích thước và trên các đầu vào bất lợi cho regex (đoạn văn dài không có
+kỹ năng, chuỗi ký tự liền nhau không có khoảng trắng).
+
+Regex cũ tăng nhanh hơn tuyến tính theo độ dài và theo bình phương với chuỗi
+liền nhau, nên chỉ được đo đến --legacy-max-chars ký tự (5000 với chuỗi liền
+nhau); các dòng lớn hơn ghi "skipped". Cột "found" của regex cũ gồm cả các
+"kỹ năng" sai như nguyên một đoạn văn kết thúc bằng "ai" trong "daily".
+
+Chạy: python benchmarks/bench_skill_extraction.py [--sizes 5000 20000 100000] [--repeat 3]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skill_matcher import SkillMatcher, load_taxonomy
+
+
+def legacy_extract_skills(text):
+    """Phiên bản cũ của skills_gap_analyzer.extract_skills"""
+    skill_pattern = r"(?:[\•\-\★\✓\✔]\s*)?([A-Za-z0-9][\w\+\#\.\-\s]*(?:Framework|Language|API|SDK|Library|Technologies|Systems|Software|Development|Programming|Design|Analysis|Management|Marketing|Analytics|Engineering|Security|Architecture|Cloud|DevOps|Testing|UI\/UX|Database|SQL|Python|Java|JavaScript|React|Angular|Vue|Node\.js|PHP|C\+\+|Swift|Go|Rust|TypeScript|AWS|Azure|GCP|Docker|Kubernetes|Linux|Git|Machine Learning|ML|AI|NLP|Deep Learning|Data Science|Scrum|Agile|Kanban|SEO|SEM|Content Marketing|Social Media|Email Marketing|Google Analytics|Photoshop|Illustrator|Sketch|Figma|XD|HTML|CSS|SASS|LESS)(?:\s+\d+(?:\.\d+)?\s+(?:years|yrs))?)"
+    skills_found = re.findall(skill_pattern, text, re.IGNORECASE)
+    return list(set([skill.strip() for skill in skills_found if len(skill.strip()) > 2]))
+
+
+_SENTENCES = [
+    "Built REST APIs with Python, FastAPI and PostgreSQL serving millions of requests per day.",
+    "Migrated services to Kubernetes (k8s) on AWS and set up CI/CD with GitHub Actions.",
+    "Led a team of 6 engineers using Scrum; mentored juniors on React, TypeScript and Node.js.",
+    "Phân tích dữ liệu bán hàng bằng Power BI, làm việc nhóm và quản lý dự án với Jira.",
+    "Designed dashboards in Figma and improved SEO, raising organic traffic by 40%.",
+    "Responsible for day to day operations, reporting to the head of department and clients.",
+]
+
+
+def synthetic_resume(chars, seed=0):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < chars:
+        sentence = rng.choice(_SENTENCES)
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return "\n".join(parts)[:chars]
+
+
+def prose_without_skills(chars):
+    """Đoạn văn dài không chứa kỹ năng nào"""
+    return ("responsible for the daily operations of the office and the customers " * (chars // 70 + 1))[:chars]
+
+
+def unbroken_token(chars):
+    """Một chuỗi ký tự liền nhau không có khoảng trắng (ví dụ base64 dán nhầm vào CV)"""
+    return ("a1b2c3d4" * (chars // 8 + 1))[:chars]
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 100000], help="Độ dài văn bản (ký tự)")
+    parser.add_argument("--legacy-max-chars", type=int, default=20000, help="Độ dài tối đa đo với regex cũ")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo, lấy kết quả tốt nhất")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matcher = SkillMatcher(load_taxonomy())
+    print(f"automaton built in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(matcher.skills)} skills, taxonomy {matcher.version})\n")
+
+    inputs = [
+        ("resume", synthetic_resume, args.legacy_max_chars),
+        ("prose", prose_without_skills, args.legacy_max_chars),
+        ("token", unbroken_token, min(args.legacy_max_chars, 5000)),
+    ]
+    print(f"{'input':>8} | {'chars':>7} | {'legacy ms':>10} | {'matcher ms':>10} | {'speedup':>8} | "
+          f"{'legacy found':>12} | {'matcher found':>13}")
+    print("-" * 86)
+    for label, make, legacy_max_chars in inputs:
+        for size in args.sizes:
+            text = make(size)
+            matcher_time, skills = best_of(lambda: matcher.extract(text), args.repeat)
+            if size <= legacy_max_chars:
+                legacy_time, legacy = best_of(lambda: legacy_extract_skills(text), args.repeat)
+                legacy_ms, speedup, found = f"{legacy_time * 1000:.1f}", f"{legacy_time / matcher_time:.1f}x", len(legacy)
+            else:
+                legacy_ms, speedup, found = "skipped", "-", "-"
+            print(f"{label:>8} | {size:>7} | {legacy_ms:>10} | {matcher_time * 1000:>10.1f} | {speedup:>8} | "
+                  f"{found:>12} | {len(skills):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark đầu ra JSON có schema
+
+1. Trích xuất điểm số: so sánh cách cũ (khoảng chục regex trên văn bản tự do
+   của đánh giá phỏng vấn, như progress_tracker.extract_scores_from_feedback)
+   với một lần kiểm tra JSON bằng Pydantic (parse_structured) trên cùng nội dung.
+2. Thử lại khi kết quả sai schema: một model giả trả JSON không hợp lệ với xác
+   suất --invalid-rate; đo số lời gọi trung bình mỗi yêu cầu và tỷ lệ thất bại
+   với giới hạn STRUCTURED_MAX_ATTEMPTS.
+
+Chạy: python benchmarks/bench_structured_output.py [--repeat 2000] [--invalid-rate 0 0.1 0.3]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gemini_helper
+from gemini_helper import generate_response, GeminiError
+from structured_output import InterviewAssessment, parse_structured, structured_stats, STRUCTURED_MAX_ATTEMPTS
+from fake_model import FakeModel, FakeResponse
+
+_ASSESSMENT = InterviewAssessment(
+    overall=7, technical=8, communication=6, problem_solving=7, leadership=5,
+    strengths=["Clear explanations of past projects", "Solid Python and SQL fundamentals"],
+    weaknesses=["Little experience with distributed systems", "Answers sometimes lack structure"],
+    suggestions=["Practice the STAR method", "Build a small service on Kubernetes", "Review system design basics"],
+)
+
+_FREE_TEXT = """Overall Score: 7/10
+
+Technical skills: 8/10
+Communication skills: 6/10
+Problem-solving skills: 7/10
+Leadership skills: 5/10
+
+Strengths:
+- Clear explanations of past projects
+- Solid Python and SQL fundamentals
+
+Weaknesses:
+- Little experience with distributed systems
+- Answers sometimes lack structure
+
+Improvement suggestions:
+1. Practice the STAR method
+2. Build a small service on Kubernetes
+3. Review system design basics
+"""
+
+
+def legacy_extract_scores(feedback):
+    """Các regex của phiên bản cũ (tiếng Anh), không in debug"""
+    text = feedback.lower()
+    patterns = [
+        r"(?:overall\s*(?:score|assessment|rating|evaluation|grade|mark|result)|final\s*(?:score|assessment|rating|evaluation|grade|mark|result)|total\s*(?:score|assessment|rating)|assessment\s*(?:score|result)|evaluation\s*(?:score|result)|score\s*overall)[:\s]*(\d+)[\s/]*10",
+        r"(?:technical\s*(?:skills?|knowledge|competency))[:\s]*(\d+)[\s/]*10",
+        r"(?:communication\s*(?:skills?|ability))[:\s]*(\d+)[\s/]*10",
+        r"(?:problem[\s-]*solving\s*(?:skills?|ability))[:\s]*(\d+)[\s/]*10",
+        r"(?:leadership\s*(?:skills?|ability|quality))[:\s]*(\d+)[\s/]*10",
+    ]
+    scores = []
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        scores.append(int(match.group(1)) if match else 0)
+    if not scores[0]:
+        simple = re.findall(r"(\d+)\s*/\s*10", text)
+        scores[0] = int(simple[0]) if simple else 0
+    weaknesses = re.search(r"(?:weaknesses|areas for improvement|needs improvement):(.*?)(?:\n\n|$)", feedback,
+                           re.DOTALL | re.IGNORECASE)
+    return scores, weaknesses.group(1).strip() if weaknesses else ""
+
+
+class FlakyModel(FakeModel):
+    """Model giả trả JSON sai schema với xác suất invalid_rate"""
+
+    def __init__(self, invalid_rate, seed=0):
+        super().__init__(latency=0)
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        if self.random.random() < self.invalid_rate:
+            return FakeResponse('{"overall": 11, "technical": "eight"}')
+        return FakeResponse(_ASSESSMENT.model_dump_json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000, help="Số lần trích xuất / số yêu cầu")
+    parser.add_argument("--invalid-rate", type=float, nargs="+", default=[0.0, 0.1, 0.3], help="Tỷ lệ JSON sai")
+    args = parser.parse_args()
+
+    payload = _ASSESSMENT.model_dump_json()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        legacy_extract_scores(_FREE_TEXT)
+    legacy_time = (time.perf_counter() - start) / args.repeat
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        parse_structured(InterviewAssessment, payload)
+    structured_time = (time.perf_counter() - start) / args.repeat
+    print(f"score extraction: regex {legacy_time * 1e6:.1f} us, schema validation {structured_time * 1e6:.1f} us "
+          f"({legacy_time / structured_time:.1f}x)\n")
+
+    gemini_helper.configure_rate_limiter(None)
+    gemini_helper.configure_retry_policy(base_delay=0)
+    print(f"max attempts per request: {STRUCTURED_MAX_ATTEMPTS}")
+    print(f"{'invalid rate':>12} | {'requests':>8} | {'calls/req':>9} | {'failed':>7}")
+    print("-" * 46)
+    for rate in args.invalid_rate:
+        model = FlakyModel(rate)
+        failed = 0
+        for number in range(args.repeat):
+            messages = [{"role": "user", "content": f"assess interview {rate} {number}"}]
+            try:
+                generate_response(model, messages, use_cache=False, raise_errors=True,
+                                  response_schema=InterviewAssessment)
+            except GeminiError:
+                failed += 1
+        print(f"{rate:>12.2f} | {args.repeat:>8} | {model.calls / args.repeat:>9.2f} | {failed / args.repeat:>6.1%}")
+    print(f"\n{structured_stats.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Mô hình Gemini giả lập dùng cho benchmark, không cần API key hay mạng
+"""
+import time
+import threading
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Imitates genai.GenerativeModel.generate_content with injectable latency
+
+    Args:
+        latency (float): Seconds each call sleeps before answering
+        reply (str): Text returned for every call
+    """
+
+    def __init__(self, latency=0.1, reply="Đây là câu trả lời giả lập.", model_name="models/fake-model"):
+        self.latency = latency
+        self.reply = reply
+        self.model_name = model_name
+        self._generation_config = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream()
+        time.sleep(self.latency)
+        return FakeResponse(self.reply)
+
+    def _stream(self):
+        # Chia độ trễ đều cho từng từ để mô phỏng mô hình sinh dần
+        words = self.reply.split(" ")
+        for index, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield FakeResponse(word if index == 0 else " " + word)
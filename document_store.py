@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+# File SQLite lưu tài liệu đã tải lên, dùng chung giữa các tiến trình API
+DEFAULT_DOCUMENT_DB = os.getenv(
+    "DOCUMENT_STORE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "documents.db")
+)
+DEFAULT_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX", "10000"))
+
+
+class DocumentStore:
+    """
+    Persistent store of extracted documents in a SQLite file
+
+    The text is kept as a zlib-compressed blob next to its metadata and a
+    precomputed skill profile, keyed by the content digest. The least
+    recently accessed documents are evicted beyond max_entries.
+
+    Args:
+        path (str): Path of the SQLite database file
+        max_entries (int): Maximum number of documents kept
+        compression_level (int): zlib level, 1 (fast) to 9 (small)
+    """
+
+    def __init__(self, path=DEFAULT_DOCUMENT_DB, max_entries=DEFAULT_MAX_DOCUMENTS, compression_level=6):
+        self.path = path
+        self.max_entries = max_entries
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    metadata TEXT NOT NULL,
+                    skill_profile TEXT,
+                    text BLOB NOT NULL,
+                    text_bytes INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_accessed ON documents(accessed_at)")
+
+    def put(self, document_id, text, name=None, metadata=None, skill_profile=None):
+        """
+        Store (or refresh) a document
+
+        Args:
+            document_id (str): Content digest of the original file
+            text (str): Extracted text
+            name (str, optional): Original file name
+            metadata (dict, optional): Extraction metadata
+            skill_profile (dict, optional): Precomputed skill profile
+        """
+        encoded = text.encode("utf-8")
+        compressed = zlib.compress(encoded, self.compression_level)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO documents (id, name, metadata, skill_profile, text, text_bytes, stored_bytes, created_at, accessed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       name = excluded.name,
+                       metadata = excluded.metadata,
+                       skill_profile = COALESCE(excluded.skill_profile, documents.skill_profile),
+                       text = excluded.text,
+                       text_bytes = excluded.text_bytes,
+                       stored_bytes = excluded.stored_bytes,
+                       accessed_at = excluded.accessed_at""",
+                (
+                    document_id,
+                    name,
+                    json.dumps(metadata or {}, ensure_ascii=False),
+                    json.dumps(skill_profile, ensure_ascii=False) if skill_profile is not None else None,
+                    compressed,
+                    len(encoded),
+                    len(compressed),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+
+    def get(self, document_id, include_text=True):
+        """
+        Return a stored document
+
+        Args:
+            document_id (str): Content digest
+            include_text (bool): Decompress and include the text
+
+        Returns:
+            dict: id, name, metadata, skill_profile, created_at and optionally text; None if unknown
+        """
+        columns = "id, name, metadata, skill_profile, created_at" + (", text" if include_text else "")
+        with self._lock, self._conn:
+            row = self._conn.execute(f"SELECT {columns} FROM documents WHERE id = ?", (document_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE documents SET accessed_at = ? WHERE id = ?", (time.time(), document_id))
+
+        document = {
+            "id": row[0],
+            "name": row[1],
+            "metadata": json.loads(row[2]),
+            "skill_profile": json.loads(row[3]) if row[3] else None,
+            "created_at": row[4],
+        }
+        if include_text:
+            document["text"] = zlib.decompress(row[5]).decode("utf-8")
+        return document
+
+    def text(self, document_id):
+        """Return only the text of a document, or None if unknown"""
+        document = self.get(document_id)
+        return document["text"] if document else None
+
+    def set_skill_profile(self, document_id, skill_profile):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE documents SET skill_profile = ? WHERE id = ?",
+                (json.dumps(skill_profile, ensure_ascii=False), document_id),
+            )
+
+    def delete(self, document_id):
+        """Remove a document; returns False if it did not exist"""
+        with self._lock, self._conn:
+            return bool(self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,)).rowcount)
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        if self.max_entries and count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM documents WHERE id IN (SELECT id FROM documents ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self):
+        """
+        Return store counters
+
+        Returns:
+            dict: documents, text_bytes, stored_bytes and compression_ratio
+        """
+        with self._lock:
+            count, text_bytes, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(text_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM documents"
+            ).fetchone()
+        return {
+            "documents": count,
+            "text_bytes": text_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": text_bytes / stored_bytes if stored_bytes else 0.0,
+        }
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
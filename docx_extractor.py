@@ -0,0 +1,278 @@
+import os
+import re
+import zipfile
+from itertools import islice
+from dataclasses import dataclass
+
+from lxml import etree
+
+from file_ingest import FileLimitError
+
+# Giới hạn độ dài văn bản trích xuất; CV dài hơn thế này không còn hữu ích trong prompt
+DOCX_MAX_CHARS = int(os.getenv("DOCX_MAX_CHARS", "200000"))
+
+# Giới hạn kích thước XML sau giải nén, chặn file zip bomb
+DOCX_MAX_XML_BYTES = int(os.getenv("DOCX_MAX_XML_BYTES", str(100 * 1024 * 1024)))
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_PARAGRAPH = _W + "p"
+_TABLE = _W + "tbl"
+_ROW = _W + "tr"
+_CELL = _W + "tc"
+_TEXT = _W + "t"
+_TEXT_BOX = _W + "txbxContent"
+
+# Ký tự tương ứng của các phần tử trong một run
+_RUN_CHARACTERS = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+# Các tag cần đọc; lxml lọc theo tag ở tầng C nên vòng lặp Python chỉ chạy trên các phần tử này.
+# Mã trường (instrText) và văn bản đã xóa (delText) có tag riêng nên tự động bị bỏ qua
+_FLAT_TAGS = (_ROW, _CELL, _PARAGRAPH, _TEXT, *_RUN_CHARACTERS)
+_NESTING_TAGS = (_TABLE, _TEXT_BOX, _MC_FALLBACK)
+_ALL_TAGS = _FLAT_TAGS + _NESTING_TAGS
+
+_HEADER_PART = re.compile(r"^word/(header|footer)\d*\.xml$")
+
+_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, remove_comments=True)
+
+
+class _OutputFull(Exception):
+    """Raised internally once the output cap is reached"""
+
+
+@dataclass
+class DocxExtractionResult:
+    """Text of a DOCX document together with what was found while extracting it"""
+    text: str
+    paragraphs: int = 0
+    tables: int = 0
+    text_boxes: int = 0
+    truncated: bool = False
+
+
+class _Collector:
+    """Collect output lines until the character cap is reached"""
+
+    def __init__(self, max_chars):
+        self.lines = []
+        self.size = 0
+        self.max_chars = max_chars
+        self.result = DocxExtractionResult("")
+
+    def add(self, line):
+        line = line.strip()
+        if not line:
+            return
+        if self.max_chars and self.size + len(line) + 1 > self.max_chars:
+            self.lines.append(line[:max(0, self.max_chars - self.size)])
+            self.result.truncated = True
+            raise _OutputFull()
+        self.lines.append(line)
+        self.size += len(line) + 1
+
+
+def _row_line(cells):
+    # Bỏ các ô trống ở cuối dòng (ô gộp, cột đệm)
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def _is_nested(block):
+    """Whether a paragraph or table holds a nested table, a text box or alternate content"""
+    # iter() trả về chính bảng trước tiên vì nó khớp tag, nên bỏ qua phần tử đầu trong trường hợp đó
+    skip = 1 if block.tag == _TABLE else 0
+    return next(islice(block.iter(*_NESTING_TAGS), skip, None), None) is not None
+
+
+def _flat_paragraph(paragraph, collector):
+    parts = []
+    for element in paragraph.iter(_TEXT, *_RUN_CHARACTERS):
+        parts.append(element.text or "" if element.tag == _TEXT else _RUN_CHARACTERS[element.tag])
+    collector.add("".join(parts))
+    collector.result.paragraphs += 1
+
+
+def _flat_table(table, collector):
+    """Emit a table without nested structures in one pre-order pass over its rows, cells and runs"""
+    collector.result.tables += 1
+    row = cell = None
+    parts = []
+
+    def close_paragraph():
+        if parts:
+            cell.append(" ".join("".join(parts).split()))
+            parts.clear()
+
+    def close_cell():
+        close_paragraph()
+        if cell is not None:
+            row.append(" ".join(text for text in cell if text))
+
+    for element in table.iter(*_FLAT_TAGS):
+        tag = element.tag
+        if tag == _TEXT:
+            parts.append(element.text or "")
+        elif tag in _RUN_CHARACTERS:
+            parts.append(_RUN_CHARACTERS[tag])
+        elif tag == _PARAGRAPH:
+            close_paragraph()
+        elif tag == _CELL:
+            close_cell()
+            cell = []
+        else:
+            close_cell()
+            if row is not None:
+                collector.add(_row_line(row))
+            row, cell = [], None
+    close_cell()
+    if row is not None:
+        collector.add(_row_line(row))
+
+
+def _nested_block(block, collector):
+    """
+    Emit a block holding nested tables, text boxes or alternate content
+
+    Walks start/end events, buffering text per nesting level: a text box is
+    emitted as its own lines, a table inside a cell is folded into the cell
+    (its rows separated by "; ") and mc:Fallback copies of mc:Choice content
+    are skipped.
+    """
+    paragraphs, rows, cells, inner_tables = [], [], [], []
+    skipped = 0
+    for event, element in etree.iterwalk(block, events=("start", "end"), tag=_ALL_TAGS):
+        tag = element.tag
+        if tag == _MC_FALLBACK:
+            skipped += 1 if event == "start" else -1
+            continue
+        if skipped:
+            continue
+
+        if event == "start":
+            if tag == _PARAGRAPH:
+                paragraphs.append([])
+            elif tag == _ROW:
+                rows.append([])
+            elif tag == _CELL:
+                cells.append([])
+            elif tag == _TABLE:
+                collector.result.tables += 1
+                if cells:
+                    inner_tables.append([])
+            elif tag == _TEXT_BOX:
+                collector.result.text_boxes += 1
+            continue
+
+        if tag == _TEXT:
+            if paragraphs:
+                paragraphs[-1].append(element.text or "")
+        elif tag in _RUN_CHARACTERS:
+            if paragraphs:
+                paragraphs[-1].append(_RUN_CHARACTERS[tag])
+        elif tag == _PARAGRAPH:
+            text = "".join(paragraphs.pop())
+            if cells:
+                if text.strip():
+                    cells[-1].append(" ".join(text.split()))
+            else:
+                collector.add(text)
+                collector.result.paragraphs += 1
+        elif tag == _CELL:
+            rows[-1].append(" ".join(cells.pop()))
+        elif tag == _ROW:
+            line = _row_line(rows.pop())
+            if cells:
+                inner_tables[-1].append(line)
+            else:
+                collector.add(line)
+        elif tag == _TABLE and cells:
+            cells[-1].append("; ".join(line for line in inner_tables.pop() if line))
+
+
+def _emit_blocks(parent, collector):
+    """Emit the paragraphs and tables under parent in document order"""
+    for child in parent:
+        tag = child.tag
+        if tag == _PARAGRAPH or tag == _TABLE:
+            if _is_nested(child):
+                _nested_block(child, collector)
+            elif tag == _PARAGRAPH:
+                _flat_paragraph(child, collector)
+            else:
+                _flat_table(child, collector)
+        elif isinstance(tag, str) and len(child):
+            # Khối bọc ngoài (sdt, customXml, ...) chứa đoạn văn và bảng bên trong
+            _emit_blocks(child, collector)
+
+
+def _parse_part(archive, name):
+    info = archive.getinfo(name)
+    if DOCX_MAX_XML_BYTES and info.file_size > DOCX_MAX_XML_BYTES:
+        raise FileLimitError(f"DOCX content is too large ({info.file_size // (1024 * 1024)} MB uncompressed).")
+    with archive.open(info) as part:
+        return etree.parse(part, _PARSER).getroot()
+
+
+def _header_footer_lines(archive, kind):
+    """Distinct lines of all header or footer parts (first page, even and default share most text)"""
+    lines, seen = [], set()
+    for name in sorted(archive.namelist()):
+        match = _HEADER_PART.match(name)
+        if not match or match.group(1) != kind:
+            continue
+        collector = _Collector(0)
+        _emit_blocks(_parse_part(archive, name), collector)
+        for line in collector.lines:
+            if line not in seen:
+                seen.add(line)
+                lines.append(line)
+    return lines
+
+
+def extract_docx_text(stream, max_chars=DOCX_MAX_CHARS):
+    """
+    Extract the text of a DOCX document in a single pass over its XML
+
+    Paragraphs, tables (one line per row, cells separated by " | "), text
+    boxes and content controls are emitted in document order, headers
+    before the body and footers after it.
+
+    Args:
+        stream: Seekable binary stream over the document
+        max_chars (int): Output cap, 0 or None to disable
+
+    Returns:
+        DocxExtractionResult: Joined text (one line per block) and block counts
+
+    Raises:
+        FileLimitError: If a document part exceeds DOCX_MAX_XML_BYTES uncompressed
+        ValueError: If the stream is not a DOCX document
+    """
+    stream.seek(0)
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as e:
+        raise ValueError("File is not a valid DOCX document") from e
+
+    with archive:
+        if "word/document.xml" not in archive.namelist():
+            raise ValueError("File is not a valid DOCX document")
+
+        collector = _Collector(max_chars)
+        try:
+            for line in _header_footer_lines(archive, "header"):
+                collector.add(line)
+            body = _parse_part(archive, "word/document.xml").find(_W + "body")
+            if body is not None:
+                _emit_blocks(body, collector)
+            for line in _header_footer_lines(archive, "footer"):
+                collector.add(line)
+        except _OutputFull:
+            pass
+
+    result = collector.result
+    result.text = "\n".join(collector.lines) + "\n" if collector.lines else ""
+    return result
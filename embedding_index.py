@@ -0,0 +1,299 @@
+import os
+import re
+import zlib
+import hashlib
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from response_cache import LRUCache
+from skill_matcher import get_skill_matcher
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Mô hình embedding cục bộ (sentence-transformers, chạy trên CPU); để trống để dùng vector n-gram băm
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+
+_WORD = re.compile(r"[^\W_][\w+#.]*[\w+#]|[^\W_]")
+
+
+class HashedNgramEmbedder:
+    """
+    Dependency-free embedder hashing character n-grams and words into a fixed-size vector
+
+    Catches spelling and morphological variants ("micro-services" and
+    "microservices", "Postgre SQL" and "PostgreSQL") but not synonyms; set
+    EMBEDDING_MODEL to use a local sentence-transformers model for those.
+
+    Args:
+        dim (int): Vector size
+        ngram_range (tuple): Character n-gram sizes, taken within words padded with spaces
+    """
+
+    # Ngưỡng cosine để xem một cụm từ là liên quan đến một kỹ năng, và hai câu là lặp lại
+    # (câu hỏi cùng khuôn mẫu nhưng khác chủ đề đã đạt ~0.75 nên chỉ bắt được câu gần như nguyên văn)
+    related_threshold = 0.45
+    duplicate_threshold = 0.9
+
+    def __init__(self, dim=EMBEDDING_DIM, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashed-ngram-{dim}"
+
+    def _features(self, text):
+        words = _WORD.findall(text.lower())
+        features = [word for word in words]
+        features.extend(f"{first} {second}" for first, second in zip(words, words[1:]))
+        low, high = self.ngram_range
+        for word in words:
+            padded = f" {word} "
+            for size in range(low, high + 1):
+                features.extend(padded[start:start + size] for start in range(len(padded) - size + 1))
+        return features
+
+    def embed(self, texts):
+        """
+        Embed texts
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), dim) with L2-normalized rows
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # crc32 ổn định giữa các tiến trình (khác hash() của Python), bit cao quyết định dấu
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                                 dtype=np.uint32)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        # Tần suất dạng log để từ lặp lại nhiều lần không lấn át
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embedder backed by a local sentence-transformers model (CPU)
+
+    Args:
+        model_name (str): Model name or path, e.g. "paraphrase-multilingual-MiniLM-L12-v2"
+    """
+
+    related_threshold = 0.6
+    duplicate_threshold = 0.85
+
+    def __init__(self, model_name):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """Return the configured embedder: the local model when EMBEDDING_MODEL is set and installed, else hashed n-grams"""
+    if EMBEDDING_MODEL and SentenceTransformer is not None:
+        return SentenceTransformerEmbedder(EMBEDDING_MODEL)
+    return HashedNgramEmbedder()
+
+
+# Embedding đã tính, theo digest của (embedder, nội dung)
+embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+
+
+def _content_key(embedder, text):
+    return hashlib.blake2b(f"{embedder.name}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+
+def embed_texts(texts, embedder=None):
+    """
+    Embed texts, computing only those not cached yet (in one batch)
+
+    Args:
+        texts (list): Texts to embed
+        embedder: Embedder to use, get_embedder() by default
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(texts), dim)
+    """
+    embedder = embedder or get_embedder()
+    keys = [_content_key(embedder, text) for text in texts]
+    vectors = np.empty((len(texts), embedder.dim), dtype=np.float32)
+    missing = []
+    for row, key in enumerate(keys):
+        cached = embedding_cache.get(key)
+        if cached is None:
+            missing.append(row)
+        else:
+            vectors[row] = cached
+    if missing:
+        computed = embedder.embed([texts[row] for row in missing])
+        for row, vector in zip(missing, computed):
+            vectors[row] = vector
+            embedding_cache.set(keys[row], vector)
+    return vectors
+
+
+class EmbeddingIndex:
+    """
+    Vectors of a growing set of texts, kept in one contiguous float32 matrix
+
+    Texts are deduplicated by content, and queries are answered in batch with
+    one matrix product and a partial sort per query.
+
+    Args:
+        embedder: Embedder to use, get_embedder() by default
+        capacity (int): Initial number of rows; the matrix doubles when full
+    """
+
+    def __init__(self, embedder=None, capacity=256):
+        self.embedder = embedder or get_embedder()
+        self._matrix = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        self._texts = []
+        self._payloads = []
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, texts, payloads=None):
+        """
+        Add texts (already indexed texts are skipped)
+
+        Args:
+            texts (list): Texts to add
+            payloads (list, optional): Value returned by search for each text, the text itself by default
+        """
+        payloads = payloads if payloads is not None else texts
+        with self._lock:
+            new = {text: payload for text, payload in zip(texts, payloads) if text and text not in self._rows}
+        if not new:
+            return
+        # Tính embedding ngoài khóa; lọc lại trong khóa vì một lệnh add khác có thể đã thêm cùng văn bản
+        computed = dict(zip(new, embed_texts(list(new), self.embedder)))
+        with self._lock:
+            new = [(text, payload) for text, payload in new.items() if text not in self._rows]
+            if not new:
+                return
+            vectors = np.stack([computed[text] for text, _ in new])
+            size = len(self._texts)
+            if size + len(new) > len(self._matrix):
+                grown = np.zeros((max(2 * len(self._matrix), size + len(new)), self.embedder.dim), dtype=np.float32)
+                grown[:size] = self._matrix[:size]
+                self._matrix = grown
+            self._matrix[size:size + len(new)] = vectors
+            for offset, (text, payload) in enumerate(new):
+                self._rows[text] = size + offset
+                self._texts.append(text)
+                self._payloads.append(payload)
+
+    def search(self, queries, k=5, min_score=None):
+        """
+        Find the k most similar indexed texts for each query
+
+        Args:
+            queries (list): Query texts
+            k (int): Results per query
+            min_score (float, optional): Drop results below this cosine similarity
+
+        Returns:
+            list: One list per query of (payload, score) pairs, best first
+        """
+        if not queries or not self._texts or k < 1:
+            return [[] for _ in queries]
+        with self._lock:
+            matrix = self._matrix[:len(self._texts)]
+            scores = embed_texts(list(queries), self.embedder) @ matrix.T
+        k = min(k, scores.shape[1])
+        # argpartition chọn k phần tử lớn nhất mỗi dòng mà không sắp xếp cả dòng
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, columns in enumerate(top):
+            columns = columns[np.argsort(-scores[row, columns], kind="stable")]
+            results.append([(self._payloads[column], float(scores[row, column])) for column in columns
+                            if min_score is None or scores[row, column] >= min_score])
+        return results
+
+
+def skill_text(name):
+    """Text embedded for a skill: its canonical name followed by its aliases"""
+    aliases = [alias for alias in get_skill_matcher().aliases(name) if alias != name.lower()]
+    return ", ".join([name] + aliases)
+
+
+@lru_cache(maxsize=1)
+def get_skill_index():
+    """Return the embedding index of the taxonomy skills (payload: canonical name)"""
+    index = EmbeddingIndex(capacity=len(get_skill_matcher().skills))
+    names = list(get_skill_matcher().skills)
+    index.add([skill_text(name) for name in names], names)
+    return index
+
+
+def related_skills(text, k=10, min_score=None):
+    """
+    Find the taxonomy skills closest to a free text (a job role, a requirement line)
+
+    Returns:
+        list: (skill name, score) pairs, best first
+    """
+    threshold = get_embedder().related_threshold if min_score is None else min_score
+    return get_skill_index().search([text], k=k, min_score=threshold)[0]
+
+
+# Cụm từ được so với kỹ năng: tách theo dấu câu và liên từ, bỏ cụm quá dài (làm loãng vector)
+_PHRASE_SPLIT = re.compile(r"[,;:()\[\]|•\n/]|\.\s|\s(?:and|with|và|với)\s", re.IGNORECASE)
+MAX_PHRASE_WORDS = 8
+MAX_PHRASES = 5000
+
+
+def split_phrases(text):
+    """Split a text into short phrases (at most MAX_PHRASE_WORDS words, MAX_PHRASES phrases)"""
+    phrases = []
+    for part in _PHRASE_SPLIT.split(text or ""):
+        part = " ".join(part.split()).strip(" .-*")
+        if part and len(part.split()) <= MAX_PHRASE_WORDS:
+            phrases.append(part)
+    return list(dict.fromkeys(phrases))[:MAX_PHRASES]
+
+
+def nearest_skill_mentions(text, min_score=None):
+    """
+    Find skills mentioned in a text under a form the skill matcher does not know
+
+    Each phrase of the text is attributed to its nearest taxonomy skill when
+    the similarity reaches the embedder's threshold. Requiring the skill to be
+    the nearest one keeps "JavaScript" from counting as a mention of "Java".
+
+    Args:
+        text (str): Text to scan (a resume, a question)
+        min_score (float, optional): Similarity threshold, the embedder's related_threshold by default
+
+    Returns:
+        dict: {skill: (phrase, score)} with the best phrase for each skill
+    """
+    threshold = get_embedder().related_threshold if min_score is None else min_score
+    phrases = split_phrases(text)
+    mentions = {}
+    for phrase, results in zip(phrases, get_skill_index().search(phrases, k=1, min_score=threshold)):
+        for skill, score in results:
+            if skill not in mentions or score > mentions[skill][1]:
+                mentions[skill] = (phrase, round(score, 3))
+    return mentions
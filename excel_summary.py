@@ -0,0 +1,311 @@
+import os
+from itertools import chain, islice
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from file_ingest import MAX_SHEET_ROWS
+
+# Số dòng mẫu và số cột tối đa đưa vào bản tóm tắt của mỗi sheet
+EXCEL_SAMPLE_ROWS = int(os.getenv("EXCEL_SAMPLE_ROWS", "10"))
+EXCEL_MAX_COLUMNS = int(os.getenv("EXCEL_MAX_COLUMNS", "50"))
+EXCEL_TOP_VALUES = 5
+
+# Dòng tiêu đề được tìm trong các dòng đầu tiên (bỏ qua tiêu đề bảng, dòng ghi chú phía trên)
+HEADER_SCAN_ROWS = 10
+
+# Dòng được gom thành DataFrame theo từng khối để không giữ cả sheet dưới dạng tuple Python
+CHUNK_ROWS = 5000
+
+# Cột có ít nhất tỷ lệ này giá trị là số được xem là cột số (các ô còn lại như "-", "N/A" bị bỏ qua)
+NUMERIC_RATIO = 0.8
+
+_NUMERIC_TYPES = {"integer", "floating", "mixed-integer-float", "decimal"}
+_DATETIME_TYPES = {"datetime", "datetime64", "date"}
+
+
+@dataclass
+class SheetSummary:
+    """Columnar summary of one worksheet"""
+    name: str
+    row_count: int
+    column_count: int = 0
+    header_row: int = None
+    title: str = None
+    truncated: bool = False
+    columns: list = field(default_factory=list)
+    sample: pd.DataFrame = None
+
+
+@dataclass
+class WorkbookSummary:
+    """Summaries of every non-empty sheet of a workbook"""
+    sheets: list = field(default_factory=list)
+
+    @property
+    def row_count(self):
+        return sum(sheet.row_count for sheet in self.sheets)
+
+    def to_text(self):
+        """Render the summary as a compact prompt-friendly text"""
+        if not self.sheets:
+            return "Excel file contains no data."
+        parts = [f"Excel workbook: {len(self.sheets)} sheet(s)"]
+        parts.extend(_format_sheet(sheet) for sheet in self.sheets)
+        return "\n\n".join(parts)
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _row_limit(max_rows):
+    # Dòng không trống cần đọc: tối đa HEADER_SCAN_ROWS + 1 dòng đầu, max_rows dòng dữ liệu
+    # và một dòng nữa để biết sheet còn dữ liệu (truncated)
+    return max_rows + HEADER_SCAN_ROWS + 2
+
+
+def _stream_xlsx_sheets(stream, max_rows):
+    """Yield (sheet name, iterator over non-empty rows) reading each sheet lazily in read-only mode"""
+    # openpyxl chỉ cần khi đọc .xlsx, không phải phụ thuộc lúc import của ứng dụng
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading .xlsx files requires the openpyxl package.")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            # Giới hạn theo số dòng không trống: dòng trống xen giữa không làm mất dữ liệu phía sau,
+            # và openpyxl ngừng đọc XML của sheet khi đã đủ dòng
+            non_empty = (row for row in rows if not all(_is_empty(value) for value in row))
+            yield worksheet.title, islice(non_empty, _row_limit(max_rows))
+    finally:
+        workbook.close()
+
+
+def _read_xls_sheets(stream, max_rows):
+    """Yield sheets of a legacy .xls workbook (not streamable, read with pandas)"""
+    # nrows của pandas đếm cả dòng trống nên không dùng; giới hạn áp dụng sau khi bỏ dòng trống
+    frames = pd.read_excel(stream, sheet_name=None, header=None)
+    for name, frame in frames.items():
+        frame = frame.dropna(how="all").iloc[:_row_limit(max_rows)]
+        frame = frame.astype(object).where(frame.notna(), None)
+        yield str(name), frame.itertuples(index=False, name=None)
+
+
+def detect_header_row(rows, scan_rows=HEADER_SCAN_ROWS):
+    """
+    Find the header row among the first rows of a sheet
+
+    A header row has text in at least half of the sheet's columns, only text
+    cells, no repeated labels, and at least one row below it.
+
+    Args:
+        rows (list): Non-empty rows of the sheet as tuples
+        scan_rows (int): Number of leading rows inspected
+
+    Returns:
+        int: Index of the header row in rows, or None if no row looks like a header
+    """
+    width = max((len(row) for row in rows[:scan_rows]), default=0)
+    for index, row in enumerate(rows[:scan_rows]):
+        if index + 1 >= len(rows):
+            break
+        values = [value for value in row if not _is_empty(value)]
+        if len(values) < max(1, width / 2) or not all(isinstance(value, str) for value in values):
+            continue
+        labels = [value.strip().lower() for value in values]
+        if len(set(labels)) == len(labels):
+            return index
+    return None
+
+
+def _column_names(header, width):
+    names, seen = [], {}
+    for index in range(width):
+        value = header[index] if header is not None and index < len(header) else None
+        name = str(value).strip() if not _is_empty(value) else f"Column {index + 1}"
+        # Tên trùng được đánh số như pandas (skill, skill.1, ...)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _title(rows):
+    # Các dòng phía trên dòng tiêu đề thường là tên bảng hoặc ghi chú
+    return " / ".join(" ".join(str(value).strip() for value in row if not _is_empty(value)) for row in rows)
+
+
+def _format_number(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def summarize_column(series):
+    """
+    Compute vectorized statistics of one column
+
+    Args:
+        series (pd.Series): Values of the column, None/NaN for empty cells
+
+    Returns:
+        dict: name, type, count and missing, plus min/max/mean/median for numeric
+              columns, min/max for dates, distinct and top values for text
+    """
+    values = series.dropna()
+    if not pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_datetime64_any_dtype(values):
+        # Ô chỉ có khoảng trắng được xem là ô trống
+        values = values[values.astype(str).str.strip() != ""]
+    summary = {"name": series.name, "count": int(len(values)), "missing": int(len(series) - len(values))}
+    if values.empty:
+        summary["type"] = "empty"
+        return summary
+
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    numeric = None
+    if kind in _NUMERIC_TYPES:
+        numeric = values.astype(float)
+    elif kind not in _DATETIME_TYPES and kind != "boolean":
+        coerced = pd.to_numeric(values, errors="coerce")
+        if coerced.notna().mean() >= NUMERIC_RATIO:
+            numeric = coerced.dropna().astype(float)
+            summary["non_numeric"] = int(len(values) - len(numeric))
+
+    if numeric is not None:
+        summary["type"] = "integer" if (numeric % 1 == 0).all() else "number"
+        summary.update(min=numeric.min(), max=numeric.max(), mean=numeric.mean(), median=numeric.median())
+    elif kind in _DATETIME_TYPES:
+        dates = pd.to_datetime(values, errors="coerce").dropna()
+        summary["type"] = "date"
+        summary.update(min=dates.min(), max=dates.max())
+    elif kind == "boolean":
+        summary["type"] = "boolean"
+        summary["true"] = int(values.astype(bool).sum())
+    else:
+        text = values.astype(str).str.strip()
+        counts = text.value_counts()
+        summary["type"] = "text"
+        summary["distinct"] = int(len(counts))
+        # Chỉ liệt kê giá trị phổ biến khi có giá trị lặp lại (cột danh mục như kỹ năng, cấp độ)
+        repeated = counts[counts > 1]
+        summary["top"] = list(repeated.head(EXCEL_TOP_VALUES).items())
+        summary["mean_length"] = float(text.str.len().mean())
+    return summary
+
+
+def _read_frame(rows, max_rows):
+    """Consume rows into a DataFrame CHUNK_ROWS at a time; returns (frame, truncated)"""
+    frames, count = [], 0
+    while count < max_rows:
+        chunk = list(islice(rows, min(CHUNK_ROWS, max_rows - count)))
+        if not chunk:
+            return (pd.concat(frames, ignore_index=True) if frames else None), False
+        frames.append(pd.DataFrame.from_records(chunk))
+        count += len(chunk)
+    truncated = next(rows, None) is not None
+    return pd.concat(frames, ignore_index=True), truncated
+
+
+def summarize_sheet(name, rows, sample_rows=EXCEL_SAMPLE_ROWS, max_columns=EXCEL_MAX_COLUMNS, max_rows=MAX_SHEET_ROWS):
+    """
+    Build the columnar summary of a sheet from its non-empty rows
+
+    Args:
+        name (str): Sheet name
+        rows (iterable): Non-empty rows as tuples, header included
+        sample_rows (int): Number of data rows kept as a sample
+        max_columns (int): Number of columns summarized
+        max_rows (int): Maximum number of data rows read
+
+    Returns:
+        SheetSummary: The summary, or None if the sheet holds no data
+    """
+    rows = iter(rows)
+    head = list(islice(rows, HEADER_SCAN_ROWS + 1))
+    header_index = detect_header_row(head)
+    start = header_index + 1 if header_index is not None else 0
+    frame, truncated = _read_frame(chain(head[start:], rows), max_rows)
+    if frame is None:
+        return None
+
+    frame.columns = _column_names(head[header_index] if header_index is not None else None, frame.shape[1])
+    frame = frame.dropna(axis=1, how="all")
+
+    summary = SheetSummary(
+        name=name,
+        row_count=len(frame),
+        column_count=frame.shape[1],
+        header_row=header_index + 1 if header_index is not None else None,
+        title=_title(head[:header_index]) if header_index else None,
+        truncated=truncated,
+    )
+    summary.columns = [summarize_column(frame[column]) for column in frame.columns[:max_columns]]
+    summary.sample = frame.iloc[:sample_rows, :max_columns]
+    return summary
+
+
+def _format_column(column):
+    line = f"- {column['name']}: {column['type']}"
+    kind = column["type"]
+    if kind in ("integer", "number"):
+        line += (f", min {_format_number(column['min'])}, max {_format_number(column['max'])}, "
+                 f"mean {_format_number(column['mean'])}, median {_format_number(column['median'])}")
+        if column.get("non_numeric"):
+            line += f", {column['non_numeric']} non-numeric"
+    elif kind == "date":
+        line += f", from {column['min']:%Y-%m-%d} to {column['max']:%Y-%m-%d}"
+    elif kind == "boolean":
+        line += f", {column['true']} of {column['count']} true"
+    elif kind == "text":
+        line += f", {column['distinct']} distinct"
+        if column["top"]:
+            line += ", top: " + ", ".join(f"{value} ({count})" for value, count in column["top"])
+    if column["missing"]:
+        line += f", {column['missing']} missing"
+    return line
+
+
+def _format_sheet(sheet):
+    header = "header row detected" if sheet.header_row else "no header row"
+    lines = [f'Sheet "{sheet.name}": {sheet.row_count} rows x {sheet.column_count} columns ({header})']
+    if sheet.title:
+        lines.append(f"Title: {sheet.title}")
+    if sheet.truncated:
+        lines.append(f"(Only the first {sheet.row_count} rows were read.)")
+    lines.append("Columns:")
+    lines.extend(_format_column(column) for column in sheet.columns)
+    if sheet.column_count > len(sheet.columns):
+        lines.append(f"({sheet.column_count - len(sheet.columns)} more columns not summarized)")
+    lines.append(f"Sample (first {len(sheet.sample)} of {sheet.row_count} rows):")
+    lines.append(sheet.sample.to_string(index=False, max_colwidth=40, na_rep=""))
+    return "\n".join(lines)
+
+
+def summarize_workbook(stream, legacy_xls=False, max_rows=MAX_SHEET_ROWS):
+    """
+    Summarize every sheet of a workbook as column statistics plus a capped sample
+
+    .xlsx files are streamed row by row (openpyxl read-only) so only the
+    non-empty rows are kept; legacy .xls files are read with pandas.
+
+    Args:
+        stream: Seekable binary stream over the workbook
+        legacy_xls (bool): Whether the file is in the legacy .xls format
+        max_rows (int): Maximum number of rows read per sheet
+
+    Returns:
+        WorkbookSummary: Summary of the non-empty sheets
+    """
+    reader = _read_xls_sheets if legacy_xls else _stream_xlsx_sheets
+    workbook = WorkbookSummary()
+    for name, rows in reader(stream, max_rows):
+        sheet = summarize_sheet(name, rows, max_rows=max_rows)
+        if sheet is not None:
+            workbook.sheets.append(sheet)
+    return workbook
@@ -0,0 +1,388 @@
+import io
+import os
+import importlib.util
+import zipfile
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from file_ingest import decode_text
+from pdf_extractor import extract_pdf_text
+from docx_extractor import extract_docx_text, DOCX_MAX_CHARS
+from excel_summary import summarize_workbook
+from ocr_engine import ocr_available, ocr_image, ocr_pdf, OCR_MAX_PAGES
+
+# Gợi ý chi phí của extractor, dùng để chọn nơi chạy
+COST_IO = "io"      # chủ yếu đọc/giải mã, chạy ngay trong thread gọi
+COST_CPU = "cpu"    # phân tích nặng bằng Python, nên chạy trong process pool
+
+# Tài liệu nhỏ hơn ngưỡng này được trích xuất tại chỗ, không đáng chi phí gửi sang tiến trình khác
+EXTRACT_PROCESS_MIN_BYTES = int(os.getenv("EXTRACT_PROCESS_MIN_BYTES", str(256 * 1024)))
+EXTRACT_PROCESS_WORKERS = int(os.getenv("EXTRACT_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Số byte đầu file dùng để nhận dạng định dạng
+SNIFF_BYTES = 8192
+
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+# Tên stream của sổ tính Excel trong thư mục OLE (BIFF8 và BIFF5), dạng UTF-16 có ký tự kết thúc
+_OLE_WORKBOOK_NAMES = {"Workbook\0".encode("utf-16-le"), "Book\0".encode("utf-16-le")}
+_OLE_ENTRY_SIZE = 128
+_OLE_STREAM_ENTRY = 2
+_ZIP_MAGIC = b"PK\x03\x04"
+_IMAGE_MAGIC = {b"\x89PNG\r\n\x1a\n": "png", b"\xff\xd8\xff": "jpeg"}
+
+
+@dataclass(frozen=True)
+class Extractor:
+    """A registered extractor and how it should be run"""
+    kind: str
+    function: object
+    extensions: tuple
+    cost: str = COST_IO
+    # Extractor tự chia việc cho process pool riêng (PDF lớn, OCR), không cần chuyển sang pool khác
+    own_pool: bool = False
+
+
+@dataclass
+class ExtractionResult:
+    """Text extracted by an extractor, with metadata and non-fatal warnings"""
+    text: str
+    metadata: dict = field(default_factory=dict)
+    warnings: list = field(default_factory=list)
+    # False khi thiếu một phần nội dung (trang quá thời gian, ...); kết quả như vậy không được cache
+    complete: bool = True
+
+
+_EXTRACTORS = {}
+_BY_EXTENSION = {}
+
+
+def extractor(kind, extensions, cost=COST_IO, own_pool=False):
+    """
+    Register a function as the extractor of a file kind
+
+    The function receives a seekable binary stream and the file name and
+    returns an ExtractionResult. It reports failures by raising (ValueError,
+    FileLimitError) and never touches the UI, so the same extractor serves
+    the Streamlit app, the API and background jobs.
+
+    Args:
+        kind (str): Kind name, also reported as the file_type metadata
+        extensions (tuple): File extensions handled, without the dot
+        cost (str): COST_IO or COST_CPU
+        own_pool (bool): The extractor already spreads its work over a process pool
+    """
+    def decorator(fn):
+        entry = Extractor(kind, fn, tuple(extensions), cost, own_pool)
+        _EXTRACTORS[kind] = entry
+        for extension in extensions:
+            _BY_EXTENSION[extension] = entry
+        return fn
+    return decorator
+
+
+def registered_extractors():
+    """Return the registered extractors by kind"""
+    return dict(_EXTRACTORS)
+
+
+def supported_extensions():
+    """Return the file extensions that have an extractor"""
+    return sorted(_BY_EXTENSION)
+
+
+def _extension(name):
+    return name.rsplit(".", 1)[-1].lower() if name and "." in name else ""
+
+
+def _looks_like_text(head):
+    if b"\x00" in head:
+        return False
+    try:
+        # Ký tự nhiều byte có thể bị cắt ở cuối đoạn đầu file
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return e.start >= len(head) - 3
+    return True
+
+
+def _starts_with(stream, magic):
+    stream.seek(0)
+    head = stream.read(len(magic))
+    stream.seek(0)
+    return head == magic
+
+
+def _has_ole_workbook(stream):
+    """Whether an OLE2 compound file has a Workbook stream, i.e. is an Excel file and not a .doc/.ppt/.msg"""
+    stream.seek(0)
+    try:
+        # Các mục thư mục dài 128 byte và luôn thẳng hàng với sector, nên chỉ cần xét các vị trí bội 128
+        while True:
+            chunk = stream.read(_OLE_ENTRY_SIZE * 512)
+            if not chunk:
+                return False
+            for start in range(0, len(chunk) - _OLE_ENTRY_SIZE + 1, _OLE_ENTRY_SIZE):
+                entry = chunk[start:start + _OLE_ENTRY_SIZE]
+                name_size = int.from_bytes(entry[64:66], "little")
+                if entry[66] == _OLE_STREAM_ENTRY and entry[:name_size] in _OLE_WORKBOOK_NAMES:
+                    return True
+    finally:
+        stream.seek(0)
+
+
+def sniff_kind(stream):
+    """
+    Identify the kind of a file from its first bytes
+
+    Args:
+        stream: Seekable binary stream positioned anywhere
+
+    Returns:
+        str: Kind name ("pdf", "docx", "xlsx", "xls", "image" or "txt"), or None if unknown
+
+    Raises:
+        ValueError: If the file is empty
+    """
+    stream.seek(0)
+    head = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    if not head:
+        raise ValueError("The file is empty.")
+    # Đặc tả PDF cho phép vài byte rác trước phần header
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if any(head.startswith(magic) for magic in _IMAGE_MAGIC):
+        return "image"
+    if head.startswith(_OLE_MAGIC):
+        # .doc, .ppt, .msg cũng là tệp OLE2, chỉ sổ tính Excel có stream Workbook
+        return "xls" if _has_ole_workbook(stream) else None
+    if head.startswith(_ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(stream) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            return None
+        finally:
+            stream.seek(0)
+        if "word/document.xml" in names:
+            return "docx"
+        if "xl/workbook.xml" in names:
+            return "xlsx"
+        return None
+    if _looks_like_text(head):
+        return "txt"
+    return None
+
+
+def resolve_extractor(stream, name):
+    """
+    Pick the extractor of an upload, trusting its content over its extension
+
+    Only extensions with a registered extractor are accepted. Binary
+    formats are then recognized by their magic bytes; plain text is only
+    accepted under the .txt extension.
+
+    Args:
+        stream: Seekable binary stream over the upload
+        name (str): File name
+
+    Returns:
+        Extractor: The extractor to run
+
+    Raises:
+        ValueError: If the file is empty, or its format is not supported or does not match the extension
+    """
+    extension = _extension(name)
+    by_extension = _BY_EXTENSION.get(extension)
+    if by_extension is None:
+        # Danh sách đuôi file được phép: tệp văn bản mang đuôi lạ (.exe, .html, ...) không được đọc như .txt
+        raise ValueError(f"Unsupported file format: {extension or 'unknown'}")
+    kind = sniff_kind(stream)
+    if kind and kind != "txt":
+        return _EXTRACTORS[kind]
+    if kind == "txt" and by_extension.kind == "txt":
+        return _EXTRACTORS["txt"]
+    if kind is None and extension == "xls" and _starts_with(stream, _OLE_MAGIC):
+        # Tệp OLE2 mang đuôi .xls mà không tìm thấy stream Workbook: vẫn để trình đọc .xls thử
+        return _EXTRACTORS["xls"]
+    raise ValueError(f"File content does not match its .{extension} extension. The file may be damaged.")
+
+
+def run_extractor(kind, source, name):
+    """
+    Run the extractor of a kind on bytes or a stream
+
+    Top-level so it can be submitted to a process pool.
+
+    Returns:
+        ExtractionResult: The extraction result
+    """
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    stream.seek(0)
+    return _EXTRACTORS[kind].function(stream, name)
+
+
+class ExtractionRouter:
+    """
+    Run extractors where their cost hint says they belong
+
+    CPU-heavy extractors (DOCX, Excel) on documents of at least min_bytes run
+    in a spawn-based process pool; everything else runs in the calling
+    thread. If the pool breaks, the extraction is retried in the calling
+    thread and the pool is recreated on the next use.
+
+    Args:
+        process_workers (int): Size of the process pool, 0 to always run inline
+        min_bytes (int): Size from which CPU-heavy extractions are sent to the pool
+    """
+
+    def __init__(self, process_workers=EXTRACT_PROCESS_WORKERS, min_bytes=EXTRACT_PROCESS_MIN_BYTES):
+        self.process_workers = process_workers
+        self.min_bytes = min_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+        # Bộ đếm được cập nhật từ nhiều thread của threadpool
+        self._stats_lock = threading.Lock()
+        self.routed = {"inline": 0, "process": 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _use_process(self, entry, size):
+        return (self.process_workers > 0 and entry.cost == COST_CPU and not entry.own_pool
+                and size is not None and size >= self.min_bytes)
+
+    def __call__(self, entry, stream, name, size=None):
+        if self._use_process(entry, size):
+            stream.seek(0)
+            data = stream.read()
+            try:
+                result = self._get_executor().submit(run_extractor, entry.kind, data, name).result()
+                self._count("process")
+                return result
+            except BrokenProcessPool:
+                self._reset_executor()
+        self._count("inline")
+        return run_extractor(entry.kind, stream, name)
+
+    def _count(self, route):
+        with self._stats_lock:
+            self.routed[route] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            routed = dict(self.routed)
+        return {"process_workers": self.process_workers, "min_bytes": self.min_bytes, **routed}
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+@extractor("txt", ("txt",))
+def extract_txt(stream, name):
+    try:
+        return ExtractionResult(decode_text(stream))
+    except UnicodeDecodeError as e:
+        raise ValueError("Text file is not valid UTF-8") from e
+
+
+def _ocr_scanned_pdf(stream, page_count, result):
+    """Nhận dạng PDF scan qua ảnh nhúng trong các trang"""
+    if not ocr_available():
+        result.text = "PDF file contains no extractable text content."
+        return result
+
+    ocr = ocr_pdf(stream)
+    if ocr is None or not ocr.text:
+        result.text = "PDF file contains no extractable text content."
+        return result
+
+    result.text = ocr.text
+    result.metadata["ocr"] = True
+    if ocr.failed_pages:
+        result.complete = False
+        result.warnings.append(f"Could not recognize text on page(s): {', '.join(str(page) for page in ocr.failed_pages)}")
+    if page_count > OCR_MAX_PAGES:
+        result.warnings.append(f"Only the first {OCR_MAX_PAGES} pages of the scanned PDF were recognized.")
+    return result
+
+
+@extractor("pdf", ("pdf",), cost=COST_CPU, own_pool=True)
+def extract_pdf(stream, name):
+    pdf = extract_pdf_text(stream)
+    result = ExtractionResult(pdf.text, {"page_count": pdf.page_count})
+
+    skipped_pages = sorted(pdf.timed_out_pages + pdf.failed_pages)
+    if skipped_pages:
+        result.complete = False
+        result.warnings.append(f"Could not extract text from page(s): {', '.join(str(page) for page in skipped_pages)}")
+
+    if not pdf.text.strip():
+        # PDF scan không có lớp văn bản: nhận dạng ảnh của từng trang
+        return _ocr_scanned_pdf(stream, pdf.page_count, result)
+    return result
+
+
+@extractor("docx", ("docx",), cost=COST_CPU)
+def extract_docx(stream, name):
+    docx = extract_docx_text(stream)
+    result = ExtractionResult(docx.text, {"table_count": docx.tables})
+    if not docx.text.strip():
+        result.text = "DOCX file contains no text content."
+    if docx.truncated:
+        result.warnings.append(f"The document is long; only the first {DOCX_MAX_CHARS:,} characters were extracted.")
+    return result
+
+
+def _extract_workbook(stream, legacy_xls):
+    workbook = summarize_workbook(stream, legacy_xls=legacy_xls)
+    return ExtractionResult(workbook.to_text(), {"sheet_count": len(workbook.sheets), "row_count": workbook.row_count})
+
+
+@extractor("xlsx", ("xlsx",), cost=COST_CPU)
+def extract_xlsx(stream, name):
+    return _extract_workbook(stream, legacy_xls=False)
+
+
+@extractor("xls", ("xls",), cost=COST_CPU)
+def extract_xls(stream, name):
+    if importlib.util.find_spec("xlrd") is None:
+        raise ValueError("Reading legacy .xls files requires the xlrd package (pip install .[xls]); save the file as .xlsx instead.")
+    return _extract_workbook(stream, legacy_xls=True)
+
+
+@extractor("image", ("jpg", "jpeg", "png"), cost=COST_CPU, own_pool=True)
+def extract_image(stream, name):
+    # Image.open chỉ đọc phần header để lấy kích thước
+    image = Image.open(stream)
+    width, height = image.size
+    metadata = {"format": image.format.lower() if image.format else None, "width": width, "height": height}
+
+    complete = True
+    if ocr_available():
+        ocr = ocr_image(stream)
+        complete = not ocr.failed_pages
+        if ocr.text:
+            metadata["ocr"] = True
+            return ExtractionResult(ocr.text, metadata, complete=complete)
+
+    # Không có OCR hoặc ảnh không chứa chữ: chỉ mô tả ảnh
+    text = f"Image file uploaded. Format: {image.format}, Size: {width}x{height}, Mode: {image.mode}.\n"
+    text += "Please describe the content of your image for analysis."
+    return ExtractionResult(text, metadata, complete=complete)
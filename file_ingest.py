@@ -0,0 +1,207 @@
+import io
+import os
+import codecs
+import hashlib
+import tempfile
+
+# Giới hạn kiểm tra trước khi phân tích file, cấu hình qua biến môi trường
+MAX_FILE_BYTES = int(os.getenv("FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("FILE_MAX_PAGES", "300"))
+MAX_SHEET_ROWS = int(os.getenv("FILE_MAX_ROWS", "100000"))
+
+# Dữ liệu tải lên từ nguồn không seek được giữ trong RAM tới ngưỡng này rồi chuyển sang file tạm
+SPOOL_MEMORY_BYTES = int(os.getenv("FILE_SPOOL_MEMORY", str(5 * 1024 * 1024)))
+
+READ_CHUNK_BYTES = 64 * 1024
+
+# Kích thước digest BLAKE2b (byte); 20 byte = 40 ký tự hex
+DIGEST_SIZE = 20
+
+
+class FileLimitError(ValueError):
+    """Raised when an upload exceeds a configured size or page limit"""
+
+
+class NamedUpload:
+    """
+    Give a plain binary stream the name/type/size attributes of an UploadedFile
+
+    Used for uploads that do not come from Streamlit, e.g. the spooled file
+    of a multipart request. Every other attribute is delegated to the stream.
+
+    Args:
+        stream: Seekable binary file object
+        name (str): Original file name
+        type (str, optional): MIME type reported by the client
+        size (int, optional): Size in bytes if known
+    """
+
+    def __init__(self, stream, name, type=None, size=None):
+        self._stream = stream
+        self.name = name
+        self.type = type or "application/octet-stream"
+        self.size = size if size is not None else upload_size(stream)
+
+    def __getattr__(self, attribute):
+        return getattr(self._stream, attribute)
+
+
+def _format_megabytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def upload_size(file):
+    """
+    Return the size of an upload in bytes without reading it
+
+    Args:
+        file: Streamlit UploadedFile, bytes or a binary file object
+
+    Returns:
+        int: Size in bytes, or None if it cannot be known without reading
+    """
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return memoryview(file).nbytes
+    size = getattr(file, "size", None)
+    if isinstance(size, int):
+        return size
+    if hasattr(file, "seekable") and file.seekable():
+        position = file.tell()
+        file.seek(0, io.SEEK_END)
+        size = file.tell()
+        file.seek(position)
+        return size
+    return None
+
+
+def check_size(file, max_bytes=MAX_FILE_BYTES):
+    """
+    Raise FileLimitError if the upload is larger than max_bytes
+
+    Returns:
+        int: Size in bytes, or None if unknown
+    """
+    size = upload_size(file)
+    if max_bytes and size is not None and size > max_bytes:
+        raise FileLimitError(
+            f"File is too large ({_format_megabytes(size)}). The maximum size is {_format_megabytes(max_bytes)}."
+        )
+    return size
+
+
+def spool(source, max_bytes=MAX_FILE_BYTES, memory_bytes=SPOOL_MEMORY_BYTES):
+    """
+    Copy a non-seekable stream into a spooled temporary file, chunk by chunk
+
+    The size limit is enforced while copying, so an oversized upload is
+    rejected without ever being held in memory.
+
+    Args:
+        source: Binary file object to read from
+        max_bytes (int): Size limit, 0 or None to disable
+        memory_bytes (int): Size kept in memory before rolling over to disk
+
+    Returns:
+        tempfile.SpooledTemporaryFile: Seekable stream positioned at the start
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=memory_bytes)
+    total = 0
+    while True:
+        chunk = source.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            spooled.close()
+            raise FileLimitError(f"File is too large. The maximum size is {_format_megabytes(max_bytes)}.")
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def open_stream(file, max_bytes=MAX_FILE_BYTES):
+    """
+    Return a seekable binary stream over an upload without duplicating it
+
+    Streamlit's UploadedFile is a BytesIO sharing the received bytes
+    (copy-on-write), so it is rewound and used as-is; getvalue()/getbuffer()
+    copies are avoided. Raw bytes are wrapped without copying and other
+    non-seekable streams are spooled.
+
+    Args:
+        file: Streamlit UploadedFile, bytes or a binary file object
+        max_bytes (int): Size limit checked before anything is parsed
+
+    Returns:
+        A seekable binary file object positioned at the start
+
+    Raises:
+        FileLimitError: If the upload exceeds max_bytes
+    """
+    if isinstance(file, bytes):
+        check_size(file, max_bytes)
+        return io.BytesIO(file)
+    if hasattr(file, "seekable") and file.seekable():
+        check_size(file, max_bytes)
+        file.seek(0)
+        return file
+    return spool(file, max_bytes)
+
+
+def content_digest(stream, chunk_size=READ_CHUNK_BYTES):
+    """
+    Compute the BLAKE2b digest of an upload's content
+
+    Args:
+        stream: Seekable binary file object
+        chunk_size (int): Bytes hashed per read for streams that are not in memory
+
+    Returns:
+        str: Hex digest, identical for identical content whatever the file name
+    """
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if isinstance(stream, io.BytesIO):
+        digest.update(stream.getvalue())
+    else:
+        stream.seek(0)
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def decode_text(stream, encoding="utf-8", chunk_size=READ_CHUNK_BYTES):
+    """
+    Decode a text upload
+
+    In-memory uploads are decoded straight from their shared buffer; other
+    streams (e.g. spooled to disk) are decoded chunk by chunk, so only one
+    chunk of raw bytes is alive at a time besides the decoded text.
+
+    Args:
+        stream: Seekable binary file object positioned at the start
+        encoding (str): Text encoding
+        chunk_size (int): Bytes read per chunk
+
+    Returns:
+        str: The decoded text
+
+    Raises:
+        UnicodeDecodeError: If the content is not valid in the encoding
+    """
+    if isinstance(stream, io.BytesIO):
+        # BytesIO dùng chung bytes đã nhận nên getvalue() không sao chép; giải mã một lần ít tốn bộ nhớ nhất
+        return stream.getvalue().decode(encoding)
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
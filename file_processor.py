@@ -1,11 +1,56 @@
-import io
-import pandas as pd
-import PyPDF2
-from PIL import Image
-import docx
-import base64
+import os
+import re
+import json
 import streamlit as st
 
+from dataclasses import dataclass, field
+
+from file_ingest import FileLimitError, open_stream, content_digest, upload_size
+from extractors import resolve_extractor
+from ocr_engine import ocr_available
+from response_cache import ResponseCache
+
+# Cache kết quả trích xuất theo digest nội dung; tầng SQLite bật khi có FILE_CACHE_DB
+extraction_cache = ResponseCache(
+    memory_entries=int(os.getenv("FILE_CACHE_SIZE", "64")),
+    disk_path=os.getenv("FILE_CACHE_DB") or None,
+    ttl_seconds=float(os.getenv("FILE_CACHE_TTL", str(30 * 24 * 3600))),
+)
+
+# Tăng khi cách trích xuất thay đổi để bỏ qua các kết quả cũ trong cache
+EXTRACTION_VERSION = 5
+
+_VIETNAMESE_CHARS = re.compile(r"[ăâđêôơưàáảãạằắẳẵặầấẩẫậèéẻẽẹềếểễệìíỉĩịòóỏõọồốổỗộờớởỡợùúủũụừứửữựỳýỷỹỵ]", re.IGNORECASE)
+_LETTERS = re.compile(r"[^\W\d_]")
+
+@dataclass
+class ExtractedDocument:
+    """Extracted content of an upload with its content digest and metadata"""
+    digest: str
+    text: str
+    metadata: dict = field(default_factory=dict)
+    cached: bool = False
+    warnings: list = field(default_factory=list)
+
+def detect_language(text, sample_chars=20000):
+    """
+    Đoán ngôn ngữ của văn bản ('vi' hoặc 'en') dựa trên tỷ lệ chữ cái có dấu tiếng Việt
+    """
+    sample = text[:sample_chars]
+    letters = len(_LETTERS.findall(sample))
+    if not letters:
+        return None
+    return "vi" if len(_VIETNAMESE_CHARS.findall(sample)) / letters > 0.02 else "en"
+
+def get_extraction_cache_stats():
+    """
+    Return hit/miss counters of the extraction cache
+    
+    Returns:
+        dict: Cache counters
+    """
+    return extraction_cache.stats()
+
 def process_file(uploaded_file):
     """
     Process different file types and extract content
@@ -16,119 +61,86 @@ def process_file(uploaded_file):
     Returns:
         str: Extracted content from the file, or None if processing fails
     """
+    document = extract_document(uploaded_file)
+    return document.text if document else None
+
+def extract_document(uploaded_file, raise_errors=False, runner=None):
+    """
+    Extract content of an upload, memoized by the BLAKE2 digest of its bytes
+    
+    The extractor is picked from the sniffed content (magic bytes) rather than
+    the file extension. Re-uploading the same content (under any file name)
+    returns the cached text and metadata without parsing the file again.
+    
+    Args:
+        uploaded_file: The uploaded file object from Streamlit (or a file_ingest.NamedUpload)
+        raise_errors (bool): Raise instead of showing the error with st.error (used by the API)
+        runner: Callable (extractor, stream, name, size) running the extractor, e.g. an
+                extractors.ExtractionRouter; extractors run in the calling thread by default
+        
+    Returns:
+        ExtractedDocument: Digest, text, metadata (file_type, size, page_count, language)
+                           and warnings, or None if processing fails
+        
+    Raises:
+        FileLimitError: If raise_errors and the upload exceeds a size or page limit
+        ValueError: If raise_errors and the file cannot be processed
+    """
+    def fail(message):
+        if raise_errors:
+            raise ValueError(message)
+        st.error(message)
+        return None
+    
+    def warn(warnings):
+        if not raise_errors:
+            for warning in warnings:
+                st.warning(warning)
+    
     try:
         if uploaded_file is None:
             return None
             
         if not hasattr(uploaded_file, 'name') or not uploaded_file.name:
-            st.error("File name is missing or invalid")
-            return None
-            
-        file_extension = uploaded_file.name.split('.')[-1].lower() if '.' in uploaded_file.name else ""
-        
-        # Validate file extension
-        if not file_extension:
-            st.error("Cannot determine file type. Please ensure the file has a valid extension.")
-            return None
+            return fail("File name is missing or invalid")
         
-        # Process based on file extension
-        if file_extension in ['txt']:
-            # Text file processing
-            content = uploaded_file.getvalue().decode('utf-8')
-            return content
-            
-        elif file_extension in ['pdf']:
-            # PDF processing
-            return process_pdf(uploaded_file)
-            
-        elif file_extension in ['docx']:
-            # DOCX processing
-            return process_docx(uploaded_file)
-            
-        elif file_extension in ['xlsx', 'xls']:
-            # Excel processing
-            return process_excel(uploaded_file)
-            
-        elif file_extension in ['jpg', 'jpeg', 'png']:
-            # Image processing
-            return process_image(uploaded_file)
-            
-        else:
-            st.error(f"Unsupported file format: {file_extension}")
-            return None
-            
-    except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
-        return None
-
-def process_pdf(file):
-    """Extract text content from PDF files"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.getvalue()))
-        text = ""
+        stream = open_stream(uploaded_file)
+        entry = resolve_extractor(stream, uploaded_file.name)
         
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-                
-        if not text.strip():
-            return "PDF file contains no extractable text content."
+        digest = content_digest(stream)
+        # Kết quả khi có và không có OCR khác nhau nên được cache riêng
+        cache_key = f"v{EXTRACTION_VERSION}{'-ocr' if ocr_available() else ''}:{entry.kind}:{digest}"
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            hit = json.loads(cached)
+            warn(hit["warnings"])
+            return ExtractedDocument(digest, hit["text"], hit["metadata"], cached=True, warnings=hit["warnings"])
         
-        return text
-    except Exception as e:
-        st.error(f"Error processing PDF: {str(e)}")
-        return None
-
-def process_docx(file):
-    """Extract text content from DOCX files"""
-    try:
-        doc = docx.Document(io.BytesIO(file.getvalue()))
-        text = ""
-        
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text += paragraph.text + "\n"
-                
-        if not text.strip():
-            return "DOCX file contains no text content."
-        
-        return text
-    except Exception as e:
-        st.error(f"Error processing DOCX: {str(e)}")
-        return None
-
-def process_excel(file):
-    """Extract data from Excel files"""
-    try:
-        df = pd.read_excel(io.BytesIO(file.getvalue()))
+        size = upload_size(uploaded_file)
+        if runner is not None:
+            result = runner(entry, open_stream(uploaded_file), uploaded_file.name, size=size)
+        else:
+            result = entry.function(open_stream(uploaded_file), uploaded_file.name)
+        warn(result.warnings)
         
-        # Convert dataframe to string representation
-        if df.empty:
-            return "Excel file contains no data."
+        metadata = {"file_type": entry.kind, "size": size, **result.metadata}
+        metadata["language"] = detect_language(result.text)
+        # Kết quả thiếu trang (ví dụ trang bị quá thời gian) không được lưu để lần sau thử lại
+        if result.complete:
+            extraction_cache.set(cache_key, json.dumps(
+                {"text": result.text, "metadata": metadata, "warnings": result.warnings}, ensure_ascii=False
+            ))
+        return ExtractedDocument(digest, result.text, metadata, warnings=result.warnings)
             
-        # Convert to string representation
-        excel_content = "Excel File Content:\n"
-        excel_content += df.to_string(index=False, max_rows=100, max_cols=20)
-        
-        return excel_content
-    except Exception as e:
-        st.error(f"Error processing Excel: {str(e)}")
+    except FileLimitError as e:
+        if raise_errors:
+            raise
+        st.error(str(e))
         return None
-
-def process_image(file):
-    """Process image files using OCR or return description"""
-    try:
-        # For now, we'll just acknowledge the image type
-        # In a full implementation, you would use OCR libraries
-        image = Image.open(io.BytesIO(file.getvalue()))
-        width, height = image.size
-        mode = image.mode
-        
-        image_info = f"Image file uploaded. Format: {file.type}, Size: {width}x{height}, Mode: {mode}.\n"
-        image_info += "Please describe the content of your image for analysis."
-        
-        return image_info
     except Exception as e:
-        st.error(f"Error processing image: {str(e)}")
+        if raise_errors:
+            if isinstance(e, ValueError):
+                raise
+            raise ValueError(f"Error processing file: {str(e)}") from e
+        st.error(f"Error processing file: {str(e)}")
         return None
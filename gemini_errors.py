@@ -0,0 +1,143 @@
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+from rate_limiter import RateLimitTimeout
+
+
+class GeminiError(Exception):
+    """
+    Base class for failures of a Gemini call
+
+    Attributes:
+        status_code (int): HTTP status the API should answer with
+        retryable (bool): Whether the same request may succeed on a later attempt
+        counts_for_breaker (bool): Whether the failure indicates the service is unhealthy
+    """
+    status_code = 500
+    retryable = False
+    counts_for_breaker = False
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GeminiNotInitializedError(GeminiError):
+    """The model was not created, usually because the API key is missing"""
+    status_code = 503
+
+
+class GeminiRateLimitError(GeminiError):
+    """The server rejected the call because the quota is exhausted (429)"""
+    status_code = 429
+    retryable = True
+
+
+class GeminiUnavailableError(GeminiError):
+    """Transient server or network failure (5xx, connection reset)"""
+    status_code = 503
+    retryable = True
+    counts_for_breaker = True
+
+
+class GeminiTimeoutError(GeminiError):
+    """The call or its retries did not finish before the deadline"""
+    status_code = 504
+    retryable = True
+    counts_for_breaker = True
+
+
+class GeminiCircuitOpenError(GeminiError):
+    """Calls are rejected without contacting the server during an outage"""
+    status_code = 503
+
+
+class GeminiBlockedError(GeminiError):
+    """The model answered without any text, e.g. blocked by a safety filter"""
+    status_code = 422
+
+
+class GeminiInvalidResponseError(GeminiError):
+    """The model kept answering with JSON that does not match the requested schema"""
+    status_code = 502
+
+
+class GeminiRequestError(GeminiError):
+    """The request was rejected (invalid argument, bad API key, ...)"""
+    status_code = 502
+
+
+def classify_error(error):
+    """
+    Map an exception raised by the SDK to a typed GeminiError
+
+    Args:
+        error (Exception): Exception raised while calling Gemini
+
+    Returns:
+        GeminiError: Typed error carrying retry and HTTP status information
+    """
+    if isinstance(error, GeminiError):
+        return error
+
+    message = str(error) or error.__class__.__name__
+
+    if isinstance(error, RateLimitTimeout):
+        # Hết thời gian chờ trong hàng đợi phía client, server không hề bị gọi
+        timeout_error = GeminiTimeoutError(message)
+        timeout_error.retryable = False
+        timeout_error.counts_for_breaker = False
+        return timeout_error
+
+    if google_exceptions is not None:
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return GeminiRateLimitError(message)
+        if isinstance(error, (google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout)):
+            return GeminiTimeoutError(message)
+        if isinstance(error, (google_exceptions.ServerError, google_exceptions.ServiceUnavailable)):
+            return GeminiUnavailableError(message)
+        if isinstance(error, google_exceptions.ClientError):
+            return GeminiRequestError(message)
+        if isinstance(error, google_exceptions.RetryError):
+            return GeminiUnavailableError(message)
+
+    if isinstance(error, TimeoutError):
+        return GeminiTimeoutError(message)
+    if isinstance(error, ConnectionError):
+        return GeminiUnavailableError(message)
+
+    # Các lỗi khác (kể cả ValueError do lỗi lập trình) là lỗi nội bộ; phản hồi bị chặn
+    # được nhận ra ngay khi đọc văn bản (xem blocked_reason)
+    return GeminiError(message)
+
+
+def blocked_reason(response):
+    """
+    Explain why a model response has no text, when it was blocked or came back empty
+
+    response.text raises ValueError both for an answer without text parts and
+    for other invalid accesses; only the former is a blocked answer.
+
+    Args:
+        response: A GenerateContentResponse or one streamed chunk of it
+
+    Returns:
+        str: The reason (block reason of the prompt or finish reason of the candidate),
+             or None if the response does have text or its shape is not recognized
+    """
+    feedback = getattr(response, "prompt_feedback", None)
+    block_reason = getattr(feedback, "block_reason", None)
+    if block_reason:
+        return f"prompt blocked ({getattr(block_reason, 'name', block_reason)})"
+    candidates = getattr(response, "candidates", None)
+    if candidates is None:
+        return None
+    if not candidates:
+        return "no candidates"
+    candidate = candidates[0]
+    if getattr(getattr(candidate, "content", None), "parts", None):
+        return None
+    finish_reason = getattr(candidate, "finish_reason", None)
+    return f"finished without text ({getattr(finish_reason, 'name', finish_reason)})"
@@ -1,6 +1,30 @@
 import google.generativeai as genai
 import streamlit as st
 import os
+import json
+import asyncio
+import threading
+import itertools
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from response_cache import ResponseCache, make_cache_key
+from request_coalescer import SingleFlight, AsyncSingleFlight
+from rate_limiter import RateLimiter, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, estimate_tokens
+from retry_policy import RetryPolicy, CircuitBreaker
+from gemini_errors import (
+    GeminiError, GeminiNotInitializedError, GeminiRateLimitError, GeminiUnavailableError,
+    GeminiTimeoutError, GeminiCircuitOpenError, GeminiBlockedError, GeminiRequestError,
+    GeminiInvalidResponseError, classify_error, blocked_reason,
+)
+from structured_output import (
+    STRUCTURED_MAX_ATTEMPTS, ValidationError, structured_generation_config, structured_stats, parse_structured,
+)
+
+try:
+    from google.api_core.exceptions import ResourceExhausted
+except ImportError:
+    ResourceExhausted = None
 
 # Import API key từ file cấu hình
 try:
@@ -8,101 +32,573 @@ try:
 except ImportError:
     CONFIG_API_KEY = None
 
-def initialize_gemini(api_key=None):
+# Số lượng lời gọi Gemini tối đa chạy song song từ các endpoint bất đồng bộ
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Cache phản hồi dùng chung cho toàn tiến trình; tầng SQLite bật khi có GEMINI_CACHE_DB
+response_cache = ResponseCache(
+    memory_entries=int(os.getenv("GEMINI_CACHE_SIZE", "256")),
+    disk_path=os.getenv("GEMINI_CACHE_DB") or None,
+    ttl_seconds=float(os.getenv("GEMINI_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Gộp các request giống hệt nhau đang chạy đồng thời thành một lời gọi Gemini
+_singleflight = SingleFlight()
+_async_singleflight = AsyncSingleFlight()
+
+# Hạn mức Gemini của cả ứng dụng (request/phút và token/phút)
+TOTAL_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_RPM", "15"))
+TOTAL_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TPM", "1000000"))
+
+# Phần hạn mức dành riêng cho các worker của hàng đợi job (chia đều giữa các worker);
+# phần còn lại thuộc về tiến trình giao diện (Streamlit hoặc API). Streamlit và API chạy
+# song song mỗi tiến trình có bộ giới hạn riêng, khi đó nên giảm GEMINI_RPM tương ứng.
+WORKER_REQUESTS_PER_MINUTE = min(float(os.getenv("GEMINI_WORKER_RPM", "5")), TOTAL_REQUESTS_PER_MINUTE)
+WORKER_TOKENS_PER_MINUTE = min(float(os.getenv("GEMINI_WORKER_TPM", "300000")), TOTAL_TOKENS_PER_MINUTE)
+
+# Giới hạn phía client cho các request của tiến trình hiện tại
+rate_limiter = RateLimiter(
+    requests_per_minute=max(1.0, TOTAL_REQUESTS_PER_MINUTE - WORKER_REQUESTS_PER_MINUTE),
+    tokens_per_minute=max(1.0, TOTAL_TOKENS_PER_MINUTE - WORKER_TOKENS_PER_MINUTE),
+)
+
+# Thời gian tạm dừng mọi request khi server báo hết hạn mức
+QUOTA_COOLDOWN_SECONDS = 10
+
+# Thử lại lỗi tạm thời và ngắt mạch khi Gemini gặp sự cố kéo dài
+retry_policy = RetryPolicy(
+    max_attempts=int(os.getenv("GEMINI_MAX_ATTEMPTS", "4")),
+    total_timeout=float(os.getenv("GEMINI_TIMEOUT", "90")),
+)
+circuit_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5")),
+    recovery_timeout=float(os.getenv("GEMINI_BREAKER_RECOVERY", "30")),
+)
+
+NOT_INITIALIZED_MESSAGE = "Gemini model not initialized properly. Please check your API key."
+NO_RESPONSE_MESSAGE = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+
+# Cấu hình mặc định của mô hình
+# Using the newer gemini-2.0-flash model for improved performance
+DEFAULT_MODEL_NAME = "gemini-2.0-flash"
+
+DEFAULT_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
+# Nhiệt độ thấp cho các tác vụ chấm điểm cần kết quả ổn định
+SCORING_GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "top_p": 0.9,
+    "top_k": 20,
+    "max_output_tokens": 2048,
+}
+
+DEFAULT_SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+]
+
+# Registry dùng chung toàn tiến trình: mỗi bộ (model, cấu hình, safety) chỉ tạo một lần
+_model_registry = {}
+_registry_lock = threading.Lock()
+_configured_api_key = None
+
+def _resolve_api_key(api_key=None):
+    # Ưu tiên lấy API key theo thứ tự: tham số > biến môi trường > config file
+    return api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or CONFIG_API_KEY
+
+def get_model(model_name=DEFAULT_MODEL_NAME, generation_config=None, safety_settings=None, api_key=None):
+    """
+    Return a shared, configured model for the given settings
+    
+    genai.configure runs once per API key and each distinct
+    (model_name, generation_config, safety_settings) combination is built
+    once per process, so Streamlit sessions, reruns and the API reuse it.
+    
+    Args:
+        model_name (str): Gemini model name
+        generation_config (dict, optional): Defaults to DEFAULT_GENERATION_CONFIG
+        safety_settings (list, optional): Defaults to DEFAULT_SAFETY_SETTINGS
+        api_key (str, optional): API key, otherwise taken from environment or config file
+        
+    Returns:
+        genai.GenerativeModel: The shared model instance
+        
+    Raises:
+        GeminiNotInitializedError: If no API key can be found
+    """
+    global _configured_api_key
+    
+    generation_config = generation_config or DEFAULT_GENERATION_CONFIG
+    safety_settings = safety_settings or DEFAULT_SAFETY_SETTINGS
+    
+    key_to_use = _resolve_api_key(api_key)
+    if not key_to_use:
+        raise GeminiNotInitializedError("Không tìm thấy API key cho Gemini. Vui lòng thiết lập trong file config.py")
+    
+    registry_key = (
+        model_name,
+        json.dumps(generation_config, sort_keys=True),
+        json.dumps(safety_settings, sort_keys=True),
+    )
+    
+    with _registry_lock:
+        if key_to_use != _configured_api_key:
+            # Đổi API key thì các model cũ gắn với client cũ, tạo lại từ đầu
+            genai.configure(api_key=key_to_use)
+            _configured_api_key = key_to_use
+            _model_registry.clear()
+        
+        model = _model_registry.get(registry_key)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=generation_config,
+                safety_settings=safety_settings,
+            )
+            _model_registry[registry_key] = model
+        return model
+
+def initialize_gemini(api_key=None, model_name=DEFAULT_MODEL_NAME, generation_config=None, safety_settings=None):
     """
     Initialize the Gemini API client
     
     Args:
         api_key (str, optional): API key for Gemini. 
                                 If None, will try from environment or config file.
+        model_name (str): Gemini model name
+        generation_config (dict, optional): Defaults to DEFAULT_GENERATION_CONFIG
+        safety_settings (list, optional): Defaults to DEFAULT_SAFETY_SETTINGS
         
     Returns:
         genai.GenerativeModel: The initialized Gemini model
     """
     try:
-        # Ưu tiên lấy API key theo thứ tự: tham số > biến môi trường > config file
-        key_to_use = api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or CONFIG_API_KEY
-        
-        if not key_to_use:
-            st.error("Không tìm thấy API key cho Gemini. Vui lòng thiết lập trong file config.py")
-            return None
-            
-        genai.configure(api_key=key_to_use)
-        
-        # Initialize the generative model with appropriate settings
-        # Using the newer gemini-2.0-flash model for improved performance
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            },
-            safety_settings=[
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-            ],
-        )
-        
-        return model
+        return get_model(model_name, generation_config, safety_settings, api_key)
+    except GeminiNotInitializedError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error initializing Gemini API: {str(e)}")
         return None
 
-def generate_response(model, messages):
+def get_scoring_model(api_key=None):
+    """
+    Return the shared low-temperature model used for scoring and assessments
+    
+    Returns:
+        genai.GenerativeModel: The scoring model, or None if no API key is configured
+    """
+    try:
+        return get_model(generation_config=SCORING_GENERATION_CONFIG, api_key=api_key)
+    except Exception:
+        return None
+
+def _convert_messages(messages):
+    """
+    Convert chat messages to the content format expected by Gemini
+    
+    Args:
+        messages (list): List of message dictionaries with 'role' and 'content'
+        
+    Returns:
+        list: Gemini contents with 'role' and 'parts'
+    """
+    gemini_messages = []
+    for message in messages:
+        if message["role"] == "user":
+            gemini_messages.append({"role": "user", "parts": [message["content"]]})
+        elif message["role"] == "assistant":
+            gemini_messages.append({"role": "model", "parts": [message["content"]]})
+        elif message["role"] == "system":
+            # For system messages, we add them to the user's first message
+            # as Gemini API doesn't directly support system messages
+            if gemini_messages and gemini_messages[0]["role"] == "user":
+                gemini_messages[0]["parts"][0] = message["content"] + "\n\n" + gemini_messages[0]["parts"][0]
+            else:
+                # If there's no user message yet, create a placeholder
+                gemini_messages.append({"role": "user", "parts": [message["content"]]})
+    
+    return gemini_messages
+
+def configure_response_cache(memory_entries=256, disk_path=None, ttl_seconds=7 * 24 * 3600, max_disk_entries=5000):
+    """
+    Replace the shared response cache, e.g. to enable the SQLite tier
+    
+    Args:
+        memory_entries (int): Capacity of the in-memory LRU tier
+        disk_path (str, optional): SQLite file for the disk tier, None to disable it
+        ttl_seconds (float, optional): Lifetime of disk entries
+        max_disk_entries (int): Maximum number of rows in the disk tier
+        
+    Returns:
+        ResponseCache: The new shared cache
+    """
+    global response_cache
+    response_cache = ResponseCache(memory_entries, disk_path, ttl_seconds, max_disk_entries)
+    return response_cache
+
+def get_cache_stats():
+    """
+    Return hit/miss counters of the shared response cache
+    
+    Returns:
+        dict: Cache counters, see ResponseCache.stats
+    """
+    return response_cache.stats()
+
+def configure_rate_limiter(requests_per_minute=15, tokens_per_minute=1_000_000):
+    """
+    Replace the shared rate limiter
+    
+    Args:
+        requests_per_minute (float, optional): Request quota, None disables limiting
+        tokens_per_minute (float): Token quota (prompt + expected output)
+        
+    Returns:
+        RateLimiter: The new shared limiter, or None when disabled
+    """
+    global rate_limiter
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute) if requests_per_minute else None
+    return rate_limiter
+
+def get_rate_limit_stats():
+    """
+    Return counters of the shared rate limiter
+    
+    Returns:
+        dict: Limiter counters, empty when limiting is disabled
+    """
+    return rate_limiter.stats() if rate_limiter is not None else {}
+
+def configure_retry_policy(max_attempts=4, base_delay=1.0, max_delay=16.0, total_timeout=90.0,
+                           failure_threshold=5, recovery_timeout=30.0):
+    """
+    Replace the shared retry policy and circuit breaker
+    
+    Args:
+        max_attempts (int): Attempts per request including the first one
+        base_delay (float): Delay before the first retry, in seconds
+        max_delay (float): Upper bound of a single backoff delay
+        total_timeout (float, optional): Deadline for all attempts of a request
+        failure_threshold (int): Consecutive failures that open the circuit
+        recovery_timeout (float): Seconds the circuit stays open
+    """
+    global retry_policy, circuit_breaker
+    retry_policy = RetryPolicy(max_attempts, base_delay, max_delay, total_timeout=total_timeout)
+    circuit_breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+
+def get_resilience_stats():
+    """
+    Return retry counters and the circuit breaker state
+    
+    Returns:
+        dict: 'retry' counters and 'circuit_breaker' state
+    """
+    return {"retry": retry_policy.stats(), "circuit_breaker": circuit_breaker.stats()}
+
+def _call_model(model, gemini_messages, priority=PRIORITY_INTERACTIVE, timeout=None, **kwargs):
+    """Wait for quota, then make one generate_content attempt"""
+    if rate_limiter is not None:
+        rate_limiter.acquire(estimate_tokens(gemini_messages), priority, timeout=timeout)
+    if timeout is not None:
+        kwargs["request_options"] = {"timeout": max(timeout, 1.0)}
+    try:
+        return model.generate_content(gemini_messages, **kwargs)
+    except Exception as e:
+        # Hết hạn mức: tạm dừng để các request sau xếp hàng thay vì tiếp tục lỗi
+        if rate_limiter is not None and ResourceExhausted is not None and isinstance(e, ResourceExhausted):
+            rate_limiter.penalize(QUOTA_COOLDOWN_SECONDS)
+        raise
+
+def get_structured_output_stats():
+    """
+    Return counters of schema-validated requests
+    
+    Returns:
+        dict: Requests, first-attempt successes, retries, failures and average validation time
+    """
+    return structured_stats.stats()
+
+def get_coalescing_stats():
+    """
+    Return how many identical in-flight requests were coalesced
+    
+    Returns:
+        dict: Counters of the threaded and the asyncio coalescing layers
+    """
+    return {"threaded": _singleflight.stats(), "async": _async_singleflight.stats()}
+
+def _response_text(response):
+    """Text of a model response; GeminiBlockedError when the model returned no text"""
+    try:
+        text = response.text
+    except ValueError:
+        # response.text báo ValueError khi phản hồi không có phần văn bản, nhưng cả khi truy cập sai;
+        # chỉ trường hợp đầu là phản hồi bị chặn, các ValueError khác là lỗi nội bộ
+        if blocked_reason(response) is None:
+            raise
+        raise GeminiBlockedError(NO_RESPONSE_MESSAGE) from None
+    if not text:
+        raise GeminiBlockedError(NO_RESPONSE_MESSAGE)
+    return text
+
+def _request_cache_key(model, gemini_messages, response_schema=None):
+    generation_config = getattr(model, "_generation_config", None)
+    if response_schema is not None:
+        generation_config = {**(generation_config or {}), **structured_generation_config(response_schema)}
+    return make_cache_key(gemini_messages, getattr(model, "model_name", ""), generation_config)
+
+def _generate(model, gemini_messages, cache_key=None, priority=PRIORITY_INTERACTIVE, response_schema=None):
+    """Call the model with retries and store a real answer in the cache"""
+    if response_schema is not None:
+        return _generate_structured(model, gemini_messages, response_schema, cache_key, priority)
+    
+    def attempt(timeout):
+        return _response_text(_call_model(model, gemini_messages, priority, timeout))
+    
+    text = retry_policy.run(attempt, circuit_breaker)
+    
+    # Chỉ lưu cache các phản hồi thật, không lưu thông báo lỗi
+    if cache_key is not None:
+        response_cache.set(cache_key, text)
+    return text
+
+def _generate_structured(model, gemini_messages, response_schema, cache_key=None, priority=PRIORITY_INTERACTIVE):
+    """
+    Ask for JSON matching response_schema and validate it once per attempt
+    
+    An answer that fails validation is requested again, at most
+    STRUCTURED_MAX_ATTEMPTS calls in total; only a valid answer is cached.
+    """
+    generation_config = structured_generation_config(response_schema)
+    
+    def attempt(timeout):
+        return _response_text(_call_model(model, gemini_messages, priority, timeout, generation_config=generation_config))
+    
+    structured_stats.record("requests")
+    for number in range(1, STRUCTURED_MAX_ATTEMPTS + 1):
+        if number > 1:
+            structured_stats.record("retries")
+        text = retry_policy.run(attempt, circuit_breaker)
+        try:
+            result = parse_structured(response_schema, text)
+        except ValidationError as e:
+            error = e
+            continue
+        if number == 1:
+            structured_stats.record("valid_first_attempt")
+        if cache_key is not None:
+            response_cache.set(cache_key, text)
+        return result
+    
+    structured_stats.record("failures")
+    raise GeminiInvalidResponseError(
+        f"Phản hồi không đúng schema {response_schema.__name__} sau {STRUCTURED_MAX_ATTEMPTS} lần thử: "
+        f"{error.error_count()} lỗi, ví dụ {error.errors()[0]['msg']}"
+    )
+
+def _cached_result(cache_key, response_schema):
+    """Cached answer for the key, validated when a schema is requested; None on a miss"""
+    cached = response_cache.get(cache_key)
+    if cached is None or response_schema is None:
+        return cached
+    try:
+        return parse_structured(response_schema, cached)
+    except ValidationError:
+        return None
+
+def _handle_error(error, raise_errors):
+    """Raise the typed error, or turn it into the user-facing apology text"""
+    if raise_errors:
+        raise error
+    if isinstance(error, GeminiNotInitializedError):
+        return f"Error: {NOT_INITIALIZED_MESSAGE}"
+    if isinstance(error, GeminiBlockedError):
+        return NO_RESPONSE_MESSAGE
+    st.error(f"Error generating response: {str(error)}")
+    return f"I apologize, but an error occurred: {str(error)}. Please try again or check your API key."
+
+def generate_response(model, messages, use_cache=True, priority=PRIORITY_INTERACTIVE, raise_errors=False,
+                      response_schema=None):
     """
     Generate a response from the Gemini model based on conversation history
     
+    Transient failures (429, 5xx, timeouts) are retried with backoff within
+    a total deadline; during a sustained outage the circuit breaker fails fast.
+    
     Args:
         model (genai.GenerativeModel): The initialized Gemini model
         messages (list): List of message dictionaries with 'role' and 'content'
+        use_cache (bool): Reuse a cached answer for an identical request and
+                          share one upstream call with concurrent identical
+                          requests. Pass False for conversational turns that
+                          should vary.
+        priority (int): PRIORITY_INTERACTIVE for requests a user is waiting on,
+                        PRIORITY_BACKGROUND for reports and other batch work
+        raise_errors (bool): Raise a typed GeminiError instead of returning an
+                             apology text, so the error is never mistaken for
+                             a real answer
+        response_schema (type, optional): Pydantic model; the model is asked
+                                          for JSON (response MIME type and
+                                          schema) and the answer is returned
+                                          validated, see _generate_structured
         
     Returns:
-        str: The generated response from the model
+        str: The generated response from the model, or an instance of
+             response_schema (None on failure when raise_errors is False)
+        
+    Raises:
+        GeminiError: Only when raise_errors is True
     """
     try:
         if not model:
-            return "Error: Gemini model not initialized properly. Please check your API key."
+            raise GeminiNotInitializedError(NOT_INITIALIZED_MESSAGE)
         
         # Convert messages to the format expected by Gemini
-        gemini_messages = []
-        for message in messages:
-            if message["role"] == "user":
-                gemini_messages.append({"role": "user", "parts": [message["content"]]})
-            elif message["role"] == "assistant":
-                gemini_messages.append({"role": "model", "parts": [message["content"]]})
-            elif message["role"] == "system":
-                # For system messages, we add them to the user's first message
-                # as Gemini API doesn't directly support system messages
-                if gemini_messages and gemini_messages[0]["role"] == "user":
-                    gemini_messages[0]["parts"][0] = message["content"] + "\n\n" + gemini_messages[0]["parts"][0]
-                else:
-                    # If there's no user message yet, create a placeholder
-                    gemini_messages.append({"role": "user", "parts": [message["content"]]})
-        
-        # Generate response
-        response = model.generate_content(gemini_messages)
-        
-        if hasattr(response, 'text'):
-            return response.text
-        else:
-            return "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+        gemini_messages = _convert_messages(messages)
+        
+        if not use_cache:
+            return _generate(model, gemini_messages, priority=priority, response_schema=response_schema)
+        
+        cache_key = _request_cache_key(model, gemini_messages, response_schema)
+        cached = _cached_result(cache_key, response_schema)
+        if cached is not None:
+            return cached
+        
+        # Các request giống hệt nhau đang chờ sẽ dùng chung một lời gọi
+        return _singleflight.do(
+            cache_key, partial(_generate, model, gemini_messages, cache_key, priority, response_schema)
+        )
+    
+    except Exception as e:
+        message = _handle_error(classify_error(e), raise_errors)
+        return None if response_schema is not None else message
+
+def stream_response(model, messages, priority=PRIORITY_INTERACTIVE, raise_errors=False):
+    """
+    Stream a response from the Gemini model chunk by chunk
+    
+    Opening the stream is retried like generate_response; once the first
+    chunk has been produced a failure is reported without retrying.
+    
+    Args:
+        model (genai.GenerativeModel): The initialized Gemini model
+        messages (list): List of message dictionaries with 'role' and 'content'
+        priority (int): PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+        raise_errors (bool): Raise a typed GeminiError instead of yielding an apology text
+        
+    Yields:
+        str: Text chunks in the order the model produces them
+    """
+    try:
+        if not model:
+            raise GeminiNotInitializedError(NOT_INITIALIZED_MESSAGE)
+        
+        gemini_messages = _convert_messages(messages)
+        
+        def open_stream(timeout):
+            response = iter(_call_model(model, gemini_messages, priority, timeout, stream=True))
+            # Lỗi kết nối thường xuất hiện khi đọc chunk đầu tiên
+            first_chunk = next(response, None)
+            return first_chunk, response
+        
+        first_chunk, response = retry_policy.run(open_stream, circuit_breaker)
+        
+        produced = False
+        chunks = [first_chunk] if first_chunk is not None else []
+        for chunk in itertools.chain(chunks, response):
+            try:
+                text = chunk.text
+            except ValueError:
+                if blocked_reason(chunk) is None:
+                    raise
+                # Chunk không có phần văn bản (ví dụ bị chặn bởi safety filter)
+                continue
+            if text:
+                produced = True
+                yield text
+        
+        if not produced:
+            raise GeminiBlockedError(NO_RESPONSE_MESSAGE)
+    
+    except Exception as e:
+        yield _handle_error(classify_error(e), raise_errors)
+
+def _get_executor():
+    """Create the shared thread pool for async calls on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=MAX_CONCURRENT_REQUESTS,
+                    thread_name_prefix="gemini"
+                )
+    return _executor
+
+async def generate_response_async(model, messages, use_cache=True, priority=PRIORITY_INTERACTIVE, raise_errors=False,
+                                  response_schema=None):
+    """
+    Generate a response without blocking the asyncio event loop
+    
+    The blocking SDK call is offloaded to a bounded thread pool, so at most
+    MAX_CONCURRENT_REQUESTS calls are in flight and the remaining requests
+    wait in the pool queue instead of stalling the event loop. Identical
+    concurrent requests await a single shared call.
+    
+    Args:
+        model (genai.GenerativeModel): The initialized Gemini model
+        messages (list): List of message dictionaries with 'role' and 'content'
+        use_cache (bool): Reuse a cached answer for an identical request
+        priority (int): PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+        raise_errors (bool): Raise a typed GeminiError instead of returning an apology text
+        response_schema (type, optional): Pydantic model of a JSON answer, see generate_response
+        
+    Returns:
+        str: The generated response from the model, or an instance of response_schema
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    
+    if not model or not use_cache:
+        call = partial(generate_response, model, messages, use_cache=False,
+                       priority=priority, raise_errors=raise_errors, response_schema=response_schema)
+        return await loop.run_in_executor(executor, call)
+    
+    try:
+        gemini_messages = _convert_messages(messages)
+        cache_key = _request_cache_key(model, gemini_messages, response_schema)
+        cached = _cached_result(cache_key, response_schema)
+        if cached is not None:
+            return cached
+        
+        # Đi qua cả lớp gộp theo luồng để Streamlit và API trong cùng tiến trình cũng dùng chung
+        call = partial(_singleflight.do, cache_key,
+                       partial(_generate, model, gemini_messages, cache_key, priority, response_schema))
+        return await _async_singleflight.do(cache_key, lambda: loop.run_in_executor(executor, call))
     
     except Exception as e:
-        st.error(f"Error generating response: {str(e)}")
-        return f"I apologize, but an error occurred: {str(e)}. Please try again or check your API key."
+        message = _handle_error(classify_error(e), raise_errors)
+        return None if response_schema is not None else message
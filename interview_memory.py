@@ -0,0 +1,211 @@
+import re
+from dataclasses import dataclass, field
+
+from token_budget import truncate_to_tokens, count_messages_tokens
+from skill_matcher import get_skill_matcher
+from embedding_index import EmbeddingIndex, nearest_skill_mentions
+
+# Số token tối đa của CV khi đưa vào system prompt ở các lượt sau
+RESUME_DIGEST_TOKENS = 600
+
+# Giới hạn số từ cho từng phần tóm tắt của một câu hỏi
+QUESTION_WORDS = 25
+ANSWER_WORDS = 30
+FEEDBACK_WORDS = 20
+
+# Số chủ đề (kỹ năng trong CV chưa được hỏi) gợi ý cho câu hỏi tiếp theo
+TOPIC_HINTS = 5
+
+_QUESTION_PATTERN = re.compile(r"(?:Câu hỏi|Question)\s+(\d+)\s*[:.\-)]?\s*(.*)", re.IGNORECASE | re.DOTALL)
+_SCORE_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*/\s*10")
+
+
+def _shorten(text, max_words):
+    words = " ".join((text or "").split()).split(" ")
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + "..."
+
+
+def split_interviewer_message(content):
+    """
+    Split an interviewer message into the feedback part and the next question
+
+    Args:
+        content (str): Message written by the interviewer model
+
+    Returns:
+        tuple: (feedback text, question number or None, question text)
+    """
+    match = _QUESTION_PATTERN.search(content or "")
+    if not match:
+        return content or "", None, ""
+    feedback = content[:match.start()].strip()
+    return feedback, int(match.group(1)), match.group(2).strip()
+
+
+@dataclass
+class QuestionRecord:
+    """Compact record of one question/answer/feedback cycle"""
+    number: int
+    question: str
+    answer: str = ""
+    feedback: str = ""
+    score: str = ""
+
+
+@dataclass
+class InterviewMemory:
+    """
+    Incremental summary of an interview simulation
+
+    After each cycle only compact records are kept, so a turn sends the
+    base instructions, a short resume digest, the summary of finished
+    questions and the current question instead of the whole transcript.
+    Questions are also embedded to steer the interviewer towards resume
+    skills not asked about yet and away from repeating a question.
+    """
+    base_prompt: str
+    resume_digest: str = ""
+    total_questions: int = 5
+    language: str = "vi"
+    records: list = field(default_factory=list)
+    current_message: str = ""
+    # Kỹ năng trong CV và những kỹ năng đã được câu hỏi nào đó đề cập
+    topics: list = field(default_factory=list)
+    covered: set = field(default_factory=set)
+    # (câu hỏi mới, câu hỏi cũ gần giống) khi người phỏng vấn lặp lại câu hỏi
+    repeated: tuple = None
+    question_index: EmbeddingIndex = field(default_factory=EmbeddingIndex)
+
+    @classmethod
+    def create(cls, base_prompt, resume=None, total_questions=5, language="vi"):
+        """
+        Create a memory for a new interview
+
+        Args:
+            base_prompt (str): Interviewer system prompt without the resume
+            resume (str, optional): Candidate resume, kept as a capped digest
+            total_questions (int): Number of questions of the interview
+            language (str): 'vi' or 'en'
+        """
+        digest = truncate_to_tokens(resume, RESUME_DIGEST_TOKENS) if resume else ""
+        topics = get_skill_matcher().extract(resume) if resume else []
+        return cls(base_prompt, digest, total_questions, language, topics=topics)
+
+    def observe_interviewer(self, content):
+        """
+        Record an interviewer message: feedback on the last answer and/or a new question
+
+        Args:
+            content (str): Message written by the interviewer model
+        """
+        feedback, number, question = split_interviewer_message(content)
+        if number is None and len(self.records) < self.total_questions and (
+                not self.records or self.records[-1].answer):
+            # Câu hỏi không đánh số ("First question: ...", "Next: ..."): vẫn ghi nhận chu kỳ mới,
+            # đoạn cuối của tin nhắn là câu hỏi, phần trước là nhận xét
+            number = len(self.records) + 1
+            paragraphs = (content or "").strip().rsplit("\n\n", 1)
+            feedback, question = (paragraphs[0], paragraphs[1]) if len(paragraphs) == 2 else ("", paragraphs[0])
+
+        if self.records and self.records[-1].answer and not self.records[-1].feedback:
+            last = self.records[-1]
+            last.feedback = _shorten(feedback or content, FEEDBACK_WORDS)
+            score = _SCORE_PATTERN.search(feedback or content)
+            if score:
+                last.score = score.group(1)
+
+        if number is not None and (not self.records or self.records[-1].number != number):
+            self.records.append(QuestionRecord(number, _shorten(question, QUESTION_WORDS)))
+            self._observe_question(number, question)
+
+        self.current_message = content
+
+    def _observe_question(self, number, question):
+        # Chủ đề được đề cập: kỹ năng nhận diện trực tiếp hoặc qua cụm từ gần nghĩa
+        self.covered.update(get_skill_matcher().extract(question))
+        self.covered.update(nearest_skill_mentions(question))
+        threshold = self.question_index.embedder.duplicate_threshold
+        similar = self.question_index.search([question], k=1, min_score=threshold)[0]
+        self.repeated = (number, similar[0][0]) if similar else None
+        self.question_index.add([question], [number])
+
+    def uncovered_topics(self):
+        """Resume skills no question has touched yet, in resume order"""
+        return [skill for skill in self.topics if skill not in self.covered]
+
+    def observe_answer(self, answer):
+        """Record the candidate's answer to the current question"""
+        if self.records and not self.records[-1].answer:
+            self.records[-1].answer = _shorten(answer, ANSWER_WORDS)
+
+    def summary_text(self):
+        """Summary of all finished cycles, one line per question"""
+        lines = []
+        for record in self.records:
+            if not record.answer:
+                continue
+            if self.language == "vi":
+                line = f"- Câu hỏi {record.number}: {record.question} | Trả lời: {record.answer}"
+                if record.feedback:
+                    line += f" | Nhận xét: {record.feedback}"
+                if record.score:
+                    line += f" | Điểm: {record.score}/10"
+            else:
+                line = f"- Question {record.number}: {record.question} | Answer: {record.answer}"
+                if record.feedback:
+                    line += f" | Feedback: {record.feedback}"
+                if record.score:
+                    line += f" | Score: {record.score}/10"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def build_messages(self, user_message):
+        """
+        Build the compact prompt for the next interviewer turn
+
+        Args:
+            user_message (str): The candidate's answer (or a request to end)
+
+        Returns:
+            list: Messages for generate_response
+        """
+        asked = self.records[-1].number if self.records else 0
+        system_content = self.base_prompt
+        if self.resume_digest:
+            if self.language == "vi":
+                system_content += f"\n\nThông tin từ CV của ứng viên (tóm lược):\n{self.resume_digest}"
+            else:
+                system_content += f"\n\nInformation from candidate's resume (digest):\n{self.resume_digest}"
+
+        summary = self.summary_text()
+        topics = ", ".join(self.uncovered_topics()[:TOPIC_HINTS])
+        if self.language == "vi":
+            system_content += f"\n\nTiến độ: đã hỏi {asked}/{self.total_questions} câu."
+            if summary:
+                system_content += f"\nTóm tắt các câu hỏi đã hoàn thành:\n{summary}"
+            if topics:
+                system_content += f"\nKỹ năng trong CV chưa được hỏi (ưu tiên cho câu hỏi tiếp theo): {topics}"
+            if self.repeated:
+                system_content += (f"\nCâu hỏi {self.repeated[0]} gần giống câu hỏi {self.repeated[1]}; "
+                                   "câu hỏi tiếp theo hãy chọn chủ đề khác.")
+        else:
+            system_content += f"\n\nProgress: {asked}/{self.total_questions} questions asked."
+            if summary:
+                system_content += f"\nSummary of completed questions:\n{summary}"
+            if topics:
+                system_content += f"\nResume skills not asked about yet (prefer them for the next question): {topics}"
+            if self.repeated:
+                system_content += (f"\nQuestion {self.repeated[0]} is close to question {self.repeated[1]}; "
+                                   "pick a different topic for the next question.")
+
+        messages = [{"role": "system", "content": system_content}]
+        if self.current_message:
+            messages.append({"role": "assistant", "content": self.current_message})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def prompt_tokens(self, user_message):
+        """Estimated tokens of the prompt build_messages would send"""
+        return count_messages_tokens(self.build_messages(user_message))
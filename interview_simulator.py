@@ -3,7 +3,10 @@ import time
 import random
 import re
 from prompts import SYSTEM_PROMPT
-from gemini_helper import generate_response
+from gemini_helper import generate_response, get_scoring_model, GeminiError
+from token_budget import TokenBudget, PromptTooLargeError
+from interview_memory import InterviewMemory
+from structured_output import InterviewAssessment
 
 def create_interview_system_prompt(interview_type, job_role=None, resume=None, num_questions=5, language="vi"):
     """
@@ -144,6 +147,19 @@ def check_interview_complete(messages, total_questions):
     # If we have a final assessment with score, consider the interview complete
     return (contains_score and contains_final_assessment)
 
+def get_interviewer_reply(gemini_model, messages):
+    """
+    Lấy phản hồi của người phỏng vấn, trả về None và hiển thị lỗi nếu gọi Gemini thất bại
+    """
+    # Giữ nguyên system prompt và các lượt gần đây; các lượt cũ được tóm tắt khi vượt ngân sách
+    try:
+        budget_result = TokenBudget(keep_recent=8).fit(messages)
+        return generate_response(gemini_model, budget_result.messages, use_cache=False, raise_errors=True)
+    except (GeminiError, PromptTooLargeError) as e:
+        # Không đưa thông báo lỗi vào lịch sử phỏng vấn để tránh bị chấm điểm như câu trả lời thật
+        st.error(f"Không thể nhận phản hồi từ người phỏng vấn: {str(e)}")
+        return None
+
 def start_interview_session(interview_type, job_role=None, resume=None, num_questions=5, gemini_model=None, language="vi"):
     """
     Bắt đầu phiên phỏng vấn
@@ -172,8 +188,37 @@ def start_interview_session(interview_type, job_role=None, resume=None, num_ques
         
         # Lấy câu trả lời đầu tiên từ người phỏng vấn
         with st.spinner("Người phỏng vấn đang chuẩn bị..."):
-            interviewer_response = generate_response(gemini_model, st.session_state.interview_messages)
+            interviewer_response = get_interviewer_reply(gemini_model, st.session_state.interview_messages)
+            if interviewer_response is None:
+                del st.session_state.interview_messages
+                return False
             st.session_state.interview_messages.append({"role": "assistant", "content": interviewer_response})
+        
+        # Bộ nhớ tóm tắt: các lượt sau chỉ gửi tóm tắt và câu hỏi hiện tại thay vì toàn bộ transcript
+        base_prompt = create_interview_system_prompt(interview_type, job_role, None, num_questions, language)
+        memory = InterviewMemory.create(base_prompt, resume, num_questions, language)
+        memory.observe_interviewer(interviewer_response)
+        st.session_state.interview_memory = memory
+    
+    return True
+
+def get_turn_messages(user_message):
+    """
+    Tạo prompt cho lượt tiếp theo: dùng bộ nhớ tóm tắt nếu có, nếu không thì gửi toàn bộ transcript
+    """
+    memory = st.session_state.get("interview_memory")
+    if memory is None:
+        return st.session_state.interview_messages
+    return memory.build_messages(user_message)
+
+def update_interview_memory(user_message, interviewer_response):
+    """
+    Cập nhật bộ nhớ tóm tắt sau một chu kỳ câu hỏi/trả lời/nhận xét
+    """
+    memory = st.session_state.get("interview_memory")
+    if memory is not None:
+        memory.observe_answer(user_message)
+        memory.observe_interviewer(interviewer_response)
 
 def interview_simulator_page(gemini_model):
     """
@@ -267,8 +312,12 @@ def interview_simulator_page(gemini_model):
                         del st.session_state.interview_messages
                     if "interview_feedback" in st.session_state:
                         del st.session_state.interview_feedback
+                    if "interview_assessment" in st.session_state:
+                        del st.session_state.interview_assessment
                     if "interview_completed" in st.session_state:
                         del st.session_state.interview_completed
+                    if "interview_memory" in st.session_state:
+                        del st.session_state.interview_memory
                     
                     # Lưu thông tin về loại phỏng vấn và vai trò công việc
                     selected_interview_type = interview_type
@@ -292,8 +341,8 @@ def interview_simulator_page(gemini_model):
                         st.session_state.current_interview_type_display = interview_options[selected_interview_type]
                     
                     # Bắt đầu phiên phỏng vấn mới
-                    start_interview_session(interview_type, job_role, resume, num_questions, gemini_model, language)
-                    st.rerun()
+                    if start_interview_session(interview_type, job_role, resume, num_questions, gemini_model, language):
+                        st.rerun()
     
     # Hiển thị lịch sử tin nhắn và phần tương tác
     if "interview_messages" in st.session_state:
@@ -330,8 +379,9 @@ def interview_simulator_page(gemini_model):
                 if st.button(feedback_btn, type="primary"):
                     with st.spinner("Đang tạo phản hồi chi tiết..."):
                         feedback = get_feedback_on_interview(messages, gemini_model, language)
+                    if feedback is not None:
                         st.session_state.interview_feedback = feedback
-                    st.rerun()
+                        st.rerun()
             else:
                 # Hiển thị phản hồi chi tiết
                 st.subheader("📊 Đánh giá chi tiết")
@@ -349,14 +399,20 @@ def interview_simulator_page(gemini_model):
                 
                 # Lấy phản hồi từ người phỏng vấn
                 with st.spinner("Người phỏng vấn đang suy nghĩ..."):
-                    interviewer_response = generate_response(gemini_model, st.session_state.interview_messages)
-                    st.session_state.interview_messages.append({"role": "assistant", "content": interviewer_response})
+                    interviewer_response = get_interviewer_reply(gemini_model, get_turn_messages(user_response))
                 
-                # Kiểm tra xem phỏng vấn đã kết thúc chưa sau khi nhận được phản hồi mới
-                if check_interview_complete(st.session_state.interview_messages, total_questions):
-                    st.session_state.interview_completed = True
-                
-                st.rerun()
+                if interviewer_response is None:
+                    # Bỏ câu trả lời vừa gửi để người dùng có thể gửi lại
+                    st.session_state.interview_messages.pop()
+                else:
+                    st.session_state.interview_messages.append({"role": "assistant", "content": interviewer_response})
+                    update_interview_memory(user_response, interviewer_response)
+                    
+                    # Kiểm tra xem phỏng vấn đã kết thúc chưa sau khi nhận được phản hồi mới
+                    if check_interview_complete(st.session_state.interview_messages, total_questions):
+                        st.session_state.interview_completed = True
+                    
+                    st.rerun()
             
             # Tùy chọn kết thúc sớm phỏng vấn
             if st.button(end_btn):
@@ -365,11 +421,15 @@ def interview_simulator_page(gemini_model):
                 st.session_state.interview_messages.append({"role": "user", "content": end_message})
                 
                 with st.spinner("Đang chuẩn bị đánh giá tổng thể..."):
-                    final_assessment = generate_response(gemini_model, st.session_state.interview_messages)
+                    final_assessment = get_interviewer_reply(gemini_model, get_turn_messages(end_message))
+                
+                if final_assessment is None:
+                    st.session_state.interview_messages.pop()
+                else:
                     st.session_state.interview_messages.append({"role": "assistant", "content": final_assessment})
+                    update_interview_memory(end_message, final_assessment)
                     st.session_state.interview_completed = True
-                
-                st.rerun()
+                    st.rerun()
     else:
         # Hướng dẫn khi chưa bắt đầu phỏng vấn
         if language == "vi":
@@ -384,10 +444,33 @@ def interview_simulator_page(gemini_model):
                 del st.session_state.interview_messages
             if "interview_feedback" in st.session_state:
                 del st.session_state.interview_feedback
+            if "interview_assessment" in st.session_state:
+                del st.session_state.interview_assessment
             if "interview_completed" in st.session_state:
                 del st.session_state.interview_completed
+            if "interview_memory" in st.session_state:
+                del st.session_state.interview_memory
             st.rerun()
 
+def format_interview_assessment(assessment, language="vi"):
+    """
+    Trình bày đánh giá có cấu trúc (InterviewAssessment) dưới dạng markdown
+    """
+    if language == "vi":
+        labels = ["Điểm tổng thể", "Kỹ năng kỹ thuật", "Kỹ năng giao tiếp", "Kỹ năng giải quyết vấn đề",
+                  "Kỹ năng lãnh đạo", "Điểm mạnh", "Điểm yếu", "Gợi ý cải thiện"]
+    else:
+        labels = ["Overall Score", "Technical skills", "Communication skills", "Problem-solving skills",
+                  "Leadership skills", "Strengths", "Weaknesses", "Improvement suggestions"]
+    scores = [assessment.overall, assessment.technical, assessment.communication,
+              assessment.problem_solving, assessment.leadership]
+    lines = [f"**{labels[0]}: {scores[0]}/10**", ""]
+    lines += [f"- {label}: {score}/10" for label, score in zip(labels[1:5], scores[1:])]
+    for label, items, marker in zip(labels[5:], [assessment.strengths, assessment.weaknesses, assessment.suggestions],
+                                    ["-", "-", "1."]):
+        lines += ["", f"**{label}:**"] + [f"{marker} {item}" for item in items]
+    return "\n".join(lines)
+
 def get_feedback_on_interview(messages, gemini_model, language="vi"):
     """
     Lấy phản hồi chi tiết về buổi phỏng vấn
@@ -396,57 +479,13 @@ def get_feedback_on_interview(messages, gemini_model, language="vi"):
         prompt = """Vui lòng phân tích buổi phỏng vấn dựa trên các câu hỏi và câu trả lời được cung cấp. 
 Đánh giá điểm mạnh và điểm yếu của ứng viên và đưa ra điểm số tổng thể trên thang điểm 10.
 Hãy đánh giá từng kỹ năng riêng biệt (kỹ thuật, giao tiếp, giải quyết vấn đề, lãnh đạo) trên thang điểm 10.
-Đưa ra đánh giá theo định dạng:
-
-Điểm tổng thể: X/10
-
-Kỹ năng kỹ thuật: X/10
-Kỹ năng giao tiếp: X/10
-Kỹ năng giải quyết vấn đề: X/10
-Kỹ năng lãnh đạo: X/10
-
-Điểm mạnh:
-- Điểm mạnh 1
-- Điểm mạnh 2
-...
-
-Điểm yếu:
-- Điểm yếu 1
-- Điểm yếu 2
-...
-
-Gợi ý cải thiện:
-1. Gợi ý 1
-2. Gợi ý 2
-...
+Liệt kê điểm mạnh, điểm yếu và gợi ý cải thiện cụ thể, viết bằng tiếng Việt.
 """
     else:
         prompt = """Please analyze the interview based on the questions and answers provided.
 Evaluate the candidate's strengths and weaknesses and provide an overall score on a scale of 1-10.
 Evaluate each skill separately (technical, communication, problem-solving, leadership) on a scale of 1-10.
-Format your assessment as follows:
-
-Overall Score: X/10
-
-Technical skills: X/10
-Communication skills: X/10
-Problem-solving skills: X/10
-Leadership skills: X/10
-
-Strengths:
-- Strength 1
-- Strength 2
-...
-
-Weaknesses:
-- Weakness 1
-- Weakness 2
-...
-
-Improvement suggestions:
-1. Suggestion 1
-2. Suggestion 2
-...
+List the strengths, the weaknesses and concrete improvement suggestions, in English.
 """
 
     # Tạo prompt cuối cùng
@@ -466,18 +505,26 @@ Improvement suggestions:
         {"role": "user", "content": final_prompt}
     ]
     
-    # Lấy phản hồi từ AI
-    feedback = generate_response(gemini_model, feedback_messages)
+    # Điểm số và nhận xét được trả về dưới dạng JSON theo schema InterviewAssessment; khi lỗi không lưu gì
+    try:
+        # Dùng model nhiệt độ thấp để điểm số ổn định giữa các lần đánh giá
+        scoring_model = get_scoring_model() or gemini_model
+        assessment = generate_response(scoring_model, feedback_messages, raise_errors=True,
+                                       response_schema=InterviewAssessment)
+    except GeminiError as e:
+        st.error(f"Không thể tạo đánh giá chi tiết: {str(e)}")
+        return None
     
     # Lưu phản hồi vào session state để sử dụng ở nơi khác
+    feedback = format_interview_assessment(assessment, language)
+    st.session_state.interview_assessment = assessment
     st.session_state.interview_feedback = feedback
     
     # Cập nhật điểm số vào hệ thống theo dõi tiến trình
     try:
-        from progress_tracker import extract_scores_from_feedback, save_interview_results
+        from progress_tracker import scores_from_assessment, save_interview_results
         
-        # Trích xuất điểm số từ phản hồi
-        scores = extract_scores_from_feedback(feedback, language)
+        scores = scores_from_assessment(assessment)
         
         # Lấy thông tin về buổi phỏng vấn từ session state
         interview_type = st.session_state.get("current_interview_type", None)
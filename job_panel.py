@@ -0,0 +1,71 @@
+import streamlit as st
+
+from job_queue import JobQueue, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED
+
+# Chu kỳ tự làm mới trạng thái job đang chạy (giây)
+JOB_REFRESH_SECONDS = 2
+
+_STATUS_LABELS = {
+    "vi": {
+        JOB_QUEUED: "Đang chờ xử lý",
+        JOB_RUNNING: "Đang xử lý",
+        JOB_SUCCEEDED: "Hoàn thành",
+        JOB_FAILED: "Thất bại",
+        JOB_CANCELLED: "Đã hủy",
+    },
+    "en": {
+        JOB_QUEUED: "Queued",
+        JOB_RUNNING: "Running",
+        JOB_SUCCEEDED: "Completed",
+        JOB_FAILED: "Failed",
+        JOB_CANCELLED: "Cancelled",
+    },
+}
+
+
+@st.cache_resource
+def get_shared_job_queue():
+    """Hàng đợi job dùng chung cho mọi phiên Streamlit của tiến trình"""
+    return JobQueue()
+
+
+def _render_status(queue, job, language):
+    labels = _STATUS_LABELS.get(language, _STATUS_LABELS["en"])
+    text = labels.get(job["status"], job["status"])
+    if job["message"]:
+        text += f" — {job['message']}"
+    st.progress(job["progress"], text=text)
+
+    if job["status"] in (JOB_QUEUED, JOB_RUNNING) and not job["cancel_requested"]:
+        if st.button("Hủy" if language == "vi" else "Cancel", key=f"cancel_job_{job['id']}"):
+            queue.cancel(job["id"])
+            st.rerun()
+
+
+def display_job_status(queue, job_id, language="vi"):
+    """
+    Hiển thị tiến độ của một job, tự làm mới khi job chưa kết thúc
+
+    Trả về thông tin job, hoặc None nếu không tìm thấy
+    """
+    job = queue.get(job_id)
+    if job is None:
+        return None
+
+    if job["status"] in (JOB_QUEUED, JOB_RUNNING):
+        @st.fragment(run_every=JOB_REFRESH_SECONDS)
+        def live_status():
+            current = queue.get(job_id)
+            if current["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                # Job vừa kết thúc: chạy lại cả trang để hiển thị kết quả
+                st.rerun()
+            _render_status(queue, current, language)
+
+        live_status()
+        return job
+
+    if job["status"] == JOB_FAILED:
+        st.error(("Tác vụ thất bại: " if language == "vi" else "Job failed: ") + (job["error"] or ""))
+    elif job["status"] == JOB_CANCELLED:
+        st.info(_STATUS_LABELS.get(language, _STATUS_LABELS["en"])[JOB_CANCELLED])
+    return job
@@ -0,0 +1,472 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import importlib
+import multiprocessing
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("job_queue")
+
+# File SQLite lưu hàng đợi và kết quả, dùng chung giữa Streamlit, API và các worker
+DEFAULT_JOB_DB = os.getenv("JOB_QUEUE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.db"))
+DEFAULT_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Thời gian giữ lại các job đã kết thúc
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+# Module đăng ký các loại job, được import trong mọi worker
+DEFAULT_TASK_MODULES = ("job_tasks",)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+_TASKS = {}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation was requested"""
+
+
+class _Task:
+    def __init__(self, kind, fn, content_type):
+        self.kind = kind
+        self.fn = fn
+        self.content_type = content_type
+
+
+def job_task(kind, content_type="application/json"):
+    """
+    Register a function as a job kind
+
+    The function receives the job params (dict) and a progress callback
+    progress(fraction, message="") and returns the result. JSON-serializable
+    results are stored as JSON, bytes are stored as-is with content_type.
+    The progress callback raises JobCancelled once cancellation was requested.
+
+    Args:
+        kind (str): Name used when submitting the job
+        content_type (str): Media type of a bytes result
+    """
+    def decorator(fn):
+        _TASKS[kind] = _Task(kind, fn, content_type)
+        return fn
+    return decorator
+
+
+def registered_kinds():
+    """Return the names of all registered job kinds"""
+    return sorted(_TASKS)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    Persistent job table in a SQLite file
+
+    Every process (web app, API, workers) opens its own store on the same
+    file; claiming a job is a single write transaction, so a job is executed
+    by exactly one worker.
+
+    Args:
+        path (str): Path of the SQLite database file
+    """
+
+    _COLUMNS = ("id, kind, params, status, priority, progress, message, error, content_type, "
+                "cancel_requested, worker_pid, created_at, started_at, finished_at")
+
+    def __init__(self, path=DEFAULT_JOB_DB):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    result BLOB,
+                    result_is_json INTEGER NOT NULL DEFAULT 1,
+                    error TEXT,
+                    content_type TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, created_at)")
+
+    def _execute(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args)
+
+    def submit(self, kind, params=None, priority=0):
+        """Insert a queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, params, status, priority, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params or {}, ensure_ascii=False, default=str), JOB_QUEUED, priority, time.time()),
+        )
+        return job_id
+
+    def claim(self, worker_pid):
+        """
+        Atomically move the next queued job to running
+
+        Returns:
+            dict: The claimed job with decoded params, or None if the queue is empty
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY priority, created_at LIMIT 1",
+                    (JOB_QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE id = ?",
+                        (JOB_RUNNING, worker_pid, time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row["id"], "kind": row["kind"], "params": json.loads(row["params"])}
+
+    def update_progress(self, job_id, progress, message=""):
+        """Record progress of a running job; returns True if cancellation was requested"""
+        self._execute(
+            "UPDATE jobs SET progress = ?, message = ? WHERE id = ? AND status = ?",
+            (max(0.0, min(1.0, float(progress))), message or "", job_id, JOB_RUNNING),
+        )
+        return self.cancel_requested(job_id)
+
+    def cancel_requested(self, job_id):
+        row = self._execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def complete(self, job_id, result, content_type="application/json"):
+        """Store the result of a job and mark it succeeded"""
+        if isinstance(result, (bytes, bytearray, memoryview)):
+            value, is_json = bytes(result), 0
+        else:
+            value, is_json = json.dumps(result, ensure_ascii=False, default=str), 1
+            content_type = "application/json"
+        self._finish(job_id, JOB_SUCCEEDED, result=value, result_is_json=is_json, content_type=content_type, progress=1.0)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, JOB_FAILED, error=str(error))
+
+    def mark_cancelled(self, job_id):
+        self._finish(job_id, JOB_CANCELLED)
+
+    def _finish(self, job_id, status, result=None, result_is_json=1, content_type=None, error=None, progress=None):
+        self._execute(
+            """UPDATE jobs SET status = ?, result = ?, result_is_json = ?, content_type = ?, error = ?,
+                   progress = COALESCE(?, progress), finished_at = ?
+               WHERE id = ?""",
+            (status, result, result_is_json, content_type, error, progress, time.time(), job_id),
+        )
+
+    def cancel(self, job_id):
+        """
+        Cancel a job
+
+        A queued job is cancelled immediately; a running job is flagged and
+        stops at its next progress checkpoint.
+
+        Returns:
+            bool: False if the job does not exist or has already finished
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED),
+            )
+            if cursor.rowcount:
+                return True
+            cursor = self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                (job_id, JOB_RUNNING),
+            )
+            return bool(cursor.rowcount)
+
+    def get(self, job_id):
+        """Return the job without its result, or None if unknown"""
+        row = self._execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def result(self, job_id):
+        """
+        Return the result of a succeeded job
+
+        Returns:
+            tuple: (result, content_type); result is the decoded JSON value or the
+                   raw bytes, (None, None) if the job has no result
+        """
+        row = self._execute(
+            "SELECT result, result_is_json, content_type FROM jobs WHERE id = ? AND status = ?",
+            (job_id, JOB_SUCCEEDED),
+        ).fetchone()
+        if row is None or row["result"] is None:
+            return None, None
+        if row["result_is_json"]:
+            return json.loads(row["result"]), row["content_type"]
+        return bytes(row["result"]), row["content_type"]
+
+    def list(self, limit=50, status=None):
+        """Return the most recent jobs, newest first"""
+        if status:
+            rows = self._execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._execute(f"SELECT {self._COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        rows = self._execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+    def recover_orphans(self):
+        """Fail running jobs whose worker process no longer exists"""
+        rows = self._execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (JOB_RUNNING,)).fetchall()
+        recovered = 0
+        for row in rows:
+            if not _pid_alive(row["worker_pid"]):
+                self.fail(row["id"], "Worker process exited before the job finished")
+                recovered += 1
+        return recovered
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        """Delete finished jobs older than the retention period"""
+        placeholders = ", ".join("?" for _ in FINISHED_STATES)
+        self._execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+            (*FINISHED_STATES, time.time() - older_than),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+
+def _run_job(store, job):
+    task = _TASKS.get(job["kind"])
+    if task is None:
+        store.fail(job["id"], f"Unknown job kind: {job['kind']}")
+        return
+
+    def progress(fraction, message=""):
+        if store.update_progress(job["id"], fraction, message):
+            raise JobCancelled()
+
+    try:
+        progress(0.0)
+        result = task.fn(job["params"], progress)
+    except JobCancelled:
+        store.mark_cancelled(job["id"])
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+        store.fail(job["id"], e)
+    else:
+        store.complete(job["id"], result, task.content_type)
+
+
+def _worker_main(db_path, task_modules, workers, stop_event, poll_interval):
+    for module_name in task_modules:
+        module = importlib.import_module(module_name)
+        # Module có thể chuẩn bị tài nguyên riêng cho worker (ví dụ chia hạn mức API)
+        init_worker = getattr(module, "init_worker", None)
+        if init_worker is not None:
+            init_worker(workers)
+
+    store = JobStore(db_path)
+    try:
+        while not stop_event.is_set():
+            job = store.claim(os.getpid())
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+            _run_job(store, job)
+    finally:
+        store.close()
+
+
+class JobQueue:
+    """
+    Local job queue executed by a pool of worker processes
+
+    Jobs and results live in SQLite, so they survive page reloads and
+    restarts and are visible to every process using the same file. Workers
+    are started lazily on the first submit (or by start()) and restarted if
+    they die; no external broker is needed. When several processes (API and
+    Streamlit) open the same database, only the first one to start holds the
+    worker lock and runs workers; the others only submit and read jobs.
+
+    Args:
+        db_path (str): Path of the SQLite database file
+        workers (int): Number of worker processes
+        task_modules (tuple): Modules imported to register the job kinds
+        poll_interval (float): Seconds an idle worker waits before polling again
+    """
+
+    def __init__(self, db_path=DEFAULT_JOB_DB, workers=DEFAULT_WORKERS, task_modules=DEFAULT_TASK_MODULES,
+                 poll_interval=0.5):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.task_modules = tuple(task_modules)
+        self.poll_interval = poll_interval
+        self.store = JobStore(db_path)
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._processes = []
+        self._lock = threading.Lock()
+        self._owner_file = None
+
+        for module_name in self.task_modules:
+            importlib.import_module(module_name)
+
+    def _acquire_worker_lock(self):
+        """Become the process running the workers of this database, False if another process already is"""
+        if self._owner_file is not None:
+            return True
+        if fcntl is None:
+            return True
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        owner_file = open(f"{self.db_path}.workers.lock", "a")
+        try:
+            fcntl.flock(owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            owner_file.close()
+            return False
+        self._owner_file = owner_file
+        return True
+
+    def owns_workers(self):
+        """Whether this process runs the workers of the database"""
+        return self._owner_file is not None or (fcntl is None and bool(self._processes))
+
+    def start(self):
+        """Start missing worker processes and fail jobs left behind by dead workers"""
+        with self._lock:
+            # Chỉ một tiến trình chạy worker cho mỗi file SQLite, để hạn mức API không bị nhân lên
+            if not self._acquire_worker_lock():
+                return
+            self._processes = [process for process in self._processes if process.is_alive()]
+            if len(self._processes) >= self.workers:
+                return
+            self.store.recover_orphans()
+            self._stop_event.clear()
+            while len(self._processes) < self.workers:
+                process = self._context.Process(
+                    target=_worker_main,
+                    args=(self.db_path, self.task_modules, self.workers, self._stop_event, self.poll_interval),
+                    daemon=True,
+                    name=f"job-worker-{len(self._processes) + 1}",
+                )
+                process.start()
+                self._processes.append(process)
+
+    def stop(self, timeout=5.0):
+        """Ask the workers to exit after their current job and wait for them"""
+        with self._lock:
+            self._stop_event.set()
+            for process in self._processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            if self._owner_file is not None:
+                self._owner_file.close()
+                self._owner_file = None
+
+    def submit(self, kind, params=None, priority=0):
+        """
+        Queue a job
+
+        Args:
+            kind (str): Registered job kind
+            params (dict, optional): JSON-serializable parameters of the job
+            priority (int): Lower values run first
+
+        Returns:
+            str: The job id
+
+        Raises:
+            ValueError: If the kind is not registered
+        """
+        if kind not in _TASKS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.store.purge()
+        job_id = self.store.submit(kind, params, priority)
+        self.start()
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def result(self, job_id):
+        return self.store.result(job_id)
+
+    def cancel(self, job_id):
+        return self.store.cancel(job_id)
+
+    def list(self, limit=50, status=None):
+        return self.store.list(limit, status)
+
+    def stats(self):
+        """
+        Return queue counters
+
+        Returns:
+            dict: Number of jobs per status and number of live workers
+        """
+        with self._lock:
+            alive = sum(1 for process in self._processes if process.is_alive())
+        return {"jobs": self.store.counts(), "workers": alive, "owns_workers": self.owns_workers()}
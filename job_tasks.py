@@ -0,0 +1,125 @@
+from job_queue import job_task
+
+# Các loại job chạy nền; module này được import trong mọi worker của JobQueue
+
+
+def init_worker(workers):
+    """
+    Prepare a worker process
+
+    Workers share the GEMINI_WORKER_RPM / GEMINI_WORKER_TPM budget, which
+    gemini_helper keeps out of the foreground limiter. Only one process owns
+    the worker pool of a job database (see JobQueue.start), so dividing the
+    budget by the number of workers keeps all workers together within it.
+
+    Args:
+        workers (int): Number of worker processes of the queue
+    """
+    import matplotlib
+    # Worker không có màn hình, vẽ biểu đồ ra bộ nhớ
+    matplotlib.use("Agg")
+
+    from gemini_helper import configure_rate_limiter, WORKER_REQUESTS_PER_MINUTE, WORKER_TOKENS_PER_MINUTE
+    if WORKER_REQUESTS_PER_MINUTE:
+        configure_rate_limiter(WORKER_REQUESTS_PER_MINUTE / workers, WORKER_TOKENS_PER_MINUTE / workers)
+
+
+def _model():
+    from gemini_helper import initialize_gemini
+    return initialize_gemini()
+
+
+@job_task("progress_report", content_type="application/pdf")
+def progress_report(params, progress):
+    """
+    Build the interview progress PDF
+
+    Params: language, interview_history, skills_progress
+    """
+    from progress_tracker import generate_pdf_report
+
+    progress(0.1, "Đang chuẩn bị dữ liệu")
+    model = _model()
+    progress(0.3, "Đang tạo báo cáo")
+    pdf_content = generate_pdf_report(
+        model,
+        params.get("language", "vi"),
+        interview_history=params.get("interview_history") or [],
+        skills_progress=params.get("skills_progress") or {"overall": []},
+    )
+    progress(1.0, "Hoàn thành")
+    return pdf_content
+
+
+@job_task("career_path")
+def career_path(params, progress):
+    """
+    Suggest long-term career paths
+
+    Params: resume_text, industry, job_role, language
+    """
+    from market_analysis import suggest_career_path
+
+    progress(0.1, "Đang phân tích lộ trình nghề nghiệp")
+    return suggest_career_path(
+        params["resume_text"], params["industry"], params.get("job_role"),
+        params.get("language", "vi"), gemini_model=_model(),
+    )
+
+
+@job_task("competitor_comparison")
+def competitor_comparison(params, progress):
+    """
+    Compare a resume with competing candidates
+
+    Params: resume_text, industry, job_role, language
+    """
+    from market_analysis import compare_with_competitors
+
+    progress(0.1, "Đang so sánh với ứng viên cạnh tranh")
+    return compare_with_competitors(
+        params["resume_text"], params["industry"], params.get("job_role"),
+        params.get("language", "vi"), gemini_model=_model(),
+    )
+
+
+@job_task("skills_gap_batch")
+def skills_gap_batch(params, progress):
+    """
+    Evaluate many resumes against one job description
+
+    Params: job_description, resumes (list of {id, content}), language
+    """
+    from gemini_helper import generate_response, get_scoring_model, GeminiError, PRIORITY_BACKGROUND
+    from skills_gap_analyzer import (
+        build_requirements_messages, build_resume_evaluation_messages, evaluation_result,
+        rank_evaluations,
+    )
+    from structured_output import ResumeEvaluation
+
+    language = params.get("language", "vi")
+    resumes = params.get("resumes") or []
+    model = get_scoring_model() or _model()
+
+    progress(0.05, "Đang trích xuất yêu cầu công việc")
+    requirements = generate_response(
+        model, build_requirements_messages(params["job_description"], language),
+        priority=PRIORITY_BACKGROUND, raise_errors=True,
+    )
+
+    results = []
+    for index, item in enumerate(resumes):
+        resume_id = item.get("id") or str(index)
+        progress(0.1 + 0.9 * index / max(1, len(resumes)), f"Đang đánh giá CV {index + 1}/{len(resumes)}")
+        try:
+            evaluation = generate_response(
+                model, build_resume_evaluation_messages(requirements, item["content"], language),
+                priority=PRIORITY_BACKGROUND, raise_errors=True, response_schema=ResumeEvaluation,
+            )
+            results.append({"index": index, "id": resume_id, "success": True,
+                            **evaluation_result(evaluation, language)})
+        except GeminiError as e:
+            results.append({"index": index, "id": resume_id, "success": False, "error": str(e)})
+
+    progress(1.0, "Hoàn thành")
+    return {"requirements": requirements, "results": results, "summary": rank_evaluations(results)}
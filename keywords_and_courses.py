@@ -1,10 +1,14 @@
 import streamlit as st
 from gemini_helper import generate_response
+from embedding_index import related_skills
 
 def suggest_keywords(interview_type, job_role, language="vi", gemini_model=None):
     """
     Gợi ý từ khóa và cụm từ quan trọng cho buổi phỏng vấn dựa trên loại phỏng vấn và vị trí công việc
     """
+    # Kỹ năng gần với vị trí công việc trong bộ kỹ năng chuẩn, tính cục bộ bằng embedding
+    skills = [skill for skill, _ in related_skills(job_role)] if job_role else []
+
     if language == "vi":
         system_prompt = """Bạn là một chuyên gia tuyển dụng và phỏng vấn với nhiều năm kinh nghiệm.
 Nhiệm vụ của bạn là đưa ra các từ khóa và cụm từ quan trọng mà ứng viên nên sử dụng trong buổi phỏng vấn.
@@ -19,6 +23,8 @@ Trả lời bằng tiếng Việt."""
         prompt += """.
 Vui lòng đề xuất các từ khóa và cụm từ quan trọng mà tôi nên sử dụng trong buổi phỏng vấn này.
 Phân loại theo nhóm và giải thích cách sử dụng hiệu quả."""
+        if skills:
+            prompt += f"\nCác kỹ năng liên quan đến vị trí này (tham khảo): {', '.join(skills)}."
     else:
         system_prompt = """You are an expert recruiter and interviewer with many years of experience.
 Your task is to provide important keywords and phrases that candidates should use during interviews.
@@ -33,6 +39,8 @@ Answer in English."""
         prompt += """.
 Please suggest important keywords and phrases I should use during this interview.
 Categorize them and explain how to use them effectively."""
+        if skills:
+            prompt += f"\nSkills related to this position (for reference): {', '.join(skills)}."
 
     messages = [
         {"role": "system", "content": system_prompt},
@@ -162,6 +170,10 @@ def display_keywords_suggestions(interview_type=None, job_role=None, gemini_mode
         st.markdown("### Từ khóa quan trọng")
         st.markdown(keywords)
 
+        related = [skill for skill, _ in related_skills(selected_job)] if selected_job else []
+        if related:
+            st.caption(("Kỹ năng liên quan: " if language == "vi" else "Related skills: ") + ", ".join(related))
+
 def display_courses_recommendations(weaknesses=None, gemini_model=None):
     """
     Hiển thị đề xuất khóa học trong giao diện
@@ -3,10 +3,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from gemini_helper import generate_response
+from structured_output import JobMarketInsights
 import time
 import matplotlib.pyplot as plt
 import io
-import json
 
 def analyze_job_market_trends(industry, job_role=None, language="vi", gemini_model=None):
     """
@@ -285,13 +285,7 @@ Bao gồm những thông tin sau:
 4. Các công ty hàng đầu đang tuyển dụng
 5. Dự báo tăng trưởng ngành trong 3-5 năm tới
 
-Hãy định dạng phản hồi dưới dạng JSON với các trường:
-"salary_range": "...",
-"top_skills": ["kỹ năng 1", "kỹ năng 2", ...],
-"hiring_trends": "...",
-"top_companies": ["công ty 1", "công ty 2", ...],
-"growth_forecast": "..."
-
+Viết nội dung các trường bằng tiếng Việt.
 Đảm bảo thông tin cụ thể cho thị trường Việt Nam nếu có thể.
 """
     else:
@@ -303,13 +297,6 @@ Include the following information:
 4. Top companies that are hiring
 5. Industry growth forecast for the next 3-5 years
 
-Format your response as JSON with fields:
-"salary_range": "...",
-"top_skills": ["skill 1", "skill 2", ...],
-"hiring_trends": "...",
-"top_companies": ["company 1", "company 2", ...],
-"growth_forecast": "..."
-
 Ensure information is specific to the {country} market.
 """
 
@@ -318,51 +305,9 @@ Ensure information is specific to the {country} market.
         {"role": "user", "content": prompt}
     ]
     
-    response = generate_response(gemini_model, messages)
-    
-    # Xử lý phản hồi để trích xuất JSON
-    try:
-        # Tìm phần JSON trong phản hồi
-        import re
-        json_match = re.search(r'({[\s\S]*})', response)
-        if json_match:
-            json_str = json_match.group(1)
-            data = json.loads(json_str)
-            return data
-        else:
-            # Thử trích xuất từng phần riêng biệt
-            salary_range = re.search(r'"salary_range":\s*"([^"]*)"', response)
-            salary_range = salary_range.group(1) if salary_range else "N/A"
-            
-            top_skills_match = re.search(r'"top_skills":\s*\[(.*?)\]', response, re.DOTALL)
-            if top_skills_match:
-                top_skills_str = top_skills_match.group(1)
-                top_skills = [skill.strip().strip('"\'') for skill in top_skills_str.split(',')]
-            else:
-                top_skills = ["N/A"]
-            
-            hiring_trends = re.search(r'"hiring_trends":\s*"([^"]*)"', response)
-            hiring_trends = hiring_trends.group(1) if hiring_trends else "N/A"
-            
-            top_companies_match = re.search(r'"top_companies":\s*\[(.*?)\]', response, re.DOTALL)
-            if top_companies_match:
-                top_companies_str = top_companies_match.group(1)
-                top_companies = [company.strip().strip('"\'') for company in top_companies_str.split(',')]
-            else:
-                top_companies = ["N/A"]
-            
-            growth_forecast = re.search(r'"growth_forecast":\s*"([^"]*)"', response)
-            growth_forecast = growth_forecast.group(1) if growth_forecast else "N/A"
-            
-            return {
-                "salary_range": salary_range,
-                "top_skills": top_skills,
-                "hiring_trends": hiring_trends,
-                "top_companies": top_companies,
-                "growth_forecast": growth_forecast
-            }
-    except Exception as e:
-        st.error(f"Error extracting market data: {str(e)}")
+    # Model trả về JSON theo schema JobMarketInsights, đã được kiểm tra trong generate_response
+    insights = generate_response(gemini_model, messages, response_schema=JobMarketInsights)
+    if insights is None:
         return {
             "salary_range": "N/A",
             "top_skills": ["N/A"],
@@ -370,6 +315,7 @@ Ensure information is specific to the {country} market.
             "top_companies": ["N/A"],
             "growth_forecast": "N/A"
         }
+    return insights.model_dump()
 
 def display_market_analysis(gemini_model):
     """
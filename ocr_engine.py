@@ -0,0 +1,373 @@
+import io
+import os
+import math
+import shutil
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import PyPDF2
+from PyPDF2.generic import NameObject
+from PIL import Image, ImageOps
+
+from response_cache import ResponseCache
+from file_ingest import DIGEST_SIZE
+from worker_pool import SharedProcessPool
+
+# pytesseract và chương trình tesseract là tùy chọn; thiếu thì ảnh chỉ được mô tả như trước
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Ngôn ngữ nhận dạng, chỉ dùng những gói ngôn ngữ tesseract đã cài
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "vie+eng")
+
+# Cạnh dài nhất của ảnh sau khi thu nhỏ; ảnh chụp/scan lớn hơn không làm OCR chính xác hơn
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2500"))
+
+# Thời gian tối đa cho một ảnh và số trang tối đa của PDF scan được nhận dạng
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "60"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "30"))
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Góc nghiêng tối đa (độ) và bước dò khi chỉnh thẳng ảnh
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+
+# Ảnh nhỏ hơn kích thước này (theo cạnh ngắn) không đủ chi tiết để nhận dạng
+MIN_OCR_SIDE = 32
+
+# Cache kết quả nhận dạng theo digest của ảnh; tầng SQLite bật khi có OCR_CACHE_DB
+ocr_cache = ResponseCache(
+    memory_entries=int(os.getenv("OCR_CACHE_SIZE", "256")),
+    disk_path=os.getenv("OCR_CACHE_DB") or None,
+    ttl_seconds=float(os.getenv("FILE_CACHE_TTL", str(30 * 24 * 3600))),
+)
+
+
+class OcrUnavailable(RuntimeError):
+    """Raised when no local OCR engine (pytesseract + tesseract) is installed"""
+
+
+@dataclass
+class OcrResult:
+    """Recognized text of an image or of the scanned pages of a PDF"""
+    text: str
+    pages: int = 1
+    cached_pages: int = 0
+    failed_pages: list = field(default_factory=list)
+
+
+_languages = None
+_languages_lock = threading.Lock()
+
+
+def ocr_languages():
+    """
+    Return the configured OCR languages that tesseract can actually use
+
+    Returns:
+        str: Languages joined with "+", or None if no OCR engine is installed
+    """
+    global _languages
+    with _languages_lock:
+        if _languages is None:
+            if pytesseract is None or not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+                _languages = ""
+            else:
+                try:
+                    installed = set(pytesseract.get_languages(config=""))
+                except Exception:
+                    installed = set()
+                wanted = [language for language in OCR_LANGUAGES.split("+") if language in installed]
+                _languages = "+".join(wanted) or ("eng" if "eng" in installed else "")
+        return _languages or None
+
+
+def ocr_available():
+    """Whether images can be recognized locally"""
+    return ocr_languages() is not None
+
+
+def _to_grayscale(pixels):
+    if pixels.ndim == 2:
+        return pixels.astype(np.float32)
+    # Hệ số độ sáng ITU-R BT.601, bỏ kênh alpha nếu có
+    return pixels[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _downscale(gray, max_side):
+    """Shrink by an integer factor, averaging each block of pixels"""
+    factor = math.ceil(max(gray.shape) / max_side) if max_side else 1
+    if factor <= 1:
+        return gray
+    height, width = (gray.shape[0] // factor) * factor, (gray.shape[1] // factor) * factor
+    blocks = gray[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(1, 3))
+
+
+def _otsu_threshold(gray):
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    mean_dark = np.cumsum(histogram * levels) / np.maximum(weight_dark, 1)
+    mean_light = ((histogram * levels).sum() - np.cumsum(histogram * levels)) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+
+def estimate_skew(gray, max_angle=DESKEW_MAX_ANGLE, step=DESKEW_STEP, sample_pixels=200_000):
+    """
+    Estimate the skew of a text image with a projection profile
+
+    Dark pixels are sheared by each candidate angle and summed per row; the
+    angle whose row profile is sharpest (highest variance) aligns the text lines.
+
+    Args:
+        gray (np.ndarray): Grayscale image
+        max_angle (float): Largest skew tried, in degrees
+        step (float): Angle step, in degrees
+        sample_pixels (int): Dark pixels sampled to bound the cost on large images
+
+    Returns:
+        float: Counter-clockwise skew of the text lines, in degrees
+    """
+    ys, xs = np.nonzero(gray < _otsu_threshold(gray))
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > sample_pixels:
+        keep = np.random.default_rng(0).choice(len(ys), sample_pixels, replace=False)
+        ys, xs = ys[keep], xs[keep]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    offset = int(np.ceil(gray.shape[1] * np.tan(np.radians(max_angle)))) + 1
+    best_angle, best_score = 0.0, -1.0
+    for angle in angles:
+        rows = (ys + xs * np.tan(np.radians(angle))).astype(np.int64) + offset
+        score = np.bincount(rows).astype(np.float64).var()
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_image(image, max_side=OCR_MAX_SIDE):
+    """
+    Prepare an image for OCR: apply EXIF orientation, convert to grayscale,
+    downscale and deskew
+
+    Args:
+        image (PIL.Image.Image): Source image
+        max_side (int): Longest side after downscaling
+
+    Returns:
+        PIL.Image.Image: 8-bit grayscale image
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+    gray = _downscale(_to_grayscale(np.asarray(image)), max_side)
+    angle = estimate_skew(gray)
+    prepared = Image.fromarray(np.clip(gray, 0, 255).astype(np.uint8))
+    if angle:
+        prepared = prepared.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return prepared
+
+
+def _recognize(data, languages, timeout):
+    # Chạy trong worker: giải mã, tiền xử lý và nhận dạng một ảnh
+    image = Image.open(io.BytesIO(data))
+    if min(image.size) < MIN_OCR_SIDE:
+        return ""
+    prepared = preprocess_image(image)
+    return pytesseract.image_to_string(prepared, lang=languages, timeout=timeout or 0).strip()
+
+
+_pool = SharedProcessPool(OCR_WORKERS)
+
+
+def _image_digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def recognize_images(images, workers=OCR_WORKERS, timeout=OCR_TIMEOUT):
+    """
+    Recognize the text of several encoded images, cached by image digest
+
+    Cache misses are dispatched to a process pool so decoding, pre-processing
+    and tesseract run outside the calling thread.
+
+    Args:
+        images (list): Encoded images (PNG, JPEG, ...) as bytes
+        workers (int): Number of worker processes
+        timeout (float): Seconds allowed per image, 0 or None to disable
+
+    Returns:
+        OcrResult: Text of the images in order, separated by blank lines
+
+    Raises:
+        OcrUnavailable: If no OCR engine is installed
+    """
+    languages = ocr_languages()
+    if languages is None:
+        raise OcrUnavailable("OCR is not available. Install tesseract and pytesseract to read scanned documents.")
+
+    texts = [None] * len(images)
+    keys = [f"ocr:{languages}:{_image_digest(data)}" for data in images]
+    result = OcrResult("", pages=len(images))
+    pending = []
+    for index, key in enumerate(keys):
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            texts[index] = cached
+            result.cached_pages += 1
+        else:
+            pending.append(index)
+
+    if pending:
+        try:
+            with _pool.session(workers) as session:
+                futures = [(index, session.executor.submit(_recognize, images[index], languages, timeout))
+                           for index in pending]
+                for index, future in futures:
+                    try:
+                        # Giới hạn phòng hờ khi tesseract không tự dừng theo timeout
+                        texts[index] = future.result(timeout=timeout + 5 if timeout else None)
+                        ocr_cache.set(keys[index], texts[index])
+                    except FutureTimeoutError:
+                        # Worker đang treo: pool được thay mới, tiến trình treo bị dừng khi các lần gọi khác xong
+                        session.retire()
+                        future.cancel()
+                        result.failed_pages.append(index + 1)
+                    except BrokenProcessPool:
+                        session.retire()
+                        raise
+                    except Exception:
+                        result.failed_pages.append(index + 1)
+        except BrokenProcessPool:
+            # Worker bị dừng bất thường: pool đã được thay mới cho lần sau, các ảnh chưa xong coi như lỗi
+            result.failed_pages.extend(index + 1 for index in pending
+                                       if texts[index] is None and index + 1 not in result.failed_pages)
+
+    result.text = "\n\n".join(text for text in texts if text)
+    return result
+
+
+def ocr_image(source, **kwargs):
+    """
+    Recognize the text of one image
+
+    Args:
+        source (bytes or file object): Encoded image, or a seekable binary stream over it
+        **kwargs: Passed to recognize_images
+
+    Returns:
+        OcrResult: Recognized text
+    """
+    if not isinstance(source, (bytes, bytearray)):
+        source.seek(0)
+        source = source.read()
+    return recognize_images([bytes(source)], **kwargs)
+
+
+_RAW_IMAGE_MODES = {"/DeviceRGB": "RGB", "/DeviceGray": "L", "/DeviceCMYK": "CMYK"}
+
+
+def _encode_raw_image(xobject, data):
+    """Encode an image whose filter chain PyPDF2 decodes but does not name (e.g. [/ASCII85Decode /FlateDecode])"""
+    if not data:
+        return None
+    if data[:2] == b"\xff\xd8":
+        # Dữ liệu JPEG (DCTDecode nằm cuối chuỗi filter) dùng được trực tiếp
+        return data
+    mode = _RAW_IMAGE_MODES.get(xobject.get("/ColorSpace"))
+    if mode is None or xobject.get("/BitsPerComponent") != 8:
+        return None
+    try:
+        image = Image.frombytes(mode, (xobject["/Width"], xobject["/Height"]), data)
+    except ValueError:
+        return None
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _xobject_images(reader, resources, depth=0):
+    """Yield the encoded images of a resource dictionary, looking inside form XObjects"""
+    xobjects = resources.get("/XObject") if resources else None
+    if not xobjects:
+        return
+    # page.images chỉ đọc /Resources của trang: dựng một trang tạm mang tài nguyên này để dùng lại nó
+    holder = PyPDF2.PageObject(pdf=reader)
+    holder[NameObject("/Resources")] = resources.get_object()
+    named = {image.name.rsplit(".", 1)[0]: image.data for image in holder.images}
+    for name, reference in xobjects.get_object().items():
+        xobject = reference.get_object()
+        subtype = xobject.get("/Subtype")
+        if subtype == "/Image":
+            data = named.get(name[1:])
+            if data is None:
+                # page.images bỏ qua ảnh có chuỗi filter không mang tên định dạng
+                data = _encode_raw_image(xobject, xobject.get_data())
+            if data:
+                yield data
+        elif subtype == "/Form" and depth < 3:
+            # page.images của PyPDF2 bỏ qua ảnh được bọc trong form XObject (thường gặp ở PDF scan)
+            yield from _xobject_images(reader, xobject.get("/Resources"), depth + 1)
+
+
+def scanned_page_images(stream, max_pages=OCR_MAX_PAGES):
+    """
+    Return the largest embedded image of each page of a scanned PDF
+
+    Args:
+        stream: Seekable binary stream over the PDF
+        max_pages (int): Number of leading pages inspected
+
+    Returns:
+        list: Encoded page images as bytes (pages without an image are skipped)
+    """
+    stream.seek(0)
+    reader = PyPDF2.PdfReader(stream)
+    images = []
+    for page in reader.pages[:max_pages]:
+        try:
+            page_images = list(_xobject_images(reader, page.get("/Resources")))
+        except Exception:
+            continue
+        if page_images:
+            images.append(max(page_images, key=len))
+    return images
+
+
+def ocr_pdf(stream, max_pages=OCR_MAX_PAGES, **kwargs):
+    """
+    Recognize the text of a scanned PDF from the images embedded in its pages
+
+    Args:
+        stream: Seekable binary stream over the PDF
+        max_pages (int): Number of leading pages recognized
+        **kwargs: Passed to recognize_images
+
+    Returns:
+        OcrResult: Recognized text, or None if the pages hold no images
+    """
+    images = scanned_page_images(stream, max_pages)
+    if not images:
+        return None
+    return recognize_images(images, **kwargs)
+
+
+def get_ocr_stats():
+    """
+    Return whether OCR is available and the counters of the OCR cache
+
+    Returns:
+        dict: available, languages and cache counters
+    """
+    return {"available": ocr_available(), "languages": ocr_languages(), **ocr_cache.stats()}
@@ -0,0 +1,214 @@
+import io
+import os
+import math
+import ctypes
+import signal
+import threading
+import contextlib
+from dataclasses import dataclass, field
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+
+from file_ingest import FileLimitError, MAX_PDF_PAGES
+from worker_pool import SharedProcessPool
+
+# Tài liệu ít trang hơn ngưỡng này được trích xuất tuần tự, tránh chi phí gửi dữ liệu sang tiến trình khác
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+
+# Thời gian tối đa cho một trang; trang vượt quá bị bỏ qua thay vì làm treo cả lần tải lên
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "10"))
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Số trang tối thiểu trong một phần việc gửi cho worker
+MIN_PAGES_PER_CHUNK = 4
+
+
+class PageTimeout(Exception):
+    """Raised when extracting a single page takes longer than the page timeout"""
+
+
+@dataclass
+class PdfExtractionResult:
+    """Text of a PDF together with what happened while extracting it"""
+    text: str
+    page_count: int
+    parallel: bool = False
+    timed_out_pages: list = field(default_factory=list)
+    failed_pages: list = field(default_factory=list)
+
+
+def _alarm_available():
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextlib.contextmanager
+def _alarm_deadline(seconds):
+    def on_alarm(signum, frame):
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@contextlib.contextmanager
+def _watchdog_deadline(seconds):
+    # SIGALRM chỉ dùng được ở main thread; ở thread khác (Streamlit, threadpool của API) một timer
+    # đặt ngoại lệ PageTimeout vào thread đang trích xuất. Ngoại lệ chỉ được nhận giữa hai lệnh
+    # Python, đủ cho PyPDF2 (thuần Python) nhưng không ngắt được một lời gọi C đang chạy.
+    thread_id = threading.get_ident()
+    lock = threading.Lock()
+    state = {"active": True, "fired": False}
+
+    def on_deadline():
+        with lock:
+            if state["active"]:
+                state["fired"] = True
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(PageTimeout))
+
+    timer = threading.Timer(seconds, on_deadline)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+        with lock:
+            state["active"] = False
+            if state["fired"]:
+                # Trang đã xong đúng lúc hết giờ: bỏ ngoại lệ chưa được nhận để nó không rơi vào mã phía sau
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), None)
+
+
+def _page_deadline(seconds):
+    if not seconds:
+        return contextlib.nullcontext()
+    return _alarm_deadline(seconds) if _alarm_available() else _watchdog_deadline(seconds)
+
+
+def _extract_pages(reader, start, end, page_timeout):
+    """Extract pages [start, end) and return (index, text or None, status) tuples"""
+    pages = []
+    for index in range(start, end):
+        try:
+            with _page_deadline(page_timeout):
+                pages.append((index, reader.pages[index].extract_text() or "", "ok"))
+        except PageTimeout:
+            pages.append((index, None, "timeout"))
+        except Exception:
+            pages.append((index, None, "failed"))
+    return pages
+
+
+def _extract_range(data, start, end, page_timeout):
+    # Chạy trong worker: mỗi tiến trình tự mở tài liệu từ bytes
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return _extract_pages(reader, start, end, page_timeout)
+
+
+_pool = SharedProcessPool(PDF_WORKERS)
+
+
+def _read_all(stream):
+    stream.seek(0)
+    return stream.read()
+
+
+def _page_ranges(page_count, workers):
+    chunk = max(MIN_PAGES_PER_CHUNK, math.ceil(page_count / (workers * 2)))
+    return [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+
+
+def _extract_parallel(data, page_count, workers, page_timeout):
+    with _pool.session(workers) as session:
+        futures = [
+            (start, end, session.executor.submit(_extract_range, data, start, end, page_timeout))
+            for start, end in _page_ranges(page_count, workers)
+        ]
+
+        pages = []
+        for position, (start, end, future) in enumerate(futures):
+            # Giới hạn phòng hờ cho cả phần việc khi hẹn giờ trong worker không có tác dụng
+            # (trang bị treo trong mã C không nhận tín hiệu)
+            chunk_timeout = page_timeout * (end - start) + 5 if page_timeout else None
+            try:
+                pages.extend(future.result(timeout=chunk_timeout))
+            except FutureTimeoutError:
+                # Worker đang treo: ngừng dùng pool này, các tiến trình của nó bị dừng khi mọi
+                # lần gọi đang dùng pool kết thúc. Chỉ hủy phần việc chưa chạy của tài liệu này.
+                session.retire()
+                for _, _, pending in futures[position + 1:]:
+                    pending.cancel()
+                pages.extend((index, None, "timeout") for index in range(start, end))
+            except BrokenProcessPool:
+                session.retire()
+                raise
+            except Exception:
+                pages.extend((index, None, "failed") for index in range(start, end))
+    return pages
+
+
+def extract_pdf_text(source, workers=PDF_WORKERS, page_timeout=PDF_PAGE_TIMEOUT,
+                     parallel_min_pages=PDF_PARALLEL_MIN_PAGES, max_pages=MAX_PDF_PAGES):
+    """
+    Extract the text of a PDF, page ranges spread across a process pool for large documents
+
+    Documents with fewer than parallel_min_pages pages, or when only one
+    worker is configured, are extracted in the calling thread straight from
+    the given stream; the page timeout uses SIGALRM on the main thread and a
+    watchdog timer elsewhere. A page that exceeds page_timeout or cannot be
+    parsed is skipped and reported.
+
+    Args:
+        source (bytes or file object): Content of the PDF, or a seekable binary stream over it
+        workers (int): Number of worker processes for large documents
+        page_timeout (float): Seconds allowed per page, 0 or None to disable
+        parallel_min_pages (int): Page count from which the process pool is used
+        max_pages (int): Page limit checked before any text is extracted, 0 or None to disable
+
+    Returns:
+        PdfExtractionResult: Joined text (one line break after each non-empty page) and page statistics
+
+    Raises:
+        FileLimitError: If the document has more than max_pages pages
+    """
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    stream.seek(0)
+    reader = PyPDF2.PdfReader(stream)
+    page_count = len(reader.pages)
+    if max_pages and page_count > max_pages:
+        raise FileLimitError(f"PDF has {page_count} pages. The maximum is {max_pages} pages.")
+
+    parallel = workers > 1 and page_count >= parallel_min_pages
+    pages = None
+    if parallel:
+        try:
+            # Worker cần bản sao dữ liệu để tự mở tài liệu
+            data = source if isinstance(source, bytes) else _read_all(stream)
+            pages = _extract_parallel(data, page_count, workers, page_timeout)
+        except BrokenProcessPool:
+            # Worker bị dừng bất thường: pool đã được thay mới cho lần sau, trích xuất tuần tự
+            parallel = False
+    if pages is None:
+        pages = _extract_pages(reader, 0, page_count, page_timeout)
+
+    pages.sort(key=lambda page: page[0])
+    parts = []
+    result = PdfExtractionResult("", page_count, parallel)
+    for index, text, status in pages:
+        if status == "timeout":
+            result.timed_out_pages.append(index + 1)
+        elif status == "failed":
+            result.failed_pages.append(index + 1)
+        elif text:
+            parts.append(text)
+            parts.append("\n")
+    result.text = "".join(parts)
+    return result
@@ -14,6 +14,10 @@ import smtplib
 import os
 import logging
 
+from job_queue import JOB_SUCCEEDED
+from job_panel import get_shared_job_queue, display_job_status
+from rate_limiter import PRIORITY_BACKGROUND
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("progress_tracker")
@@ -42,116 +46,16 @@ except ImportError:
             
         return None
 
-def extract_scores_from_feedback(feedback, language="vi"):
+def scores_from_assessment(assessment):
     """
-    Trích xuất điểm số từ phản hồi phỏng vấn
+    Chuyển đánh giá có cấu trúc (InterviewAssessment) thành bản ghi điểm số của lịch sử phỏng vấn
     """
-    # Ghi nhật ký để debug
-    print("=== DEBUG: FEEDBACK CONTENT ===")
-    print(feedback)
-    print("=== END FEEDBACK CONTENT ===")
-    
-    overall_score = 0
-    technical_score = 0
-    communication_score = 0
-    problem_solving_score = 0
-    leadership_score = 0
-    
-    # Tìm điểm tổng thể
-    if language == "vi":
-        overall_pattern = r"(?:điểm\s*(?:số|đánh giá|tổng)(?:\s*(?:tổng thể|chung|cuối cùng))?|đánh giá tổng thể|tổng\s*(?:điểm|số)|điểm\s*tổng\s*kết)[:\s]*(\d+)[\s/]*10"
-    else:
-        overall_pattern = r"(?:overall\s*(?:score|assessment|rating|evaluation|grade|mark|result)|final\s*(?:score|assessment|rating|evaluation|grade|mark|result)|total\s*(?:score|assessment|rating)|assessment\s*(?:score|result)|evaluation\s*(?:score|result)|score\s*overall)[:\s]*(\d+)[\s/]*10"
-    
-    overall_match = re.search(overall_pattern, feedback.lower())
-    if overall_match:
-        overall_score = int(overall_match.group(1))
-        print(f"Found overall score: {overall_score}")
-    else:
-        # Thử thêm một biểu thức chính quy đơn giản hơn nếu không tìm thấy kết quả
-        simple_pattern = r"(\d+)\s*/\s*10"
-        simple_matches = re.findall(simple_pattern, feedback.lower())
-        if simple_matches and len(simple_matches) > 0:
-            # Lấy số đầu tiên tìm thấy
-            overall_score = int(simple_matches[0])
-            print(f"Found overall score using simple pattern: {overall_score}")
-        else:
-            print("Overall score not found")
-    
-    # Tìm điểm kỹ thuật
-    if language == "vi":
-        technical_pattern = r"(?:kỹ\s*thuật|technical)[:\s]*(\d+)[\s/]*10"
-    else:
-        technical_pattern = r"(?:technical\s*(?:skills?|knowledge|competency))[:\s]*(\d+)[\s/]*10"
-    
-    technical_match = re.search(technical_pattern, feedback.lower())
-    if technical_match:
-        technical_score = int(technical_match.group(1))
-        print(f"Found technical score: {technical_score}")
-    elif overall_score > 0:  # Nếu không tìm thấy, ước tính dựa trên điểm tổng thể
-        technical_score = overall_score
-    
-    # Tìm điểm giao tiếp
-    if language == "vi":
-        communication_pattern = r"(?:giao\s*tiếp|communication|trình\s*bày)[:\s]*(\d+)[\s/]*10"
-    else:
-        communication_pattern = r"(?:communication\s*(?:skills?|ability))[:\s]*(\d+)[\s/]*10"
-    
-    communication_match = re.search(communication_pattern, feedback.lower())
-    if communication_match:
-        communication_score = int(communication_match.group(1))
-        print(f"Found communication score: {communication_score}")
-    elif overall_score > 0:  # Nếu không tìm thấy, ước tính dựa trên điểm tổng thể
-        communication_score = overall_score
-    
-    # Tìm điểm giải quyết vấn đề
-    if language == "vi":
-        problem_solving_pattern = r"(?:giải\s*quyết\s*vấn\s*đề|problem\s*solving|khả\s*năng\s*xử\s*lý)[:\s]*(\d+)[\s/]*10"
-    else:
-        problem_solving_pattern = r"(?:problem[\s-]*solving\s*(?:skills?|ability))[:\s]*(\d+)[\s/]*10"
-    
-    problem_solving_match = re.search(problem_solving_pattern, feedback.lower())
-    if problem_solving_match:
-        problem_solving_score = int(problem_solving_match.group(1))
-        print(f"Found problem solving score: {problem_solving_score}")
-    elif overall_score > 0:  # Nếu không tìm thấy, ước tính dựa trên điểm tổng thể
-        problem_solving_score = overall_score
-    
-    # Tìm điểm lãnh đạo
-    if language == "vi":
-        leadership_pattern = r"(?:lãnh\s*đạo|leadership|quản\s*lý)[:\s]*(\d+)[\s/]*10"
-    else:
-        leadership_pattern = r"(?:leadership\s*(?:skills?|ability|quality))[:\s]*(\d+)[\s/]*10"
-    
-    leadership_match = re.search(leadership_pattern, feedback.lower())
-    if leadership_match:
-        leadership_score = int(leadership_match.group(1))
-        print(f"Found leadership score: {leadership_score}")
-    elif overall_score > 0:  # Nếu không tìm thấy, ước tính dựa trên điểm tổng thể
-        leadership_score = max(1, int(overall_score * 0.8))  # Giả định điểm lãnh đạo thấp hơn tổng thể
-    
-    # Nếu điểm tổng thể không được tìm thấy nhưng các điểm thành phần có, hãy tính trung bình
-    if overall_score == 0 and (technical_score > 0 or communication_score > 0 or problem_solving_score > 0 or leadership_score > 0):
-        valid_scores = []
-        if technical_score > 0:
-            valid_scores.append(technical_score)
-        if communication_score > 0:
-            valid_scores.append(communication_score)
-        if problem_solving_score > 0:
-            valid_scores.append(problem_solving_score)
-        if leadership_score > 0:
-            valid_scores.append(leadership_score)
-        
-        if valid_scores:
-            overall_score = sum(valid_scores) // len(valid_scores)
-            print(f"Calculated overall score from component scores: {overall_score}")
-    
     return {
-        "overall": overall_score,
-        "technical": technical_score,
-        "communication": communication_score,
-        "problem_solving": problem_solving_score,
-        "leadership": leadership_score,
+        "overall": assessment.overall,
+        "technical": assessment.technical,
+        "communication": assessment.communication,
+        "problem_solving": assessment.problem_solving,
+        "leadership": assessment.leadership,
         "date": datetime.now().strftime("%Y-%m-%d"),
         "timestamp": time.time()
     }
@@ -180,11 +84,14 @@ def save_interview_results(scores, job_role=None, interview_type=None):
                 "timestamp": scores["timestamp"]
             })
 
-def create_progress_chart():
+def create_progress_chart(skills_progress=None):
     """
     Tạo biểu đồ tiến trình kỹ năng theo thời gian
     """
-    if not st.session_state.skills_progress["overall"]:
+    if skills_progress is None:
+        skills_progress = st.session_state.skills_progress
+    
+    if not skills_progress["overall"]:
         return None
     
     # Tạo DataFrame từ dữ liệu tiến trình
@@ -198,8 +105,8 @@ def create_progress_chart():
     }
     
     # Lấy thời gian từ điểm overall
-    timestamps = [entry["timestamp"] for entry in st.session_state.skills_progress["overall"]]
-    dates = [entry["date"] for entry in st.session_state.skills_progress["overall"]]
+    timestamps = [entry["timestamp"] for entry in skills_progress["overall"]]
+    dates = [entry["date"] for entry in skills_progress["overall"]]
     
     for i, (timestamp, date) in enumerate(zip(timestamps, dates)):
         data["Date"].append(date)
@@ -215,7 +122,7 @@ def create_progress_chart():
             closest_entry = None
             min_diff = float('inf')
             
-            for entry in st.session_state.skills_progress[skill]:
+            for entry in skills_progress[skill]:
                 diff = abs(entry["timestamp"] - timestamp)
                 if diff < min_diff:
                     min_diff = diff
@@ -247,6 +154,7 @@ def create_progress_chart():
     # Lưu biểu đồ vào buffer
     buf = io.BytesIO()
     plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
+    plt.close()
     buf.seek(0)
     
     return buf
@@ -259,10 +167,17 @@ def get_pdf_download_link(content, filename="interview_progress_report.pdf"):
     href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}" class="download-button">📥 Tải báo cáo PDF</a>'
     return href
 
-def generate_pdf_report(gemini_model, language="vi"):
+def generate_pdf_report(gemini_model, language="vi", interview_history=None, skills_progress=None):
     """
     Tạo báo cáo PDF về tiến trình phỏng vấn
+    
+    interview_history và skills_progress mặc định lấy từ session_state; worker chạy nền truyền trực tiếp
     """
+    if interview_history is None:
+        interview_history = st.session_state.interview_history
+    if skills_progress is None:
+        skills_progress = st.session_state.skills_progress
+    
     from reportlab.lib.pagesizes import letter
     from reportlab.pdfgen import canvas
     from reportlab.lib import colors
@@ -345,14 +260,14 @@ def generate_pdf_report(gemini_model, language="vi"):
     elements.append(Spacer(1, 0.25*inch))
     
     # Thêm tóm tắt tiến trình
-    if st.session_state.interview_history:
+    if interview_history:
         summary_title = "Progress Summary" if language == "en" else "Tóm Tắt Tiến Trình"
         elements.append(Paragraph(summary_title, heading1_style))
         elements.append(Spacer(1, 0.15*inch))
         
         # Tính điểm trung bình và tiến bộ
-        first_scores = st.session_state.interview_history[0]
-        last_scores = st.session_state.interview_history[-1]
+        first_scores = interview_history[0]
+        last_scores = interview_history[-1]
         
         # Bảng tiến trình
         progress_data = [
@@ -397,7 +312,7 @@ def generate_pdf_report(gemini_model, language="vi"):
         elements.append(Spacer(1, 0.25*inch))
         
         # Thêm biểu đồ tiến trình
-        chart_buffer = create_progress_chart()
+        chart_buffer = create_progress_chart(skills_progress)
         if chart_buffer:
             chart_title = "Progress Chart" if language == "en" else "Biểu Đồ Tiến Trình"
             elements.append(Paragraph(chart_title, heading1_style))
@@ -408,7 +323,7 @@ def generate_pdf_report(gemini_model, language="vi"):
             elements.append(Spacer(1, 0.25*inch))
         
         # Thêm gợi ý cải thiện từ AI
-        if len(st.session_state.interview_history) >= 2:
+        if len(interview_history) >= 2:
             suggestion_title = "AI Improvement Suggestions" if language == "en" else "Gợi Ý Cải Thiện Từ AI"
             elements.append(Paragraph(suggestion_title, heading1_style))
             elements.append(Spacer(1, 0.15*inch))
@@ -437,8 +352,9 @@ Giữ phản hồi của bạn ngắn gọn và có thể thực hiện được
                 {"role": "user", "content": prompt}
             ]
             
-            from gemini_helper import generate_response
-            ai_suggestions = generate_response(gemini_model, messages)
+            from gemini_helper import generate_response, PRIORITY_BACKGROUND
+            # Báo cáo chạy nền nên nhường hạn mức cho các yêu cầu chat tương tác
+            ai_suggestions = generate_response(gemini_model, messages, priority=PRIORITY_BACKGROUND)
             
             # Thêm gợi ý vào báo cáo
             elements.append(Paragraph(ai_suggestions, normal_style))
@@ -687,9 +603,25 @@ def display_progress_tracker(gemini_model):
     # Tạo báo cáo PDF
     st.markdown(f"<div class='progress-section {theme_class}'><h2 class='progress-title'>{export_title}</h2>", unsafe_allow_html=True)
     
+    # Báo cáo được tạo bởi worker chạy nền; job_id lưu trên URL nên tải lại trang vẫn xem được kết quả
+    job_queue = get_shared_job_queue()
+    
     if st.button(pdf_button_text, key="generate_pdf_btn", use_container_width=False):
-        with st.spinner(pdf_generating):
-            pdf_content = generate_pdf_report(gemini_model, language)
+        st.query_params["report_job"] = job_queue.submit(
+            "progress_report",
+            {
+                "language": language,
+                "interview_history": st.session_state.interview_history,
+                "skills_progress": st.session_state.skills_progress
+            },
+            priority=PRIORITY_BACKGROUND
+        )
+    
+    report_job_id = st.query_params.get("report_job")
+    if report_job_id:
+        report_job = display_job_status(job_queue, report_job_id, language)
+        if report_job and report_job["status"] == JOB_SUCCEEDED:
+            pdf_content, _ = job_queue.result(report_job_id)
             st.success(pdf_success)
             
             # Hiển thị link tải xuống
@@ -0,0 +1,193 @@
+import time
+import heapq
+import itertools
+import threading
+
+from token_budget import count_tokens
+
+# Mức ưu tiên: số nhỏ hơn được phục vụ trước
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Ước lượng số token đầu ra cho mỗi lời gọi khi tính hạn mức token/phút
+EXPECTED_OUTPUT_TOKENS = 512
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than its timeout for quota"""
+
+
+def estimate_tokens(gemini_messages):
+    """
+    Roughly estimate the tokens of a request
+
+    Args:
+        gemini_messages (list): Gemini contents with 'role' and 'parts'
+
+    Returns:
+        int: Estimated prompt tokens plus the expected output tokens
+    """
+    prompt_tokens = sum(count_tokens(str(part)) for message in gemini_messages for part in message.get("parts", []))
+    return prompt_tokens + EXPECTED_OUTPUT_TOKENS
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at a fixed rate
+
+    Args:
+        capacity (float): Maximum number of tokens held
+        refill_per_second (float): Tokens added per second
+        clock (callable): Monotonic time source, injectable for tests
+    """
+
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._updated_at = now
+
+    def available(self):
+        self._refill()
+        return self._tokens
+
+    def time_until(self, amount):
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        deficit = amount - self._tokens
+        return max(0.0, deficit / self.refill_per_second) if deficit > 0 else 0.0
+
+    def consume(self, amount):
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+    def drain(self):
+        self._refill()
+        self._tokens = 0.0
+
+
+class RateLimiter:
+    """
+    Client-side limiter on requests per minute and tokens per minute
+
+    Callers queue instead of failing. Waiting callers are served by priority
+    (PRIORITY_INTERACTIVE before PRIORITY_BACKGROUND), then in arrival order.
+
+    Args:
+        requests_per_minute (float): Request quota
+        tokens_per_minute (float): Token quota (prompt + expected output)
+        clock (callable): Monotonic time source, injectable for tests
+        sleep (callable, optional): Sleep function used while waiting. When given
+                                    (e.g. one advancing a fake clock), it replaces
+                                    the condition-variable wait.
+    """
+
+    def __init__(self, requests_per_minute=15, tokens_per_minute=1_000_000, clock=time.monotonic, sleep=None):
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0, clock)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0, clock)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._blocked_until = 0.0
+        self._stats = {"acquired": 0, "queued": 0, "timeouts": 0, "total_wait": 0.0}
+
+    def acquire(self, estimated_tokens=0, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Block until the request fits in both quotas
+
+        Args:
+            estimated_tokens (int): Estimated tokens of the request
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+            timeout (float, optional): Maximum seconds to wait, None to wait forever
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        start = self._clock()
+        ticket = (priority, next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            queued = False
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = max(
+                            self._blocked_until - self._clock(),
+                            self._requests.time_until(1),
+                            self._tokens.time_until(estimated_tokens),
+                        )
+                        if delay <= 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(estimated_tokens)
+                            heapq.heappop(self._waiters)
+                            self._cond.notify_all()
+                            break
+                    else:
+                        # Chưa tới lượt: chờ request phía trước được phục vụ
+                        delay = None
+
+                    queued = True
+                    if timeout is not None:
+                        remaining = timeout - (self._clock() - start)
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise RateLimitTimeout(f"Waited more than {timeout}s for Gemini quota")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._wait(delay)
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+            waited = self._clock() - start
+            self._stats["acquired"] += 1
+            self._stats["queued"] += int(queued)
+            self._stats["total_wait"] += waited
+            return waited
+
+    def _wait(self, delay):
+        if self._sleep is None:
+            self._cond.wait(delay)
+            return
+        # Với đồng hồ giả lập: nhả khóa rồi "ngủ" để đồng hồ tiến lên
+        self._cond.release()
+        try:
+            self._sleep(delay if delay is not None else 0.01)
+        finally:
+            self._cond.acquire()
+
+    def penalize(self, seconds):
+        """
+        Pause all requests after the server reported a quota error
+
+        Args:
+            seconds (float): Cool-down before the next request may start
+        """
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+            self._requests.drain()
+
+    def stats(self):
+        """
+        Return limiter counters
+
+        Returns:
+            dict: acquired, queued, timeouts, total_wait and current queue length
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["waiting"] = len(self._waiters)
+            return stats
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "executed": 0, "coalesced": 0}
+
+    def count(self, *names):
+        with self._lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls made from different threads
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._counters = _Counters()
+
+    def do(self, key, fn):
+        """
+        Run fn once for all concurrent callers sharing the same key
+
+        Args:
+            key (str): Identity of the request, e.g. a normalized prompt hash
+            fn (callable): Function without arguments performing the real call
+
+        Returns:
+            The return value of fn
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            self._counters.count("requests", "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self._counters.count("requests", "executed")
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        """
+        Return coalescing counters
+
+        Returns:
+            dict: requests, executed (upstream calls), coalesced and in_flight
+        """
+        stats = self._counters.snapshot()
+        stats["in_flight"] = self.in_flight()
+        return stats
+
+    def reset_stats(self):
+        self._counters.reset()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent identical awaitables on an asyncio event loop
+
+    The shared call runs in its own task, so a caller that disconnects or
+    gets cancelled does not cancel the result for the other waiters.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._counters = _Counters()
+
+    async def do(self, key, factory):
+        """
+        Await factory() once for all concurrent callers sharing the same key
+
+        Args:
+            key (str): Identity of the request, e.g. a normalized prompt hash
+            factory (callable): Function returning a new awaitable for the real call
+
+        Returns:
+            The result of the awaitable
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+
+        task = self._tasks.get(flight_key)
+        if task is None:
+            self._counters.count("requests", "executed")
+            task = asyncio.ensure_future(factory())
+            self._tasks[flight_key] = task
+            task.add_done_callback(lambda finished: self._finish(flight_key, finished))
+        else:
+            self._counters.count("requests", "coalesced")
+
+        return await asyncio.shield(task)
+
+    def _finish(self, flight_key, task):
+        self._tasks.pop(flight_key, None)
+        # Đánh dấu đã đọc exception để asyncio không cảnh báo khi mọi caller đã bị hủy
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        stats = self._counters.snapshot()
+        stats["in_flight"] = len(self._tasks)
+        return stats
+
+    def reset_stats(self):
+        self._counters.reset()
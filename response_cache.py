@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(contents, model_name="", generation_config=None):
+    """
+    Build a content-addressed key for a model request
+
+    Args:
+        contents (list): Gemini contents (already converted from chat messages)
+        model_name (str): Name of the model that will answer the request
+        generation_config (dict, optional): Generation parameters of the model
+
+    Returns:
+        str: Hex SHA-256 digest of the normalized request
+    """
+    normalized = []
+    for content in contents:
+        parts = [_normalize_text(part) if isinstance(part, str) else str(part) for part in content.get("parts", [])]
+        normalized.append({"role": content.get("role"), "parts": parts})
+
+    payload = json.dumps(
+        {
+            "model": model_name or "",
+            "config": generation_config or {},
+            "contents": normalized,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize_text(text):
+    # Bỏ khác biệt về xuống dòng và khoảng trắng thừa ở cuối dòng
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory least-recently-used cache
+
+    Args:
+        max_entries (int): Number of entries kept before the oldest is evicted
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier stored in a SQLite file
+
+    Entries expire after ttl_seconds, and the least recently accessed
+    entries are evicted once the table grows beyond max_entries.
+
+    Args:
+        path (str): Path of the SQLite database file
+        ttl_seconds (float, optional): Lifetime of an entry, None to keep forever
+        max_entries (int): Maximum number of rows kept on disk
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: an in-memory LRU in front of an optional SQLite tier
+
+    Args:
+        memory_entries (int): Capacity of the in-memory LRU tier
+        disk_path (str, optional): SQLite file for the disk tier, None to disable it
+        ttl_seconds (float, optional): Lifetime of disk entries
+        max_disk_entries (int): Maximum number of rows in the disk tier
+    """
+
+    def __init__(self, memory_entries=256, disk_path=None, ttl_seconds=7 * 24 * 3600, max_disk_entries=5000):
+        self.memory = LRUCache(memory_entries)
+        self.disk = SQLiteCache(disk_path, ttl_seconds, max_disk_entries) if disk_path else None
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "stores": 0}
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits", "memory_hits")
+            return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                # Đưa lên tầng bộ nhớ cho lần truy cập sau
+                self.memory.set(key, value)
+                self._count("hits", "disk_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+        self._count("stores")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """
+        Return hit/miss counters of the cache
+
+        Returns:
+            dict: Counters plus hit_rate and the current size of each tier
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        stats["disk_entries"] = len(self.disk) if self.disk is not None else 0
+        return stats
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def _count(self, *names):
+        with self._stats_lock:
+            for name in names:
+                self._stats[name] += 1
@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+
+from gemini_errors import GeminiCircuitOpenError, GeminiTimeoutError, classify_error
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream service is in a sustained outage
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected immediately. Once recovery_timeout has passed, a single trial
+    call is let through (half-open); its outcome closes or re-opens the circuit.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        recovery_timeout (float): Seconds to stay open before a trial call
+        clock (callable): Monotonic time source, injectable for tests
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Raise GeminiCircuitOpenError if the call must not be attempted"""
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self.recovery_timeout - (self._clock() - self._opened_at)
+                if remaining > 0:
+                    self._rejected += 1
+                    raise GeminiCircuitOpenError(
+                        "Gemini is temporarily unavailable, please try again later",
+                        retry_after=remaining,
+                    )
+                self._state = self.HALF_OPEN
+                self._trial_in_progress = False
+
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_progress:
+                    self._rejected += 1
+                    raise GeminiCircuitOpenError("Gemini is recovering, please try again shortly")
+                self._trial_in_progress = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures, "rejected": self._rejected}
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff, jitter and a total deadline
+
+    The delay before attempt n+1 is min(max_delay, base_delay * 2**(n-1)),
+    reduced by a random fraction up to `jitter` (1.0 = full jitter). A retry is
+    skipped when its delay would end past the deadline.
+
+    Args:
+        max_attempts (int): Attempts including the first one
+        base_delay (float): Delay before the first retry, in seconds
+        max_delay (float): Upper bound of a single delay
+        jitter (float): Fraction of the delay randomized away (0 to 1)
+        total_timeout (float, optional): Deadline for all attempts together
+        clock (callable): Monotonic time source, injectable for tests
+        sleep (callable): Sleep function, injectable for tests
+        rng (random.Random, optional): Random source for the jitter
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=16.0, jitter=1.0, total_timeout=90.0,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.total_timeout = total_timeout
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "failures": 0}
+
+    def backoff(self, attempt, retry_after=None):
+        """Delay in seconds after the given (1-based) failed attempt"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay *= 1 - self.jitter * self._rng.random()
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def run(self, fn, breaker=None):
+        """
+        Call fn until it succeeds, a non-retryable error occurs or time runs out
+
+        Args:
+            fn (callable): Receives the remaining seconds (or None) and performs one attempt
+            breaker (CircuitBreaker, optional): Circuit breaker guarding the calls
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            GeminiError: Typed error of the last failed attempt
+        """
+        self._count("calls")
+        deadline = self._clock() + self.total_timeout if self.total_timeout else None
+
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    self._count("failures")
+                    raise GeminiTimeoutError(f"Gemini did not answer within {self.total_timeout}s")
+
+            if breaker is not None:
+                breaker.before_call()
+
+            try:
+                result = fn(remaining)
+            except Exception as e:
+                error = classify_error(e)
+                if error is not e:
+                    error.__cause__ = e
+                if breaker is not None:
+                    if error.counts_for_breaker:
+                        breaker.record_failure()
+                    else:
+                        # Server vẫn phản hồi (ví dụ lỗi 4xx) nên không tính là sự cố
+                        breaker.record_success()
+
+                if not error.retryable or attempt == self.max_attempts:
+                    self._count("failures")
+                    raise error
+
+                delay = self.backoff(attempt, error.retry_after)
+                if deadline is not None and self._clock() + delay >= deadline:
+                    self._count("failures")
+                    raise error
+
+                self._count("retries")
+                self._sleep(delay)
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
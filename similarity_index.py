@@ -0,0 +1,447 @@
+import os
+import re
+import json
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+from scipy import sparse
+
+from skill_matcher import get_skill_matcher
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "SIMILARITY_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "similarity_index")
+)
+
+# Tham số BM25 chuẩn
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Kỹ năng (tên chuẩn theo từ điển, nên "JS" và "JavaScript" là một) được tính thêm như một term riêng với trọng số cao hơn
+SKILL_TERM_WEIGHT = 2.0
+
+INDEX_FORMAT = 1
+
+_TOKEN = re.compile(r"[^\W\d_][\w+#]*")
+
+# Từ chức năng tiếng Anh và tiếng Việt không mang nghĩa khi so khớp
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that the their this to was we were will with you your
+các cho có của được để là một những này trong và với về từ khi đã đang sẽ như theo tại trên cũng nhiều hơn rất
+""".split())
+
+
+def tokenize(text):
+    """
+    Split a text into index terms
+
+    Words are lowercased and stop words dropped; every skill found by the
+    taxonomy matcher adds a "skill:<name>" term.
+
+    Returns:
+        dict: {term: weighted frequency}
+    """
+    counts = {}
+    for token in _TOKEN.findall((text or "").lower()):
+        if len(token) > 1 and token not in _STOPWORDS:
+            counts[token] = counts.get(token, 0) + 1
+    for match in get_skill_matcher().find(text or ""):
+        term = "skill:" + match.skill.lower()
+        counts[term] = counts.get(term, 0) + SKILL_TERM_WEIGHT
+    return counts
+
+
+class SimilarityIndex:
+    """
+    Sparse TF-IDF / BM25 index over a collection of documents
+
+    Raw term frequencies are kept as a CSR matrix (one row per document) and
+    the TF-IDF or BM25 weights are derived from it in one vectorized pass,
+    so adding documents only appends rows and new vocabulary columns. A
+    query (or every document of one kind against every document of another)
+    is scored against the whole collection with a single sparse matrix
+    product.
+
+    With a path, the matrix is persisted as raw arrays that are memory-mapped
+    on load and appended to on add, so the index reloads instantly and
+    adding a document never rewrites the existing ones. Several processes
+    (API workers, the Streamlit app) may share the directory: appends are
+    serialized by a file lock and each process reloads the index when
+    another one has added documents (without fcntl, e.g. on Windows, only
+    one process may write).
+
+    Args:
+        path (str, optional): Directory of the persisted index, None for an in-memory index
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._signature = None
+        self._clear()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _clear(self):
+        self._vocabulary = {}
+        self._terms = []
+        self._ids = []
+        self._kinds = []
+        self._positions = {}
+        self._data = np.zeros(0, dtype=np.float32)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._indptr = np.zeros(1, dtype=np.int32)
+        self._weights = {}
+        self._meta = {"format": INDEX_FORMAT, "documents": 0, "terms": 0, "nnz": 0,
+                      "vocabulary_bytes": 0, "documents_bytes": 0}
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _meta_signature(self):
+        try:
+            status = os.stat(self._file("meta.json"))
+        except FileNotFoundError:
+            return None
+        return status.st_ino, status.st_mtime_ns, status.st_size
+
+    def _refresh(self):
+        """Reload the persisted index if another process has added documents since it was read"""
+        if not self.path:
+            return
+        signature = self._meta_signature()
+        if signature != self._signature:
+            self._clear()
+            self._load()
+
+    @contextlib.contextmanager
+    def _writer_lock(self):
+        # Khóa giữa các tiến trình: chỉ một tiến trình nối thêm vào các file của chỉ mục tại một thời điểm
+        if not self.path or fcntl is None:
+            yield
+            return
+        with open(self._file("write.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        # Lấy dấu của meta.json trước khi đọc: nếu nó đổi trong lúc đọc, lần _refresh sau sẽ tải lại
+        self._signature = self._meta_signature()
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        if meta.get("format") != INDEX_FORMAT:
+            return
+        self._meta = meta
+        # Chỉ đọc phần đã được ghi nhận trong meta.json; phần ghi dở của lần trước bị bỏ qua
+        with open(self._file("vocabulary.txt"), "rb") as f:
+            self._terms = f.read(meta["vocabulary_bytes"]).decode("utf-8").split("\n")[:meta["terms"]]
+        self._vocabulary = {term: column for column, term in enumerate(self._terms)}
+        with open(self._file("documents.jsonl"), "rb") as f:
+            documents = [json.loads(line) for line in f.read(meta["documents_bytes"]).splitlines()]
+        self._ids = [document["id"] for document in documents]
+        self._kinds = [document["kind"] for document in documents]
+        self._positions = {document_id: row for row, document_id in enumerate(self._ids)}
+        self._map_arrays()
+
+    def _map_arrays(self):
+        # Ánh xạ file vào bộ nhớ: dữ liệu chỉ được đọc khi cần, không sao chép khi tải
+        def view(name, dtype, count):
+            if not count:
+                return np.zeros(count, dtype=dtype)
+            return np.memmap(self._file(name), dtype=dtype, mode="r", shape=(count,))
+        self._data = view("data.bin", np.float32, self._meta["nnz"])
+        self._indices = view("indices.bin", np.int32, self._meta["nnz"])
+        self._indptr = view("indptr.bin", np.int32, self._meta["documents"] + 1)
+
+    def _append(self, name, committed, payload):
+        with open(self._file(name), "ab") as f:
+            # Bỏ phần ghi dở của lần trước (nếu tiến trình dừng giữa chừng) rồi nối thêm
+            f.truncate(committed)
+            f.write(payload)
+        return committed + len(payload)
+
+    def _append_files(self, rows, new_terms):
+        meta = dict(self._meta)
+        data = np.concatenate([row[1] for row in rows]).astype(np.float32)
+        indices = np.concatenate([row[0] for row in rows]).astype(np.int32)
+        indptr = meta["nnz"] + np.cumsum([len(row[0]) for row in rows])
+        if not meta["documents"]:
+            indptr = np.concatenate([[0], indptr])
+        self._append("data.bin", meta["nnz"] * 4, data.tobytes())
+        self._append("indices.bin", meta["nnz"] * 4, indices.tobytes())
+        self._append("indptr.bin", (meta["documents"] + 1) * 4 if meta["documents"] else 0,
+                     indptr.astype(np.int32).tobytes())
+        meta["vocabulary_bytes"] = self._append(
+            "vocabulary.txt", meta["vocabulary_bytes"], "".join(term + "\n" for term in new_terms).encode("utf-8")
+        )
+        documents = "".join(json.dumps({"id": document_id, "kind": kind}, ensure_ascii=False) + "\n"
+                            for document_id, kind in zip(self._ids[-len(rows):], self._kinds[-len(rows):]))
+        meta["documents_bytes"] = self._append("documents.jsonl", meta["documents_bytes"], documents.encode("utf-8"))
+        meta.update(documents=len(self._ids), terms=len(self._terms), nnz=meta["nnz"] + len(data))
+        # meta.json được thay thế sau cùng: nó quyết định phần dữ liệu nào đã hoàn chỉnh
+        temporary = self._file("meta.json.tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporary, self._file("meta.json"))
+        self._meta = meta
+        self._signature = self._meta_signature()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, document_id):
+        return document_id in self._positions
+
+    def kind_of(self, document_id):
+        """Return the kind a document was indexed with, None if it is not indexed"""
+        with self._lock:
+            self._refresh()
+            position = self._positions.get(document_id)
+            return self._kinds[position] if position is not None else None
+
+    def add(self, document_id, text, kind="other"):
+        """
+        Add a document to the index
+
+        Args:
+            document_id (str): Unique id (e.g. the content digest of an upload)
+            text (str): Document text
+            kind (str): Document kind, e.g. "resume" or "job_description"
+
+        Returns:
+            bool: False if the id was already indexed
+        """
+        return self.add_many([(document_id, text, kind)]) == 1
+
+    def add_many(self, documents):
+        """
+        Add several documents in one append
+
+        Args:
+            documents (iterable): (document_id, text, kind) tuples
+
+        Returns:
+            int: Number of documents added (ids already indexed are skipped)
+        """
+        with self._lock, self._writer_lock():
+            # Nối thêm sau phần do tiến trình khác đã ghi, không cắt bỏ nó
+            self._refresh()
+            document_count, term_count = len(self._ids), len(self._terms)
+            try:
+                return self._add_rows(documents)
+            except BaseException:
+                # Ghi file thất bại: trả trạng thái trong bộ nhớ về như trước khi thêm
+                for document_id in self._ids[document_count:]:
+                    del self._positions[document_id]
+                for term in self._terms[term_count:]:
+                    del self._vocabulary[term]
+                del self._ids[document_count:], self._kinds[document_count:], self._terms[term_count:]
+                raise
+
+    def _add_rows(self, documents):
+        rows, new_terms, seen = [], [], set()
+        for document_id, text, kind in documents:
+            if document_id in self._positions or document_id in seen:
+                continue
+            seen.add(document_id)
+            counts = tokenize(text)
+            columns = []
+            for term in counts:
+                column = self._vocabulary.get(term)
+                if column is None:
+                    column = self._vocabulary[term] = len(self._terms)
+                    self._terms.append(term)
+                    new_terms.append(term)
+                columns.append(column)
+            order = np.argsort(columns)
+            rows.append((np.asarray(columns, dtype=np.int32)[order],
+                         np.fromiter(counts.values(), dtype=np.float32, count=len(counts))[order]))
+            self._positions[document_id] = len(self._ids)
+            self._ids.append(document_id)
+            self._kinds.append(kind)
+        if not rows:
+            return 0
+
+        if self.path:
+            self._append_files(rows, new_terms)
+            self._map_arrays()
+        else:
+            lengths = np.cumsum([len(row[0]) for row in rows]) + len(self._data)
+            self._data = np.concatenate([self._data] + [row[1] for row in rows])
+            self._indices = np.concatenate([self._indices] + [row[0] for row in rows])
+            self._indptr = np.concatenate([self._indptr, lengths.astype(np.int32)])
+        self._weights.clear()
+        return len(rows)
+
+    def _counts(self):
+        matrix = sparse.csr_matrix(
+            (self._data, self._indices, self._indptr), shape=(len(self._ids), len(self._terms)), copy=False
+        )
+        matrix.has_sorted_indices = True
+        return matrix
+
+    def _idf(self, counts, method):
+        documents = counts.shape[0]
+        frequency = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.float32)
+        if method == "bm25":
+            return np.log1p((documents - frequency + 0.5) / (frequency + 0.5))
+        return np.log((1 + documents) / (1 + frequency)) + 1
+
+    def _weighted(self, method):
+        """Document weight matrix of the collection, cached until the next add"""
+        cached = self._weights.get(method)
+        if cached is not None:
+            return cached
+        counts = self._counts()
+        idf = self._idf(counts, method)
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        tf = np.asarray(counts.data, dtype=np.float32)
+        if method == "bm25":
+            lengths = np.asarray(counts.sum(axis=1)).ravel()
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1e-9))
+            data = idf[counts.indices] * tf * (BM25_K1 + 1) / (tf + norm[rows])
+        else:
+            data = idf[counts.indices] * (1 + np.log(tf))
+        weighted = sparse.csr_matrix((data.astype(np.float32), counts.indices, counts.indptr), shape=counts.shape)
+        if method == "tfidf":
+            weighted = _normalize_rows(weighted)
+        self._weights[method] = (weighted, idf)
+        return weighted, idf
+
+    def _query_matrix(self, texts, method, idf):
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            counts = {self._vocabulary[term]: count for term, count in tokenize(text).items() if term in self._vocabulary}
+            indices.extend(counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        query = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+            shape=(len(texts), len(self._terms)),
+        )
+        return self._as_query(query, method, idf)
+
+    def _as_query(self, counts, method, idf):
+        if method == "bm25":
+            # BM25: mỗi term của truy vấn được tính một lần
+            query = counts.copy()
+            query.data = np.ones_like(query.data)
+            return query
+        query = counts.copy()
+        query.data = (1 + np.log(query.data)) * idf[query.indices]
+        return _normalize_rows(query)
+
+    def _targets(self, method, kind):
+        """Weight matrix restricted to the documents of one kind, cached until the next add"""
+        key = (method, kind)
+        cached = self._weights.get(key)
+        if cached is None:
+            weighted, idf = self._weighted(method)
+            rows = self._rows_of_kind(kind)
+            cached = self._weights[key] = (weighted[rows].T.tocsr() if len(rows) else None, rows, idf)
+        return cached
+
+    def _rows_of_kind(self, kind):
+        if kind is None:
+            return np.arange(len(self._ids))
+        return np.flatnonzero(np.asarray(self._kinds, dtype=object) == kind)
+
+    def scores(self, queries, method="bm25", kind=None):
+        """
+        Score query texts against the indexed documents in one matrix product
+
+        Args:
+            queries (list): Query texts
+            method (str): "bm25" (unbounded scores) or "tfidf" (cosine similarity, 0-1)
+            kind (str, optional): Only score documents of this kind
+
+        Returns:
+            tuple: (np.ndarray of shape (len(queries), documents), list of document ids)
+        """
+        _check_method(method)
+        with self._lock:
+            self._refresh()
+            if not self._ids:
+                return np.zeros((len(queries), 0), dtype=np.float32), []
+            targets, rows, idf = self._targets(method, kind)
+            if targets is None:
+                return np.zeros((len(queries), 0), dtype=np.float32), []
+            query = self._query_matrix(queries, method, idf)
+            result = (query @ targets).toarray()
+            return result, [self._ids[row] for row in rows]
+
+    def pairwise(self, query_kind, target_kind, method="bm25"):
+        """
+        Score every indexed document of one kind against every document of another
+
+        Args:
+            query_kind (str): Kind of the rows, e.g. "job_description"
+            target_kind (str): Kind of the columns, e.g. "resume"
+            method (str): "bm25" or "tfidf"
+
+        Returns:
+            tuple: (score matrix, row document ids, column document ids)
+        """
+        _check_method(method)
+        with self._lock:
+            self._refresh()
+            query_rows = self._rows_of_kind(query_kind)
+            targets, target_rows, idf = self._targets(method, target_kind) if self._ids else (None, [], None)
+            if not len(query_rows) or targets is None:
+                return np.zeros((len(query_rows), len(target_rows)), dtype=np.float32), [], []
+            query = self._as_query(self._counts()[query_rows], method, idf)
+            result = (query @ targets).toarray()
+            return result, [self._ids[row] for row in query_rows], [self._ids[row] for row in target_rows]
+
+    def rank(self, query, method="bm25", kind=None, top_k=10, exclude=None):
+        """
+        Rank the indexed documents against one query text
+
+        Args:
+            exclude (str, optional): Document id left out of the ranking (e.g. the query document itself)
+
+        Returns:
+            list: [{"id", "kind", "score"}] best first, documents with a zero score left out
+        """
+        with self._lock:
+            result, ids = self.scores([query], method=method, kind=kind)
+            if not ids:
+                return []
+            scores = result[0]
+            # Bỏ tài liệu bị loại trừ trước khi cắt top_k để vẫn trả về đủ top_k kết quả
+            top = [column for column in np.argsort(-scores, kind="stable")
+                   if scores[column] > 0 and ids[column] != exclude][:top_k]
+            return [{"id": ids[column], "kind": self._kinds[self._positions[ids[column]]],
+                     "score": round(float(scores[column]), 4)} for column in top]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            kinds = {}
+            for kind in self._kinds:
+                kinds[kind] = kinds.get(kind, 0) + 1
+            return {"documents": len(self._ids), "terms": len(self._terms), "nnz": int(len(self._data)),
+                    "kinds": kinds, "persistent": bool(self.path)}
+
+
+def _check_method(method):
+    if method not in ("bm25", "tfidf"):
+        raise ValueError(f"Unknown similarity method: {method}")
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
@@ -0,0 +1,209 @@
+import os
+import json
+from functools import lru_cache
+from dataclasses import dataclass
+
+# Từ điển kỹ năng có phiên bản; đổi "version" khi sửa file để hồ sơ kỹ năng cũ được tính lại
+SKILLS_TAXONOMY_PATH = os.getenv(
+    "SKILLS_TAXONOMY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "skills_taxonomy.json")
+)
+
+# Ký tự được xem là một phần của từ khi kiểm tra ranh giới (để "C" không khớp trong "C++", "C#")
+_WORD_SYMBOLS = frozenset("_+#")
+
+
+@dataclass(frozen=True)
+class SkillMatch:
+    """One occurrence of a skill in a text"""
+    skill: str
+    category: str
+    start: int
+    end: int
+    text: str
+
+
+def _is_word_char(char):
+    return char.isalnum() or char in _WORD_SYMBOLS
+
+
+def _normalize_space(text):
+    return " ".join(text.split())
+
+
+def _lower(text):
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Một số ký tự (như "İ") thành hai ký tự khi viết thường; giữ nguyên độ dài để vị trí khớp vẫn đúng
+        lowered = "".join(char.lower()[:1] for char in text)
+    return lowered
+
+
+class SkillMatcher:
+    """
+    Dictionary skill matcher built on an Aho-Corasick automaton
+
+    Every skill name and alias of the taxonomy is compiled once into a single
+    automaton, so a text is scanned in one pass whatever the size of the
+    dictionary. Matching ignores case and runs of whitespace, except for the
+    skill's "exact_aliases" (short or ambiguous forms like "Go", "R" or "AI"),
+    which must match case-sensitively. A skill name is itself matched
+    case-insensitively unless it is listed in its exact_aliases. Matches must
+    start and end on word boundaries, and overlapping matches are resolved
+    leftmost-longest ("React Native" wins over "React").
+
+    Args:
+        taxonomy (dict): {"version": str, "skills": [{"name", "category", "aliases", "exact_aliases"}]}
+    """
+
+    def __init__(self, taxonomy):
+        self.version = str(taxonomy.get("version", ""))
+        self.skills = {}
+        self._aliases = {}
+        # Automaton: bảng chuyển trạng thái, liên kết fail và các mẫu kết thúc tại mỗi trạng thái
+        self._goto = [{}]
+        self._fail = [0]
+        # Mỗi mẫu kết thúc: (độ dài, tên kỹ năng, dạng phân biệt hoa thường hoặc None)
+        self._outputs = [()]
+
+        for entry in taxonomy.get("skills", []):
+            name = entry["name"]
+            self.skills[name] = entry.get("category", "other")
+            exact = set(entry.get("exact_aliases", []))
+            forms = [] if name in exact else [name]
+            for alias in forms + list(entry.get("aliases", [])):
+                self._add(_normalize_space(alias), name, None)
+            for alias in map(_normalize_space, exact):
+                self._add(alias, name, alias)
+        self._build()
+
+    def _add(self, pattern, skill, exact):
+        if not pattern:
+            return
+        self._aliases.setdefault(_lower(pattern), skill)
+        state = 0
+        for char in _lower(pattern):
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] += ((len(pattern), skill, exact),)
+
+    def _build(self):
+        # Duyệt theo chiều rộng để liên kết fail của trạng thái cha đã có trước con
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Gộp sẵn kết quả của chuỗi fail để lúc quét không phải đi theo liên kết
+                self._outputs[child] += self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text):
+        """
+        Find the skills mentioned in a text
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            list: SkillMatch objects in text order; start/end index the
+                  whitespace-normalized text
+        """
+        if not text:
+            return []
+        normalized = _normalize_space(text)
+        lowered = _lower(normalized)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        size = len(lowered)
+
+        candidates = []
+        state = 0
+        for index, char in enumerate(lowered):
+            next_state = goto[state].get(char)
+            while next_state is None:
+                if not state:
+                    next_state = 0
+                    break
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state
+            if not outputs[state]:
+                continue
+            end = index + 1
+            for length, skill, exact in outputs[state]:
+                start = end - length
+                if start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if end < size and _is_word_char(lowered[end]):
+                    continue
+                if exact is not None and normalized[start:end] != exact:
+                    continue
+                candidates.append((start, -length, skill))
+
+        # Ưu tiên khớp bắt đầu sớm nhất rồi dài nhất, bỏ các khớp chồng lên nhau
+        matches = []
+        covered = 0
+        for start, negative_length, skill in sorted(candidates):
+            if start < covered:
+                continue
+            end = start - negative_length
+            matches.append(SkillMatch(skill, self.skills[skill], start, end, normalized[start:end]))
+            covered = end
+        return matches
+
+    def extract(self, text):
+        """
+        Return the canonical names of the skills mentioned in a text
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            list: Distinct skill names in order of first mention
+        """
+        return list(dict.fromkeys(match.skill for match in self.find(text)))
+
+    def normalize(self, name):
+        """
+        Map a skill name or alias to its canonical name (e.g. "k8s" -> "Kubernetes")
+
+        Returns:
+            str: The canonical name, or None if the name is not in the taxonomy
+        """
+        return self._aliases.get(_lower(_normalize_space(name or "")))
+
+    def aliases(self, name):
+        """Lowercased surface forms of a canonical skill, its own name first"""
+        return [alias for alias, skill in self._aliases.items() if skill == name]
+
+    def category(self, name):
+        """Return the category of a canonical skill name, or None"""
+        return self.skills.get(name)
+
+
+def load_taxonomy(path=SKILLS_TAXONOMY_PATH):
+    """
+    Load a skills taxonomy file
+
+    Args:
+        path (str): Path to the JSON taxonomy
+
+    Returns:
+        dict: The taxonomy
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def get_skill_matcher():
+    """Return the matcher built from SKILLS_TAXONOMY_PATH (built once per process)"""
+    return SkillMatcher(load_taxonomy())
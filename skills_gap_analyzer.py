@@ -1,121 +1,214 @@
 import streamlit as st
-import re
 import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
 from prompts import SYSTEM_PROMPT
 from gemini_helper import generate_response
+from structured_output import ResumeEvaluation
+from skill_matcher import get_skill_matcher
+from skills_gap_scoring import score_skills_gap, years_of_experience, format_gap_summary
 
 def extract_skills(text):
     """
-    Trích xuất danh sách kỹ năng từ văn bản sử dụng cả xử lý regex và AI
+    Trích xuất danh sách kỹ năng (tên chuẩn theo từ điển kỹ năng) từ văn bản
     """
-    # Pattern cơ bản để tìm kỹ năng
-    skill_pattern = r"(?:[\•\-\★\✓\✔]\s*)?([A-Za-z0-9][\w\+\#\.\-\s]*(?:Framework|Language|API|SDK|Library|Technologies|Systems|Software|Development|Programming|Design|Analysis|Management|Marketing|Analytics|Engineering|Security|Architecture|Cloud|DevOps|Testing|UI\/UX|Database|SQL|Python|Java|JavaScript|React|Angular|Vue|Node\.js|PHP|C\+\+|Swift|Go|Rust|TypeScript|AWS|Azure|GCP|Docker|Kubernetes|Linux|Git|Machine Learning|ML|AI|NLP|Deep Learning|Data Science|Scrum|Agile|Kanban|SEO|SEM|Content Marketing|Social Media|Email Marketing|Google Analytics|Photoshop|Illustrator|Sketch|Figma|XD|HTML|CSS|SASS|LESS)(?:\s+\d+(?:\.\d+)?\s+(?:years|yrs))?)"
-    
-    # Tìm tất cả các kỹ năng sử dụng pattern
-    skills_found = re.findall(skill_pattern, text, re.IGNORECASE)
-    
-    # Loại bỏ duplicates và whitespace
-    cleaned_skills = list(set([skill.strip() for skill in skills_found if len(skill.strip()) > 2]))
-    
-    return cleaned_skills
+    return get_skill_matcher().extract(text)
+
+def is_current_skill_profile(profile):
+    """
+    Hồ sơ kỹ năng được tính bằng phiên bản từ điển kỹ năng hiện tại hay không
+    """
+    return bool(profile) and profile.get("taxonomy_version") == get_skill_matcher().version
 
-def analyze_skills_gap(resume_text, job_description, gemini_model, language="vi"):
+def build_skill_profile(text):
+    """
+    Tạo hồ sơ kỹ năng có cấu trúc của một tài liệu, tính một lần khi tải lên và dùng lại
     """
-    Phân tích khoảng cách kỹ năng giữa sơ yếu lý lịch và mô tả công việc
+    matcher = get_skill_matcher()
+    skills = sorted(matcher.extract(text), key=str.lower)
+    categories = {}
+    for skill in skills:
+        categories.setdefault(matcher.category(skill), []).append(skill)
+    return {
+        "skills": skills,
+        "skill_count": len(skills),
+        "categories": categories,
+        "years_of_experience": years_of_experience(text),
+        "word_count": len(text.split()),
+        "taxonomy_version": matcher.version,
+    }
+
+def build_gap_advice_messages(score, language="vi"):
     """
-    # Tạo prompt phân tích
+    Tạo messages xin model nhận xét và đề xuất dựa trên khoảng cách kỹ năng đã tính sẵn
+    """
+    summary = format_gap_summary(score, language)
     if language == "vi":
-        analysis_prompt = f"""
-Hãy phân tích khoảng cách kỹ năng giữa CV và mô tả công việc dưới đây:
+        prompt = f"""
+Dưới đây là kết quả so khớp kỹ năng đã được tính sẵn giữa CV của ứng viên và mô tả công việc.
+Không tính lại phần trăm hay điểm số.
 
-CV:
-{resume_text}
+{summary}
+
+Hãy viết:
+1. Nhận xét ngắn về mức độ phù hợp
+2. Các kỹ năng còn thiếu cần ưu tiên học trước và lý do
+3. Điểm mạnh nên làm nổi bật trong CV và khi phỏng vấn (dựa trên kỹ năng trùng khớp và bổ sung)
+4. 3-5 hành động cụ thể để thu hẹp khoảng cách (khóa học, dự án, chứng chỉ)
+
+Định dạng kết quả thành các phần rõ ràng với tiêu đề.
+"""
+    else:
+        prompt = f"""
+Below is a precomputed skills match between a candidate's resume and a job description.
+Do not recompute the percentages or the score.
+
+{summary}
+
+Please write:
+1. A short assessment of the fit
+2. Which missing skills to learn first and why
+3. Strengths to highlight in the resume and in interviews (based on the matching and additional skills)
+4. 3-5 concrete actions to close the gap (courses, projects, certifications)
+
+Format the results into clear sections with headers.
+"""
+    language_instruction = "Trả lời bằng tiếng Việt." if language == "vi" else "Answer in English."
+    system_prompt = f"{SYSTEM_PROMPT}\n\nBạn là một chuyên gia phân tích kỹ năng và tuyển dụng với nhiều năm kinh nghiệm.\n\n{language_instruction}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def analyze_skills_gap(score, gemini_model, language="vi"):
+    """
+    Xin model lời khuyên dựa trên khoảng cách kỹ năng đã tính cục bộ (score_skills_gap)
+    """
+    return generate_response(gemini_model, build_gap_advice_messages(score, language))
+
+def build_requirements_messages(job_description, language="vi"):
+    """
+    Tạo messages để trích xuất một lần danh sách yêu cầu cô đọng từ mô tả công việc
+    """
+    if language == "vi":
+        prompt = f"""
+Trích xuất các yêu cầu tuyển dụng từ mô tả công việc sau thành danh sách ngắn gọn.
+Chia thành hai nhóm "Bắt buộc" và "Ưu tiên", mỗi dòng một kỹ năng hoặc yêu cầu (kèm số năm kinh nghiệm nếu có).
+Không viết thêm lời giải thích.
 
 Mô tả công việc:
 {job_description}
+"""
+    else:
+        prompt = f"""
+Extract the hiring requirements from the job description below as a compact list.
+Split them into "Required" and "Preferred", one skill or requirement per line (with years of experience if stated).
+Do not add any explanation.
+
+Job Description:
+{job_description}
+"""
+    language_instruction = "Trả lời bằng tiếng Việt." if language == "vi" else "Answer in English."
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT}\n\nBạn là một chuyên gia tuyển dụng.\n\n{language_instruction}"},
+        {"role": "user", "content": prompt}
+    ]
 
-Phân tích theo các tiêu chí sau:
-1. Các kỹ năng và yêu cầu chính trong mô tả công việc
-2. Các kỹ năng và kinh nghiệm của ứng viên từ CV
-3. Kỹ năng trùng khớp (đánh giá % trùng khớp)
-4. Kỹ năng thiếu (đánh giá % thiếu hụt)
-5. Kỹ năng vượt trội của ứng viên không được nhắc trong mô tả công việc (điểm mạnh)
-6. Đánh giá tổng thể về sự phù hợp (thang điểm 1-10)
-7. Đề xuất cải thiện cụ thể
-
-Định dạng kết quả thành các phần rõ ràng với tiêu đề và liệt kê cụ thể từng kỹ năng.
-Đảm bảo cung cấp dữ liệu phần trăm về mức độ phù hợp, khoảng cách kỹ năng, số điểm đánh giá tổng thể để sử dụng cho biểu đồ.
+def build_resume_evaluation_messages(requirements, resume_text, language="vi"):
+    """
+    Tạo messages đánh giá một CV dựa trên danh sách yêu cầu đã trích xuất sẵn
+    """
+    if language == "vi":
+        prompt = f"""
+Đánh giá mức độ phù hợp của CV với các yêu cầu công việc dưới đây.
+
+Yêu cầu công việc:
+{requirements}
+
+CV:
+{resume_text}
+
+Liệt kê kỹ năng trùng khớp, kỹ năng còn thiếu và điểm mạnh nổi bật (ngắn gọn, bằng tiếng Việt),
+phần trăm yêu cầu được đáp ứng (0-100) và điểm phù hợp (0-10).
 """
     else:
-        analysis_prompt = f"""
-Analyze the skills gap between the resume and job description below:
+        prompt = f"""
+Evaluate how well the resume fits the job requirements below.
+
+Job requirements:
+{requirements}
 
 Resume:
 {resume_text}
 
-Job Description:
-{job_description}
-
-Analyze according to these criteria:
-1. Key skills and requirements in the job description
-2. Candidate's skills and experience from the resume
-3. Matching skills (evaluate % match)
-4. Missing skills (evaluate % gap)
-5. Candidate's exceptional skills not mentioned in the job description (strengths)
-6. Overall assessment of fit (scale of 1-10)
-7. Specific improvement suggestions
-
-Format the results into clear sections with headers and list each skill specifically.
-Make sure to provide percentage data about the level of fit, skills gap, and overall assessment score for use in charts.
+List the matching skills, the missing skills and the notable strengths (briefly),
+the percentage of requirements met (0-100) and the fit score (0-10).
 """
-    
-    # Tạo hướng dẫn ngôn ngữ
     language_instruction = "Trả lời bằng tiếng Việt." if language == "vi" else "Answer in English."
-    
-    # Tạo system prompt
-    system_prompt = f"{SYSTEM_PROMPT}\n\nBạn là một chuyên gia phân tích kỹ năng và tuyển dụng với nhiều năm kinh nghiệm.\n\n{language_instruction}"
-    
-    # Tạo tin nhắn
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": analysis_prompt}
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT}\n\nBạn là một chuyên gia sàng lọc hồ sơ.\n\n{language_instruction}"},
+        {"role": "user", "content": prompt}
     ]
-    
-    # Gọi Gemini API
-    analysis = generate_response(gemini_model, messages)
-    
-    return analysis
 
-def display_skills_gap_analysis(analysis, language="vi"):
+def format_resume_evaluation(evaluation, language="vi"):
     """
-    Hiển thị phân tích khoảng cách kỹ năng dưới dạng trực quan
+    Trình bày kết quả đánh giá CV có cấu trúc (ResumeEvaluation) thành văn bản ngắn
     """
+    if language == "vi":
+        labels = ["Kỹ năng trùng khớp", "Kỹ năng còn thiếu", "Điểm mạnh", "Mức đáp ứng", "Điểm phù hợp"]
+    else:
+        labels = ["Matching skills", "Missing skills", "Strengths", "Requirements met", "Fit score"]
+    lists = [evaluation.matching_skills, evaluation.missing_skills, evaluation.strengths]
+    lines = [f"{label}: {', '.join(items) or '-'}" for label, items in zip(labels, lists)]
+    lines.append(f"{labels[3]}: {evaluation.match_percent:g}%")
+    lines.append(f"{labels[4]}: {evaluation.fit_score:g}/10")
+    return "\n".join(lines)
+
+def evaluation_result(evaluation, language="vi"):
+    """Các trường của một kết quả đánh giá CV thành công (điểm số, văn bản và dữ liệu có cấu trúc)"""
+    return {
+        "match_percent": evaluation.match_percent,
+        "fit_score": evaluation.fit_score,
+        "analysis": format_resume_evaluation(evaluation, language),
+        "evaluation": evaluation.model_dump(),
+    }
+
+def rank_evaluations(results):
+    """Xếp hạng các CV đánh giá thành công theo điểm phù hợp rồi tỷ lệ đáp ứng"""
+    succeeded = [result for result in results if result["success"]]
+    ranking = sorted(
+        succeeded,
+        key=lambda result: (result["fit_score"] or 0, result["match_percent"] or 0),
+        reverse=True
+    )
+    return {
+        "type": "summary",
+        "total": len(results),
+        "succeeded": len(succeeded),
+        "failed": [{"id": result["id"], "error": result["error"]} for result in results if not result["success"]],
+        "ranking": [
+            {"rank": position + 1, "id": result["id"], "fit_score": result["fit_score"],
+             "match_percent": result["match_percent"]}
+            for position, result in enumerate(ranking)
+        ]
+    }
+
+def display_skills_gap_analysis(score, language="vi"):
+    """
+    Hiển thị kết quả chấm điểm khoảng cách kỹ năng dưới dạng trực quan
+    """
+    if score.match_percent is None:
+        if language == "vi":
+            st.info("Không nhận diện được kỹ năng nào trong mô tả công việc để so khớp.")
+        else:
+            st.info("No known skills were found in the job description to compare against.")
+        return
+    
     try:
-        # Trích xuất phần trăm từ nội dung phân tích
-        match_pattern = r"(\d+)%\s*(?:trùng khớp|match)"
-        gap_pattern = r"(\d+)%\s*(?:thiếu|gap|không phù hợp|missing)"
-        score_pattern = r"(\d+(?:\.\d+)?)\s*(?:\/|trên)\s*10"
-        
-        match_percent = re.search(match_pattern, analysis, re.IGNORECASE)
-        gap_percent = re.search(gap_pattern, analysis, re.IGNORECASE)
-        score = re.search(score_pattern, analysis, re.IGNORECASE)
-        
-        match_value = int(match_percent.group(1)) if match_percent else 50
-        gap_value = int(gap_percent.group(1)) if gap_percent else 50
-        score_value = float(score.group(1)) if score else 5.0
-        
-        # Đảm bảo không vượt quá 100%
-        if match_value + gap_value > 100:
-            total = match_value + gap_value
-            match_value = int((match_value / total) * 100)
-            gap_value = 100 - match_value
-        
         # Tạo dữ liệu cho biểu đồ
         labels = ["Kỹ năng phù hợp", "Khoảng cách kỹ năng"] if language == "vi" else ["Matching Skills", "Skills Gap"]
-        values = [match_value, gap_value]
+        values = [score.match_percent, score.gap_percent]
         colors = ['#4CAF50', '#FF5252']
         
         # Hiển thị biểu đồ tròn
@@ -128,7 +221,7 @@ def display_skills_gap_analysis(analysis, language="vi"):
         
         fig1.update_layout(
             title_text="Phân tích khoảng cách kỹ năng" if language == "vi" else "Skills Gap Analysis",
-            annotations=[dict(text=f"{match_value}%", x=0.5, y=0.5, font_size=20, showarrow=False)]
+            annotations=[dict(text=f"{score.match_percent}%", x=0.5, y=0.5, font_size=20, showarrow=False)]
         )
         
         st.plotly_chart(fig1)
@@ -136,7 +229,7 @@ def display_skills_gap_analysis(analysis, language="vi"):
         # Hiển thị điểm số
         fig2 = go.Figure(go.Indicator(
             mode = "gauge+number",
-            value = score_value,
+            value = score.fit_score,
             domain = {'x': [0, 1], 'y': [0, 1]},
             title = {'text': "Đánh giá tổng thể" if language == "vi" else "Overall Assessment"},
             gauge = {
@@ -153,7 +246,7 @@ def display_skills_gap_analysis(analysis, language="vi"):
                 'threshold': {
                     'line': {'color': "red", 'width': 4},
                     'thickness': 0.75,
-                    'value': score_value
+                    'value': score.fit_score
                 }
             }
         ))
@@ -165,10 +258,25 @@ def display_skills_gap_analysis(analysis, language="vi"):
         
         st.plotly_chart(fig2)
         
+        # Danh sách kỹ năng trùng khớp, còn thiếu và bổ sung
+        if language == "vi":
+            titles = ["✅ Trùng khớp", "❌ Còn thiếu", "➕ Bổ sung"]
+        else:
+            titles = ["✅ Matching", "❌ Missing", "➕ Additional"]
+        skill_lists = [
+            [entry["skill"] for entry in score.matched],
+            [entry["skill"] + ("" if entry["required"] else " *") +
+             (f" (~ _{entry['related']}_)" if entry.get("related") else "") for entry in score.missing],
+            score.extra,
+        ]
+        for column, title, skills in zip(st.columns(3), titles, skill_lists):
+            with column:
+                st.markdown(f"**{title}**")
+                st.markdown("\n".join(f"- {skill}" for skill in skills) or "-")
+        
     except Exception as e:
         st.error(f"Lỗi khi tạo biểu đồ: {str(e)}")
-        st.write("Hiển thị phân tích văn bản")
-        st.write(analysis)
+        st.write(format_gap_summary(score, language))
 
 
 def skills_gap_analysis_page(gemini_model):
@@ -204,25 +312,29 @@ def skills_gap_analysis_page(gemini_model):
             else:
                 st.warning("Please enter both resume and job description")
         else:
+            # Chấm điểm cục bộ, biểu đồ hiển thị ngay không cần chờ model
+            score = score_skills_gap(resume_text, job_description)
+            
+            # Hiển thị kết quả
+            st.subheader("Kết quả phân tích" if language == "vi" else "Analysis Results")
+            
+            # Hiển thị biểu đồ trực quan
+            display_skills_gap_analysis(score, language)
+            
             with st.spinner("Đang phân tích..."):
-                # Phân tích khoảng cách kỹ năng
-                analysis_result = analyze_skills_gap(resume_text, job_description, gemini_model, language)
-                
-                # Hiển thị kết quả
-                st.subheader("Kết quả phân tích" if language == "vi" else "Analysis Results")
-                
-                # Hiển thị biểu đồ trực quan
-                display_skills_gap_analysis(analysis_result, language)
+                # Model chỉ viết nhận xét và đề xuất dựa trên khoảng cách đã tính
+                analysis_result = analyze_skills_gap(score, gemini_model, language)
                 
                 # Hiển thị phân tích chi tiết
                 st.markdown("### Phân tích chi tiết" if language == "vi" else "### Detailed Analysis")
                 st.markdown(analysis_result)
                 
-                # Nút tải xuống báo cáo
+                # Nút tải xuống báo cáo (số liệu đã tính kèm lời khuyên của model)
+                report = f"{format_gap_summary(score, language)}\n\n{analysis_result}"
                 if language == "vi":
-                    st.download_button("📥 Tải xuống báo cáo", analysis_result, "skills_gap_analysis.txt")
+                    st.download_button("📥 Tải xuống báo cáo", report, "skills_gap_analysis.txt")
                 else:
-                    st.download_button("📥 Download Report", analysis_result, "skills_gap_analysis.txt")
+                    st.download_button("📥 Download Report", report, "skills_gap_analysis.txt")
     else:
         # Hiển thị hướng dẫn khi chưa phân tích
         if language == "vi":
@@ -0,0 +1,207 @@
+import re
+from dataclasses import dataclass, field, asdict
+
+from skill_matcher import get_skill_matcher
+from embedding_index import nearest_skill_mentions
+
+# Trọng số của kỹ năng theo mức độ yêu cầu trong mô tả công việc
+REQUIRED_WEIGHT = 1.0
+PREFERRED_WEIGHT = 0.5
+
+# Kỹ năng mềm và ngoại ngữ ít quyết định sự phù hợp hơn kỹ năng chuyên môn
+CATEGORY_WEIGHTS = {"soft_skill": 0.5, "language": 0.75}
+
+# Kỹ năng được nhắc lại nhiều lần được xem là quan trọng hơn (tối đa +50%)
+MENTION_BONUS = 0.25
+MAX_MENTION_BONUS = 2
+
+# Kỹ năng thiếu nhưng CV có cụm từ gần nghĩa (embedding) được tính một phần trọng số
+RELATED_CREDIT = 0.5
+
+# Tỷ trọng của độ phủ kỹ năng và số năm kinh nghiệm trong điểm phù hợp (thang 10)
+SKILL_SHARE = 0.85
+EXPERIENCE_SHARE = 0.15
+# Hệ số kinh nghiệm khi CV không ghi số năm
+UNKNOWN_EXPERIENCE_RATIO = 0.5
+
+_YEARS_PATTERN = re.compile(r"(\d{1,2})\+?\s*(?:years|yrs|năm)", re.IGNORECASE)
+
+# Dòng tiêu đề hoặc câu đánh dấu kỹ năng là ưu tiên / bắt buộc
+_PREFERRED_MARKER = re.compile(
+    r"nice[\s-]to[\s-]have|preferred|a plus|bonus|desirable|ưu tiên|lợi thế|điểm cộng", re.IGNORECASE
+)
+_REQUIRED_MARKER = re.compile(r"required|requirements|must|qualifications|bắt buộc|yêu cầu", re.IGNORECASE)
+
+
+@dataclass
+class SkillsGapScore:
+    """Weighted comparison of a resume with a job description"""
+    matched: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+    extra: list = field(default_factory=list)
+    match_percent: int = None
+    gap_percent: int = None
+    fit_score: float = None
+    required_years: int = None
+    resume_years: int = None
+    categories: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def years_of_experience(text):
+    """
+    Return the largest "N years" figure of a text
+
+    Returns:
+        int: Number of years, or None if the text mentions none
+    """
+    years = [int(value) for value in _YEARS_PATTERN.findall(text or "")]
+    return max(years) if years else None
+
+
+def weigh_job_skills(job_description):
+    """
+    Weigh the skills of a job description
+
+    Skills under a "nice to have" / "ưu tiên" heading, or on a line saying
+    so, weigh PREFERRED_WEIGHT; all others REQUIRED_WEIGHT. The weight is
+    scaled by CATEGORY_WEIGHTS and raised for repeated mentions.
+
+    Args:
+        job_description (str): Job description text
+
+    Returns:
+        dict: {skill: {"category", "weight", "required"}} in order of first mention
+    """
+    matcher = get_skill_matcher()
+    mentions, required = {}, {}
+    section_required = True
+    for line in (job_description or "").splitlines():
+        skills = matcher.extract(line)
+        preferred_line = bool(_PREFERRED_MARKER.search(line))
+        if not skills:
+            # Dòng tiêu đề: áp dụng cho các dòng phía dưới
+            if preferred_line:
+                section_required = False
+            elif _REQUIRED_MARKER.search(line):
+                section_required = True
+            continue
+        line_required = section_required and not preferred_line
+        for skill in skills:
+            mentions[skill] = mentions.get(skill, 0) + 1
+            required[skill] = required.get(skill, False) or line_required
+
+    weighted = {}
+    for skill, count in mentions.items():
+        category = matcher.category(skill)
+        weight = REQUIRED_WEIGHT if required[skill] else PREFERRED_WEIGHT
+        weight *= CATEGORY_WEIGHTS.get(category, 1.0)
+        weight *= 1 + MENTION_BONUS * min(count - 1, MAX_MENTION_BONUS)
+        weighted[skill] = {"category": category, "weight": round(weight, 3), "required": required[skill]}
+    return weighted
+
+
+def score_skills_gap(resume_text, job_description, resume_skills=None, semantic=True):
+    """
+    Score the fit of a resume for a job without calling a model
+
+    A missing skill the resume mentions under an unknown form (see
+    embedding_index.nearest_skill_mentions) stays missing but carries a
+    "related" phrase and earns RELATED_CREDIT of its weight.
+
+    Args:
+        resume_text (str): Resume text
+        job_description (str): Job description text
+        resume_skills (list, optional): Precomputed canonical skills of the resume
+        semantic (bool): Look for related phrases of the missing skills
+
+    Returns:
+        SkillsGapScore: Matched, missing and extra skills with the weighted match
+                        percentage and a 0-10 fit score (None values if the job
+                        description names no known skill)
+    """
+    matcher = get_skill_matcher()
+    job_skills = weigh_job_skills(job_description)
+    if resume_skills is None:
+        resume_skills = matcher.extract(resume_text)
+    resume_set = set(resume_skills)
+
+    score = SkillsGapScore(
+        required_years=years_of_experience(job_description),
+        resume_years=years_of_experience(resume_text),
+    )
+    mentions = {}
+    if semantic and set(job_skills) - resume_set:
+        mentions = nearest_skill_mentions(resume_text)
+    total = matched_weight = 0.0
+    for skill, info in job_skills.items():
+        entry = {"skill": skill, **info}
+        category = score.categories.setdefault(info["category"], {"matched": 0.0, "total": 0.0})
+        category["total"] += info["weight"]
+        total += info["weight"]
+        if skill in resume_set:
+            score.matched.append(entry)
+            category["matched"] += info["weight"]
+            matched_weight += info["weight"]
+        else:
+            if skill in mentions:
+                entry["related"], entry["similarity"] = mentions[skill]
+                category["matched"] += info["weight"] * RELATED_CREDIT
+                matched_weight += info["weight"] * RELATED_CREDIT
+            score.missing.append(entry)
+    # Kỹ năng cần thiết nhất được liệt kê trước
+    score.missing.sort(key=lambda entry: -entry["weight"])
+    score.extra = [skill for skill in resume_skills if skill not in job_skills]
+
+    if not total:
+        return score
+
+    skill_ratio = matched_weight / total
+    if not score.required_years:
+        experience_ratio = 1.0
+    elif score.resume_years is None:
+        experience_ratio = UNKNOWN_EXPERIENCE_RATIO
+    else:
+        experience_ratio = min(1.0, score.resume_years / score.required_years)
+
+    score.match_percent = round(100 * skill_ratio)
+    score.gap_percent = 100 - score.match_percent
+    score.fit_score = round(10 * (SKILL_SHARE * skill_ratio + EXPERIENCE_SHARE * experience_ratio), 1)
+    return score
+
+
+def format_gap_summary(score, language="vi"):
+    """
+    Render a score as a short text, used in the advice prompt and the downloadable report
+
+    Returns:
+        str: Multi-line summary
+    """
+    def skills(entries):
+        names = [entry["skill"] + ("" if entry["required"] else "*") +
+                 (f" (~ \"{entry['related']}\")" if entry.get("related") else "") for entry in entries]
+        return ", ".join(names) or "-"
+
+    if language == "vi":
+        lines = [
+            f"Mức độ phù hợp kỹ năng: {score.match_percent}% (thiếu {score.gap_percent}%)",
+            f"Điểm phù hợp tổng thể: {score.fit_score}/10",
+            f"Kỹ năng trùng khớp: {skills(score.matched)}",
+            f"Kỹ năng còn thiếu: {skills(score.missing)}",
+            f"Kỹ năng bổ sung của ứng viên: {', '.join(score.extra) or '-'}",
+            f"Kinh nghiệm yêu cầu: {score.required_years or '-'} năm; trong CV: {score.resume_years or '-'} năm",
+            "(* = kỹ năng ưu tiên, không bắt buộc; ~ = cụm từ gần nghĩa trong CV, tính một nửa)",
+        ]
+    else:
+        lines = [
+            f"Skills match: {score.match_percent}% (gap {score.gap_percent}%)",
+            f"Overall fit score: {score.fit_score}/10",
+            f"Matching skills: {skills(score.matched)}",
+            f"Missing skills: {skills(score.missing)}",
+            f"Additional candidate skills: {', '.join(score.extra) or '-'}",
+            f"Required experience: {score.required_years or '-'} years; in resume: {score.resume_years or '-'} years",
+            "(* = preferred, not required; ~ = related phrase in the resume, counted half)",
+        ]
+    return "\n".join(lines)
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+
+from pydantic import BaseModel, Field, ValidationError
+
+# Số lần gọi tối đa cho một yêu cầu JSON (lần đầu + thử lại khi kết quả không đúng schema)
+STRUCTURED_MAX_ATTEMPTS = max(1, int(os.getenv("GEMINI_STRUCTURED_ATTEMPTS", "2")))
+
+# Các trường của JSON Schema mà Schema của Gemini hiểu được; các ràng buộc khác
+# (minimum, maximum, default, ...) chỉ được Pydantic kiểm tra phía client
+_SCHEMA_FIELDS = ("type", "format", "description", "enum", "items", "properties", "required", "nullable")
+
+
+# ----- Schema phản hồi -----
+
+class JobMarketInsights(BaseModel):
+    """Job market overview of a role in a country"""
+    salary_range: str = Field(description="Average salary range, with currency")
+    top_skills: list[str] = Field(description="Most requested skills, most important first")
+    hiring_trends: str = Field(description="Current hiring trends")
+    top_companies: list[str] = Field(description="Companies hiring the most for this role")
+    growth_forecast: str = Field(description="Growth forecast for the next 3-5 years")
+
+
+class InterviewAssessment(BaseModel):
+    """Final assessment of a simulated interview, scores on a 0-10 scale"""
+    overall: int = Field(ge=0, le=10, description="Overall score from 0 to 10")
+    technical: int = Field(ge=0, le=10, description="Technical skills score from 0 to 10")
+    communication: int = Field(ge=0, le=10, description="Communication skills score from 0 to 10")
+    problem_solving: int = Field(ge=0, le=10, description="Problem-solving skills score from 0 to 10")
+    leadership: int = Field(ge=0, le=10, description="Leadership skills score from 0 to 10")
+    strengths: list[str] = Field(description="Strengths of the candidate")
+    weaknesses: list[str] = Field(description="Weaknesses of the candidate")
+    suggestions: list[str] = Field(description="Concrete improvement suggestions")
+
+
+class ResumeEvaluation(BaseModel):
+    """Fit of one resume against extracted job requirements"""
+    matching_skills: list[str] = Field(description="Required skills the resume shows")
+    missing_skills: list[str] = Field(description="Required skills the resume lacks")
+    strengths: list[str] = Field(description="Notable strengths of the candidate")
+    match_percent: float = Field(ge=0, le=100, description="Percentage of the requirements met, 0-100")
+    fit_score: float = Field(ge=0, le=10, description="Fit score from 0 to 10")
+
+
+# ----- Chuyển schema và kiểm tra kết quả -----
+
+def _inline(schema, definitions):
+    """Resolve $ref, turn Optional (anyOf with null) into nullable and drop unsupported fields"""
+    if "$ref" in schema:
+        return _inline(definitions[schema["$ref"].rsplit("/", 1)[-1]], definitions)
+    if "anyOf" in schema:
+        variants = [variant for variant in schema["anyOf"] if variant.get("type") != "null"]
+        resolved = _inline(variants[0], definitions)
+        if len(variants) < len(schema["anyOf"]):
+            resolved["nullable"] = True
+        if "description" in schema:
+            resolved["description"] = schema["description"]
+        return resolved
+    result = {key: schema[key] for key in _SCHEMA_FIELDS if key in schema}
+    if "items" in result:
+        result["items"] = _inline(result["items"], definitions)
+    if "properties" in result:
+        result["properties"] = {name: _inline(value, definitions) for name, value in result["properties"].items()}
+    return result
+
+
+@lru_cache(maxsize=None)
+def gemini_response_schema(model_class):
+    """
+    Convert a Pydantic model to the response_schema accepted by Gemini
+
+    The SDK rejects JSON Schema fields it does not know (default, minimum,
+    $defs, ...), so nested models are inlined and only the supported fields
+    are kept; range constraints stay in the field descriptions and are
+    enforced when validating.
+
+    Args:
+        model_class (type): Pydantic model of the expected answer
+
+    Returns:
+        dict: OpenAPI-style schema
+    """
+    schema = model_class.model_json_schema()
+    return _inline(schema, schema.get("$defs", {}))
+
+
+@lru_cache(maxsize=None)
+def schema_fingerprint(model_class):
+    """Stable text identifying a schema, part of the response cache key"""
+    return json.dumps(gemini_response_schema(model_class), sort_keys=True)
+
+
+def structured_generation_config(model_class):
+    """Per-request generation config asking Gemini for JSON matching model_class"""
+    return {"response_mime_type": "application/json", "response_schema": gemini_response_schema(model_class)}
+
+
+class StructuredOutputStats:
+    """Thread-safe counters of structured requests, retries and validation time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "valid_first_attempt": 0, "retries": 0, "failures": 0, "validations": 0}
+        self._validation_seconds = 0.0
+
+    def record(self, name, count=1):
+        with self._lock:
+            self._counts[name] += count
+
+    def record_validation(self, seconds):
+        with self._lock:
+            self._counts["validations"] += 1
+            self._validation_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            validations = counts["validations"]
+            counts["validation_ms_avg"] = round(1000 * self._validation_seconds / validations, 3) if validations else 0.0
+        return counts
+
+
+structured_stats = StructuredOutputStats()
+
+
+def parse_structured(model_class, text):
+    """
+    Validate a JSON answer against model_class in one pass
+
+    Args:
+        model_class (type): Pydantic model of the expected answer
+        text (str): Raw model output
+
+    Returns:
+        BaseModel: The validated instance
+
+    Raises:
+        pydantic.ValidationError: If the text is not valid JSON for the schema
+    """
+    start = time.perf_counter()
+    try:
+        text = text.strip()
+        if text.startswith("```"):
+            # Một số model vẫn bọc JSON trong khối code dù đã yêu cầu MIME JSON
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        return model_class.model_validate_json(text)
+    finally:
+        structured_stats.record_validation(time.perf_counter() - start)
+
@@ -0,0 +1,245 @@
+import os
+import re
+import hashlib
+import threading
+from dataclasses import dataclass, field
+
+from response_cache import LRUCache
+
+# Ngân sách token mặc định cho một prompt (system + lịch sử hội thoại)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", "8000"))
+
+# Chi phí cố định cho mỗi message (role, phân tách)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+TRUNCATION_MARKER = "\n[... nội dung đã được rút gọn ...]\n"
+
+# Văn bản ngắn được đếm trực tiếp; văn bản dài được nhớ theo digest để cache không giữ cả tài liệu
+TOKEN_CACHE_MIN_CHARS = 256
+_token_cache = LRUCache(8192)
+
+
+class PromptTooLargeError(ValueError):
+    """The system prompt alone (instructions plus the uploaded document) exceeds the token budget"""
+
+
+def _estimate_tokens(text):
+    pieces = len(_WORD_PATTERN.findall(text))
+    return max((len(text) + 3) // 4, int(pieces * 1.3))
+
+
+def count_tokens(text):
+    """
+    Estimate the number of tokens of a text
+
+    Uses the larger of ~4 characters per token and ~1.3 tokens per word or
+    punctuation mark, which stays close to the Gemini tokenizer for both
+    English and Vietnamese. Counts of long texts are cached by content
+    digest, so the cache holds no document text.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    if len(text) < TOKEN_CACHE_MIN_CHARS:
+        return _estimate_tokens(text)
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    tokens = _token_cache.get(key)
+    if tokens is None:
+        tokens = _estimate_tokens(text)
+        _token_cache.set(key, tokens)
+    return tokens
+
+
+def count_message_tokens(message):
+    """Estimate the tokens of one chat message, including its overhead"""
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def count_messages_tokens(messages):
+    """Estimate the tokens of a whole chat message list"""
+    return sum(count_message_tokens(message) for message in messages)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Shorten a text to roughly max_tokens, keeping its beginning and end
+
+    Args:
+        text (str): Text to shorten
+        max_tokens (int): Token budget for the result
+
+    Returns:
+        str: The original text if it fits, otherwise head + marker + tail
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    head = int(max_chars * 0.75)
+    tail = max_chars - head
+    return text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+
+
+def extractive_summary(messages, max_words_per_turn=30):
+    """
+    Build a compact summary of older turns without an extra model call
+
+    Keeps the first sentence (capped to max_words_per_turn words) of each turn.
+
+    Args:
+        messages (list): Older chat messages with 'role' and 'content'
+        max_words_per_turn (int): Word cap per summarized turn
+
+    Returns:
+        str: One line per turn
+    """
+    lines = []
+    for message in messages:
+        content = " ".join(message.get("content", "").split())
+        if not content:
+            continue
+        first_sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+        words = first_sentence.split()
+        if len(words) > max_words_per_turn:
+            first_sentence = " ".join(words[:max_words_per_turn]) + "..."
+        speaker = "Người dùng" if message.get("role") == "user" else "Trợ lý"
+        lines.append(f"- {speaker}: {first_sentence}")
+    return "\n".join(lines)
+
+
+@dataclass
+class BudgetResult:
+    """Messages fitted to a budget together with the token accounting"""
+    messages: list
+    tokens_before: int
+    tokens_after: int
+    dropped_turns: int = 0
+    summarized: bool = False
+    notes: list = field(default_factory=list)
+
+    @property
+    def tokens_saved(self):
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+class TokenBudget:
+    """
+    Keep a chat prompt within a token budget
+
+    The system prompt is kept intact (it carries the uploaded document)
+    together with the most recent turns; older turns are folded into a short
+    summary appended to the system prompt, or dropped when even the summary
+    does not fit. The last message is always kept.
+
+    Args:
+        max_tokens (int): Budget for the whole prompt
+        keep_recent (int): Number of most recent messages always kept verbatim
+        summarizer (callable, optional): Receives the older messages and returns
+                                         a summary text; defaults to extractive_summary
+    """
+
+    def __init__(self, max_tokens=DEFAULT_TOKEN_BUDGET, keep_recent=6, summarizer=None):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or extractive_summary
+
+    def fit(self, messages):
+        """
+        Fit a message list into the budget
+
+        Args:
+            messages (list): Chat messages with 'role' and 'content'
+
+        Returns:
+            BudgetResult: The fitted messages and tokens before/after
+
+        Raises:
+            PromptTooLargeError: If the system prompt alone exceeds the budget
+        """
+        tokens_before = count_messages_tokens(messages)
+        if tokens_before <= self.max_tokens:
+            result = BudgetResult(list(messages), tokens_before, tokens_before)
+            _record(result)
+            return result
+
+        system_messages = [message for message in messages if message.get("role") == "system"]
+        conversation = [message for message in messages if message.get("role") != "system"]
+        notes = []
+
+        system_content = "\n\n".join(message["content"] for message in system_messages)
+        system_tokens = count_tokens(system_content) + MESSAGE_OVERHEAD_TOKENS
+        if system_tokens > self.max_tokens:
+            # Không cắt system prompt: phần giữa tài liệu sẽ bị mất mà người dùng không biết
+            raise PromptTooLargeError(
+                f"The document and instructions need about {system_tokens:,} tokens, more than the "
+                f"{self.max_tokens:,}-token prompt budget. Use a shorter document or raise GEMINI_PROMPT_TOKEN_BUDGET."
+            )
+
+        recent = conversation[-self.keep_recent:] if self.keep_recent else conversation[-1:]
+        older = conversation[:len(conversation) - len(recent)]
+
+        summary = self.summarizer(older) if older else ""
+        summarized = bool(summary)
+
+        def build(summary_text, recent_messages):
+            content = system_content
+            if summary_text:
+                content += f"\n\nTóm tắt phần hội thoại trước đó:\n{summary_text}"
+            fitted = [{"role": "system", "content": content}] if content else []
+            return fitted + [dict(message) for message in recent_messages]
+
+        fitted = build(summary, recent)
+
+        # Nếu vẫn vượt ngân sách: bỏ dần dòng tóm tắt cũ nhất rồi tới các lượt gần đây (giữ lượt cuối)
+        summary_lines = summary.split("\n") if summary else []
+        while count_messages_tokens(fitted) > self.max_tokens and summary_lines:
+            summary_lines.pop(0)
+            fitted = build("\n".join(summary_lines), recent)
+        while count_messages_tokens(fitted) > self.max_tokens and len(recent) > 1:
+            recent = recent[1:]
+            fitted = build("\n".join(summary_lines), recent)
+
+        dropped = len(conversation) - len(recent)
+        if dropped:
+            notes.append(f"{dropped} older turns summarized or dropped")
+
+        result = BudgetResult(
+            fitted,
+            tokens_before,
+            count_messages_tokens(fitted),
+            dropped_turns=dropped,
+            summarized=summarized and bool(summary_lines),
+            notes=notes,
+        )
+        _record(result)
+        return result
+
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "trimmed": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+
+
+def _record(result):
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["trimmed"] += int(result.tokens_saved > 0)
+        _stats["tokens_before"] += result.tokens_before
+        _stats["tokens_after"] += result.tokens_after
+        _stats["tokens_saved"] += result.tokens_saved
+
+
+def get_budget_stats():
+    """
+    Return accumulated token accounting of all fitted prompts
+
+    Returns:
+        dict: requests, trimmed, tokens_before, tokens_after and tokens_saved
+    """
+    with _stats_lock:
+        return dict(_stats)
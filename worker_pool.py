@@ -0,0 +1,83 @@
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+class _Generation:
+    """One process pool and the number of calls currently using it"""
+
+    def __init__(self, workers):
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.users = 0
+        self.retired = False
+
+
+def _terminate(executor):
+    # Dừng hẳn các worker: shutdown(wait=False) không dừng được tiến trình đang bận (trang/ảnh bị treo)
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+class SharedProcessPool:
+    """
+    Spawn process pool shared by concurrent calls, replaced without disturbing them when a task hangs
+
+    A call that sees a task hang (or the pool break) retires the pool: new
+    calls get a fresh pool while the calls still running on the old one
+    finish their work, and the old worker processes, the hung one included,
+    are terminated once the last of them is done.
+
+    Args:
+        workers (int): Default number of worker processes, fixed when a pool is created
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._current = None
+
+    @contextlib.contextmanager
+    def session(self, workers=None):
+        """Use the current pool for the duration of a call; yields the session, with executor and retire()"""
+        with self._lock:
+            if self._current is None:
+                self._current = _Generation(workers or self.workers)
+            generation = self._current
+            generation.users += 1
+        session = _Session(self, generation)
+        try:
+            yield session
+        finally:
+            with self._lock:
+                generation.users -= 1
+                finished = generation.retired and not generation.users
+            if finished:
+                _terminate(generation.executor)
+
+    def _retire(self, generation):
+        with self._lock:
+            generation.retired = True
+            if self._current is generation:
+                self._current = None
+
+    def shutdown(self):
+        """Terminate the current pool (calls still using it see BrokenProcessPool)"""
+        with self._lock:
+            generation, self._current = self._current, None
+        if generation is not None:
+            _terminate(generation.executor)
+
+
+class _Session:
+    def __init__(self, pool, generation):
+        self._pool = pool
+        self._generation = generation
+        self.executor = generation.executor
+
+    def retire(self):
+        """Stop handing out this pool; its processes are terminated when the last call using it ends"""
+        self._pool._retire(self._generation)